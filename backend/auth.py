@@ -1,8 +1,7 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
 
@@ -10,19 +9,30 @@ import os
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'idef-secret-key-change-in-production-2025')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 hours
+# Tickets for event streams travel in URLs, so they only open a stream and expire quickly
+STREAM_TICKET_SCOPE = "event-stream"
+STREAM_TICKET_SECONDS = int(os.environ.get('STREAM_TICKET_SECONDS', '60'))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+
+# passlib/bcrypt and python-jose are only imported once an admin logs in,
+# keeping them out of worker startup
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -33,12 +43,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 def decode_token(token: str) -> dict:
     """Decode JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -50,12 +62,57 @@ def decode_token(token: str) -> dict:
         )
 
 
+def create_stream_ticket(username: str) -> str:
+    """Short-lived token that can only open an event stream"""
+    return create_access_token(
+        {"sub": username, "scope": STREAM_TICKET_SCOPE}, timedelta(seconds=STREAM_TICKET_SECONDS)
+    )
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user from token"""
     token = credentials.credentials
     payload = decode_token(token)
     username: str = payload.get("sub")
-    if username is None:
+    # Scoped tokens (stream tickets) are not admin sessions
+    if username is None or payload.get("scope"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+    return username
+
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[str]:
+    """User of a valid token when one is sent, otherwise None; for auditing open routes"""
+    if credentials is None:
+        return None
+    try:
+        payload = decode_token(credentials.credentials)
+    except HTTPException:
+        return None
+    return None if payload.get("scope") else payload.get("sub")
+
+
+async def get_stream_user(ticket: Optional[str] = Query(None)):
+    """
+    Authenticated user for event streams.
+
+    Browsers' EventSource cannot send headers, so streams take a ticket
+    from ``create_stream_ticket`` in the ``ticket`` query parameter. Query
+    strings end up in access and proxy logs, so the login token itself is
+    never accepted here.
+    """
+    if not ticket:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+        )
+    payload = decode_token(ticket)
+    username: str = payload.get("sub")
+    if username is None or payload.get("scope") != STREAM_TICKET_SCOPE:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
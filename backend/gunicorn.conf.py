@@ -0,0 +1,37 @@
+"""
+Multi-worker run mode:
+
+    cd backend && gunicorn server:app -c gunicorn.conf.py
+
+Every worker is a separate uvicorn process with its own Mongo client,
+in-memory indexes and rendered payloads. Set CACHE_URL to a
+Redis-compatible server so workers (and nodes) share rendered payloads and
+see each other's invalidations; without it each worker only learns about
+changes it made itself.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8001')
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+keepalive = int(os.environ.get('KEEPALIVE_SECONDS', '5'))
+timeout = int(os.environ.get('WORKER_TIMEOUT_SECONDS', '60'))
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT_SECONDS', '30'))
+# Recycle workers now and then to bound memory growth; jitter avoids restarting them together
+max_requests = int(os.environ.get('MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+# Each worker imports the app itself, so its Mongo client and background
+# tasks are created after the fork
+preload_app = False
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    if workers > 1 and not os.environ.get('CACHE_URL'):
+        server.log.warning(
+            "Running %d workers without CACHE_URL: catalog and content caches "
+            "will not be invalidated across workers", workers
+        )
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class SalesRow(BaseModel):
+    """Sales of one period (and group, when grouped)"""
+    period: str  # first day of the day, week (Monday) or month, YYYY-MM-DD
+    product_id: Optional[str] = None
+    product_name: Optional[str] = None
+    category: Optional[str] = None
+    currency: Optional[str] = None
+    orders: int  # orders containing the product; adds up to order lines across products
+    quantity: int
+    revenue: Optional[float] = None  # in `currency`, only when grouped or filtered by currency
+    revenue_base: float  # in the pricing base currency
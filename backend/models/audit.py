@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+
+class AuditRecord(BaseModel):
+    """One admin action, as stored in the audit log"""
+    id: str
+    at: datetime
+    actor: Optional[str] = None  # admin username, None when the route is not authenticated
+    action: str
+    entity: str
+    entity_id: Optional[str] = None
+    details: Dict[str, Any] = Field(default_factory=dict)
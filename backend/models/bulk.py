@@ -0,0 +1,46 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
+from datetime import datetime
+
+
+class BulkStatusFilter(BaseModel):
+    """Selects documents by their current status and creation date"""
+    status: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+
+class BulkStatusRequest(BaseModel):
+    """Move many documents to one status, chosen by id or by filter"""
+    status: str
+    ids: Optional[List[str]] = Field(default=None, min_length=1)
+    filter: Optional[BulkStatusFilter] = None
+
+    @model_validator(mode='after')
+    def validate_selection(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError('Indique ids o filter, no ambos')
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "status": "reviewed",
+                "filter": {"status": "pending", "created_before": "2025-01-01T00:00:00"}
+            }
+        }
+
+
+class BulkStatusItemResult(BaseModel):
+    """Outcome for one document"""
+    id: str
+    outcome: str  # updated, unchanged, invalid_transition, not_found, conflict
+    previous: Optional[str] = None
+
+
+class BulkStatusResult(BaseModel):
+    """Summary of a bulk status change"""
+    status: str
+    matched: int
+    updated: int
+    results: List[BulkStatusItemResult]
@@ -0,0 +1,53 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime, timedelta
+from models.order import OrderItem
+import uuid
+import os
+
+CART_TTL_HOURS = int(os.environ.get('CART_TTL_HOURS', '72'))
+
+
+def cart_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(hours=CART_TTL_HOURS)
+
+
+class CartItem(BaseModel):
+    """Product and quantity requested in a cart"""
+    product_id: str
+    quantity: int = Field(default=1, ge=1)
+
+
+class CartSnapshot(BaseModel):
+    """Validated, priced contents of a cart"""
+    items: List[OrderItem]
+    subtotal: float
+    currency: str = Field(default="USD")
+    priced_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class Cart(BaseModel):
+    """Server-side shopping cart"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    items: List[CartItem] = Field(default_factory=list)
+    snapshot: Optional[CartSnapshot] = None
+    revision: int = Field(default=0)  # bumped whenever the snapshot is invalidated
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(default_factory=cart_expiry)
+
+
+class CartUpdate(BaseModel):
+    """Schema for replacing the contents of a cart"""
+    items: List[CartItem] = Field(default_factory=list)
+
+
+class CartResponse(BaseModel):
+    """Priced cart returned to the client"""
+    id: str
+    items: List[OrderItem]
+    subtotal: float
+    tax: float = 0.0
+    total: float
+    currency: str
+    expires_at: datetime
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, field_validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import uuid
 
@@ -28,7 +28,8 @@ class ContactSubmission(BaseModel):
     def validate_subject(cls, v):
         if not v or not v.strip():
             raise ValueError('El asunto es requerido')
-        return v.strip()
+        # Single line: the subject ends up in an email header
+        return " ".join(v.split())
 
     @field_validator('message')
     @classmethod
@@ -69,7 +70,8 @@ class ContactSubmissionCreate(BaseModel):
     def validate_subject(cls, v):
         if not v or not v.strip():
             raise ValueError('El asunto es requerido')
-        return v.strip()
+        # Single line: the subject ends up in an email header
+        return " ".join(v.split())
 
     @field_validator('message')
     @classmethod
@@ -84,3 +86,26 @@ class ContactSubmissionResponse(BaseModel):
     success: bool
     message: str
     id: Optional[str] = None
+
+
+class ContactSearchHit(ContactSubmission):
+    """Contact submission with its search relevance score"""
+    score: float
+
+
+class ContactSearchResults(BaseModel):
+    """Ranked, paginated contact search results"""
+    total: int
+    limit: int
+    skip: int
+    results: List[ContactSearchHit]
+
+
+class ContactSubmissionSummary(BaseModel):
+    """Contact submission fields shown in list views"""
+    id: str
+    name: str
+    email: EmailStr
+    subject: str
+    status: str
+    created_at: datetime
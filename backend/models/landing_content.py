@@ -76,6 +76,7 @@ class LandingContent(BaseModel):
     testimonials_title: str = "Lo que dicen nuestros clientes"
     testimonials_subtitle: str = "La confianza de quienes buscan la verdad"
     testimonials: List[Testimonial] = []
+    version: int = 0  # bumped on every edit, for optimistic concurrency
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -95,3 +96,4 @@ class LandingContentUpdate(BaseModel):
     testimonials_title: Optional[str] = None
     testimonials_subtitle: Optional[str] = None
     testimonials: Optional[List[Testimonial]] = None
+    version: Optional[int] = None  # version the edit is based on; 409 if it changed meanwhile
@@ -10,6 +10,7 @@ class OrderItem(BaseModel):
     product_name: str
     price: float
     quantity: int = Field(default=1)
+    category: Optional[str] = None  # product category at purchase time, for promotions and reports
 
 
 class Order(BaseModel):
@@ -20,12 +21,19 @@ class Order(BaseModel):
     customer_phone: Optional[str] = None
     items: List[OrderItem]
     subtotal: float
+    discount: float = Field(default=0.0)
     tax: float = Field(default=0.0)
     total: float
     currency: str = Field(default="USD")
+    total_minor: Optional[int] = None  # total in the currency's minor unit, as charged by Stripe
+    fx_rate: float = Field(default=1.0)  # base currency -> order currency rate used for pricing
+    tax_region: Optional[str] = None  # country code whose tax rate was applied
+    coupon_code: Optional[str] = None
+    promotion_ids: List[str] = Field(default_factory=list)  # promotions redeemed by this order
     status: str = Field(default="pending")  # pending, paid, completed, cancelled
     payment_intent_id: Optional[str] = None  # Stripe payment intent ID
     payment_status: Optional[str] = None  # Stripe payment status
+    stock_holds: int = Field(default=0)  # number of stock reservations taken for this order
     billing_address: Optional[dict] = None
     shipping_address: Optional[dict] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -65,3 +73,32 @@ class OrderUpdate(BaseModel):
     status: Optional[str] = None
     payment_status: Optional[str] = None
     payment_intent_id: Optional[str] = None
+
+
+class OrderSummary(BaseModel):
+    """Order fields shown in the admin order list"""
+    id: str
+    customer_name: str
+    customer_email: EmailStr
+    customer_phone: Optional[str] = None
+    items: List[OrderItem]
+    total: float
+    currency: str = "USD"
+    status: str
+    created_at: datetime
+
+
+class OrderStatusItem(BaseModel):
+    product_name: str
+    quantity: int = 1
+
+
+class OrderStatus(BaseModel):
+    """Compact order view polled by the payment confirmation page"""
+    id: str
+    status: str
+    payment_status: Optional[str] = None
+    total: float
+    currency: str = "USD"
+    items: List[OrderStatusItem]
+    updated_at: Optional[datetime] = None
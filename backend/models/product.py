@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 import uuid
 
@@ -20,6 +20,7 @@ class Product(BaseModel):
     modules: Optional[int] = None
     certificate: bool = Field(default=True)
     stock: Optional[int] = None  # None = unlimited
+    version: int = Field(default=0)  # bumped on every edit, for optimistic concurrency
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -39,6 +40,20 @@ class Product(BaseModel):
         }
 
 
+class ProductSummary(BaseModel):
+    """Product fields shown in catalog listings"""
+    id: str
+    name: str
+    slug: str
+    description: str
+    price: float
+    currency: str = "USD"
+    category: str = "Diplomado"
+    image_url: Optional[str] = None
+    duration: Optional[str] = None
+    modules: Optional[int] = None
+
+
 class ProductCreate(BaseModel):
     """Schema for creating a product"""
     name: str = Field(..., min_length=3, max_length=200)
@@ -54,6 +69,36 @@ class ProductCreate(BaseModel):
     stock: Optional[int] = None
 
 
+class ProductImport(ProductCreate):
+    """One row of a bulk product import, matched to existing products by slug"""
+    is_active: bool = Field(default=True)
+    certificate: bool = Field(default=True)
+
+
+class ProductBulkRequest(BaseModel):
+    """Rows to upsert; each row is validated on its own so errors are reported per row"""
+    products: List[Dict[str, Any]] = Field(..., min_length=1)
+    dry_run: bool = False
+
+
+class ProductBulkRowResult(BaseModel):
+    """Outcome of one bulk import row"""
+    index: int
+    slug: Optional[str] = None
+    action: str  # created, updated, error
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ProductBulkResult(BaseModel):
+    """Summary of a bulk import"""
+    dry_run: bool
+    created: int
+    updated: int
+    errors: int
+    results: List[ProductBulkRowResult]
+
+
 class ProductUpdate(BaseModel):
     """Schema for updating a product"""
     name: Optional[str] = None
@@ -62,4 +107,36 @@ class ProductUpdate(BaseModel):
     is_active: Optional[bool] = None
     image_url: Optional[str] = None
     features: Optional[List[str]] = None
+    duration: Optional[str] = None
+    modules: Optional[int] = None
     stock: Optional[int] = None
+    version: Optional[int] = None  # version the edit is based on; 409 if it changed meanwhile
+
+
+class ProductSearchHit(Product):
+    """Product with its search relevance score"""
+    score: float
+
+
+class ProductSearchResults(BaseModel):
+    """Ranked, paginated product search results"""
+    total: int
+    limit: int
+    skip: int
+    results: List[ProductSearchHit]
+
+
+class FacetCount(BaseModel):
+    """Number of products carrying a facet value"""
+    value: str
+    count: int
+
+
+class CatalogBrowseResults(BaseModel):
+    """Filtered catalog page with facet counts"""
+    total: int
+    limit: int
+    skip: int
+    sort: str
+    results: List[Product]
+    facets: Dict[str, List[FacetCount]]
@@ -0,0 +1,87 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
+from datetime import datetime
+import uuid
+
+# Kinds whose value is a percentage of the eligible amount
+PERCENT_KINDS = ("percentage", "bundle")
+
+
+def check_percent_value(kind: str, value: float):
+    if kind in PERCENT_KINDS and value > 100:
+        raise ValueError(f'value is a percentage for {kind} promotions and must not exceed 100')
+
+
+class Promotion(BaseModel):
+    """Coupon (with code) or automatic promotion (without code)"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    code: Optional[str] = None  # stored upper-case; None = applied automatically
+    name: str = Field(..., min_length=3, max_length=200)
+    kind: Literal["percentage", "fixed", "bundle"]
+    value: float = Field(..., gt=0)  # percent for percentage/bundle, base-currency amount for fixed
+    category: Optional[str] = None  # limit to one category
+    product_ids: List[str] = Field(default_factory=list)  # limit to these products
+    min_quantity: int = Field(default=1, ge=1)  # eligible units needed (bundle size)
+    min_subtotal: float = Field(default=0.0, ge=0)
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    max_redemptions: Optional[int] = Field(default=None, ge=1)  # None = unlimited
+    redemptions: int = Field(default=0)
+    is_active: bool = Field(default=True)
+    version: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @model_validator(mode='after')
+    def validate_value(self):
+        check_percent_value(self.kind, self.value)
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "code": "PERITO20",
+                "name": "20% en diplomados",
+                "kind": "percentage",
+                "value": 20,
+                "category": "Diplomado",
+                "ends_at": "2025-12-31T23:59:59",
+                "max_redemptions": 100
+            }
+        }
+
+
+class PromotionCreate(BaseModel):
+    """Schema for creating a promotion"""
+    code: Optional[str] = None
+    name: str = Field(..., min_length=3, max_length=200)
+    kind: Literal["percentage", "fixed", "bundle"]
+    value: float = Field(..., gt=0)
+    category: Optional[str] = None
+    product_ids: List[str] = Field(default_factory=list)
+    min_quantity: int = Field(default=1, ge=1)
+    min_subtotal: float = Field(default=0.0, ge=0)
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    max_redemptions: Optional[int] = Field(default=None, ge=1)
+    is_active: bool = True
+
+    @model_validator(mode='after')
+    def validate_value(self):
+        check_percent_value(self.kind, self.value)
+        return self
+
+
+class PromotionUpdate(BaseModel):
+    """Schema for updating a promotion"""
+    name: Optional[str] = None
+    value: Optional[float] = Field(default=None, gt=0)
+    category: Optional[str] = None
+    product_ids: Optional[List[str]] = None
+    min_quantity: Optional[int] = Field(default=None, ge=1)
+    min_subtotal: Optional[float] = Field(default=None, ge=0)
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    max_redemptions: Optional[int] = Field(default=None, ge=1)
+    is_active: Optional[bool] = None
+    version: Optional[int] = None  # version the edit is based on; 409 if it changed meanwhile
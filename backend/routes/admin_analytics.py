@@ -0,0 +1,123 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from typing import List, Optional
+from models.analytics import SalesRow
+from auth import get_current_user
+from services.analytics import sales_report, export_sales, PERIODS, GROUPS
+from services.serialization import encoded_response
+from datetime import date
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/analytics", tags=["admin-analytics"])
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def get_db():
+    from server import db
+    return db
+
+
+def parse_group_by(group_by: Optional[str]) -> List[str]:
+    groups = [g.strip() for g in (group_by or "").split(",") if g.strip()]
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown group_by: {', '.join(unknown)}. Must be any of: {', '.join(GROUPS)}"
+        )
+    return groups
+
+
+async def load_sales(start: date, end: date, period: str, group_by: Optional[str], product_id, category, currency):
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must not be before start"
+        )
+    return await sales_report(
+        get_db(), start, end,
+        period=period, group_by=parse_group_by(group_by),
+        product_id=product_id, category=category, currency=currency
+    )
+
+
+@router.get("/sales", response_model=List[SalesRow])
+async def get_sales(
+    request: Request,
+    start: date,
+    end: date,
+    period: str = Query(default="day", pattern=f"^({'|'.join(PERIODS)})$"),
+    group_by: Optional[str] = None,
+    product_id: Optional[str] = None,
+    category: Optional[str] = None,
+    currency: Optional[str] = None,
+    username: str = Depends(get_current_user)
+):
+    """
+    Paid sales between two dates, from the daily sales buckets (admin only)
+    
+    - **start** / **end**: First and last day, inclusive (YYYY-MM-DD, UTC)
+    - **period**: Rollup: day, week (starting Monday) or month
+    - **group_by**: Comma-separated: product, category, currency (default: totals per period)
+    - **product_id** / **category** / **currency**: Filters
+    
+    `revenue` (in the currency) is only given when grouped or filtered by
+    currency; `revenue_base` is always in the pricing base currency.
+    """
+    try:
+        rows = await load_sales(start, end, period, group_by, product_id, category, currency)
+        return encoded_response(request, rows)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching sales analytics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching sales analytics"
+        )
+
+
+@router.get("/sales/export")
+async def export_sales_report(
+    start: date,
+    end: date,
+    format: str = Query(default="csv", pattern="^(csv|parquet)$"),
+    period: str = Query(default="day", pattern=f"^({'|'.join(PERIODS)})$"),
+    group_by: Optional[str] = None,
+    product_id: Optional[str] = None,
+    category: Optional[str] = None,
+    currency: Optional[str] = None,
+    username: str = Depends(get_current_user)
+):
+    """
+    The same report as a CSV or Parquet file (admin only)
+    
+    - **format**: csv or parquet
+    """
+    try:
+        rows = await load_sales(start, end, period, group_by, product_id, category, currency)
+        content = await export_sales(rows, format)
+        filename = f"sales_{period}_{start.isoformat()}_{end.isoformat()}.{format}"
+        return Response(
+            content=content,
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    except HTTPException:
+        raise
+    except ImportError as e:
+        logger.error(f"Sales export dependency missing: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"{format} export is not available on this server: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"Error exporting sales analytics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error exporting sales analytics"
+        )
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from typing import List, Optional
+from models.audit import AuditRecord
+from auth import get_current_user
+from services.audit import audit_query, find_records, AUDIT_QUERY_MAX
+from services.serialization import encoded_response
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/audit", tags=["admin-audit"])
+
+
+def get_db():
+    from server import db
+    return db
+
+
+@router.get("", response_model=List[AuditRecord])
+async def get_audit_records(
+    request: Request,
+    actor: Optional[str] = None,
+    entity: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(default=100, ge=1, le=AUDIT_QUERY_MAX),
+    skip: int = Query(default=0, ge=0),
+    username: str = Depends(get_current_user)
+):
+    """
+    Query the audit log, newest first (admin only)
+    
+    - **actor**: Admin username
+    - **entity**: Kind of entity (order, contact, product, promotion, landing_content, image, job, admin)
+    - **entity_id**: Id of the entity
+    - **start** / **end**: Time range (UTC), end exclusive
+    
+    Records are written in batches, a few seconds after the action.
+    """
+    try:
+        query = audit_query(actor, entity, entity_id, start, end)
+        records = await find_records(get_db(), query, limit=limit, skip=skip)
+        return encoded_response(request, records)
+    
+    except Exception as e:
+        logger.error(f"Error fetching audit records: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching audit records"
+        )
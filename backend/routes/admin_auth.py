@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from models.admin import AdminUser, AdminUserCreate, AdminUserLogin, Token
 from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from services.audit import audit_log
 from datetime import datetime, timedelta
 import logging
 
@@ -53,6 +54,7 @@ async def register_admin(admin: AdminUserCreate):
         
         await admin_users.insert_one(admin_user.model_dump())
         
+        audit_log.record(None, "register", "admin", admin.username)
         logger.info(f"Admin user created: {admin.username}")
         
         return {"success": True, "message": "Admin user created successfully", "username": admin.username}
@@ -100,6 +102,7 @@ async def login_admin(credentials: AdminUserLogin):
         # Create access token
         access_token = create_access_token(data={"sub": admin["username"]})
         
+        audit_log.record(admin["username"], "login", "admin", admin["username"])
         logger.info(f"Admin logged in: {credentials.username}")
         
         return {"access_token": access_token, "token_type": "bearer"}
@@ -2,6 +2,9 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from typing import List
 from models.landing_content import LandingContent, LandingContentUpdate
 from auth import get_current_user
+from services.compression import published_payloads
+from services.versioning import update_versioned
+from services.audit import audit_log
 from datetime import datetime
 import logging
 
@@ -9,6 +12,8 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin/content", tags=["admin-content"])
 
+LANDING_PAYLOAD = "landing"
+
 
 def get_db():
     from server import db
@@ -54,34 +59,37 @@ async def update_landing_content(
 ):
     """
     Update landing page content (admin only)
+    
+    Send the content's current `version` to reject the edit with 409 if
+    another admin saved changes since it was loaded.
     """
     try:
         content_collection = get_content_collection()
         
-        # Get existing content
-        existing = await content_collection.find_one()
-        
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Landing content not found"
-            )
-        
         # Update only provided fields
         update_data = content_update.model_dump(exclude_unset=True)
+        expected_version = update_data.pop("version", None)
         update_data["updated_at"] = datetime.utcnow()
         
-        result = await content_collection.update_one(
-            {"id": existing["id"]},
-            {"$set": update_data}
-        )
+        # There is a single landing document
+        updated = await update_versioned(content_collection, {}, update_data, expected_version)
         
-        if result.modified_count == 0:
-            logger.warning("No changes made to landing content")
+        if not updated:
+            if expected_version is not None and await content_collection.count_documents({}, limit=1):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Landing content was changed by someone else. Reload and try again"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Landing content not found"
+            )
         
-        # Get updated content
-        updated = await content_collection.find_one({"id": existing["id"]})
+        await published_payloads.invalidate(LANDING_PAYLOAD)
         
+        audit_log.record(username, "update", "landing_content", details={
+            "fields": sorted(k for k in update_data if k != "updated_at"), "version": updated.get("version")
+        })
         logger.info(f"Landing content updated by {username}")
         
         return LandingContent(**updated)
@@ -173,7 +181,9 @@ async def initialize_landing_content(username: str = Depends(get_current_user)):
         )
         
         await content_collection.insert_one(default_content.model_dump())
+        await published_payloads.invalidate(LANDING_PAYLOAD)
         
+        audit_log.record(username, "initialize", "landing_content")
         logger.info(f"Landing content initialized by {username}")
         
         return {"success": True, "message": "Landing content initialized successfully"}
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from auth import get_current_user, get_stream_user, create_stream_ticket, STREAM_TICKET_SECONDS
+from services.events import event_bus, sse_message, SSE_HEARTBEAT, SSE_HEARTBEAT_SECONDS
+from services.orders import ORDER_EVENTS
+from services.dashboard import order_stats, stats_delta, CONTACT_EVENTS, ADMIN_STATS_RESYNC_SECONDS
+import asyncio
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/events", tags=["admin-events"])
+
+# Streams are closed after this long; EventSource reconnects on its own
+ADMIN_EVENTS_MAX_SECONDS = int(os.environ.get('ADMIN_EVENTS_MAX_SECONDS', '3600'))
+
+
+def get_db():
+    from server import db
+    return db
+
+
+@router.post("/ticket")
+async def create_events_ticket(username: str = Depends(get_current_user)):
+    """
+    Ticket for opening the admin event stream (admin only)
+    
+    EventSource cannot send the Authorization header, so the stream URL
+    carries this ticket instead of the login token: it only opens event
+    streams and expires after `expires_in` seconds. Get a new one to reconnect.
+    """
+    return {"ticket": create_stream_ticket(username), "expires_in": STREAM_TICKET_SECONDS}
+
+
+@router.get("")
+async def stream_admin_events(username: str = Depends(get_stream_user)):
+    """
+    Server-sent events for the admin dashboard (admin only)
+    
+    - `stats`: order statistics, on connect and every few minutes
+    - `stats-delta`: changes to add to the last `stats` values
+    - `order`: a new order (`type: created`) or a status change
+    - `contact`: a new contact submission or a status change
+    
+    Open it with `?ticket=` from POST /api/admin/events/ticket.
+    If the stats cannot be read the stream ends and the browser reconnects.
+    """
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + ADMIN_EVENTS_MAX_SECONDS
+        # Subscribe before reading the stats so no change in between is missed
+        async with event_bus.subscribe(ORDER_EVENTS, CONTACT_EVENTS) as events:
+            try:
+                snapshot = await order_stats(get_db())
+            except Exception as e:
+                logger.error(f"Error fetching order stats: {str(e)}")
+                return
+            while loop.time() < deadline:
+                if snapshot is not None:
+                    yield sse_message("stats", json.dumps(snapshot))
+                    resync_at = loop.time() + ADMIN_STATS_RESYNC_SECONDS
+                    snapshot = None
+                try:
+                    event = await asyncio.wait_for(
+                        events.get(), min(SSE_HEARTBEAT_SECONDS, deadline - loop.time())
+                    )
+                except asyncio.TimeoutError:
+                    yield SSE_HEARTBEAT
+                else:
+                    kind = "order" if "order_id" in event else "contact"
+                    yield sse_message(kind, json.dumps(event, default=str))
+                    delta = stats_delta(event)
+                    if delta:
+                        yield sse_message("stats-delta", json.dumps(delta))
+                if loop.time() >= resync_at:
+                    try:
+                        snapshot = await order_stats(get_db())
+                    except Exception as e:
+                        logger.error(f"Error refreshing order stats: {str(e)}")
+                        resync_at = loop.time() + ADMIN_STATS_RESYNC_SECONDS
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
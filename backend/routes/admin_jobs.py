@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, status, Depends
+from auth import get_current_user
+from services.audit import audit_log
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/jobs", tags=["admin-jobs"])
+
+
+def get_scheduler():
+    from server import scheduler
+    return scheduler
+
+
+@router.get("")
+async def get_jobs(username: str = Depends(get_current_user)):
+    """
+    List background jobs with their latest run (admin only)
+    
+    Runs are recorded by whichever node held the scheduler lease.
+    """
+    try:
+        scheduler = get_scheduler()
+        
+        jobs = []
+        for job in scheduler.jobs.values():
+            last_run = await scheduler.db.job_runs.find_one(
+                {"job": job.name}, {"_id": 0}, sort=[("started_at", -1)]
+            )
+            jobs.append({
+                "name": job.name,
+                "interval_seconds": job.interval,
+                "last_run": last_run
+            })
+        
+        return {"node": scheduler.node_id, "is_leader": scheduler.is_leader, "jobs": jobs}
+    
+    except Exception as e:
+        logger.error(f"Error fetching jobs: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching jobs"
+        )
+
+
+@router.post("/{job_name}/run")
+async def run_job(job_name: str, username: str = Depends(get_current_user)):
+    """
+    Run a background job immediately on this node (admin only)
+    """
+    scheduler = get_scheduler()
+    job = scheduler.jobs.get(job_name)
+    
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    run = await scheduler.run_job(job)
+    
+    audit_log.record(username, "run", "job", job_name)
+    logger.info(f"Job {job_name} run manually by {username}")
+    
+    return run
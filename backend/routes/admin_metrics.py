@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from auth import get_current_user
+from services.single_flight import flight_stats
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/metrics", tags=["admin-metrics"])
+
+
+@router.get("/single-flight")
+async def get_single_flight_metrics(username: str = Depends(get_current_user)):
+    """
+    Coalesced read counters of the worker serving the request (admin only)
+    
+    Per group and key: `executions` that reached the database and requests
+    `collapsed` into an execution already in flight.
+    """
+    return {"worker": os.getpid(), "groups": flight_stats()}
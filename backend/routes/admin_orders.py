@@ -1,7 +1,16 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from typing import List, Optional
-from models.order import Order
+from models.order import Order, OrderSummary
+from models.bulk import BulkStatusRequest, BulkStatusResult
 from auth import get_current_user
+from services.serialization import encoded_response
+from services.projection import build_projection
+from services.archive import read_archived_range
+from services.orders import order_status_changed, sale_cancelled, bulk_set_order_status, ORDER_TRANSITIONS
+from services.bulk_status import status_filter_query, bulk_audit_details
+from services.dashboard import order_stats
+from services.audit import audit_log
+from datetime import date, datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,10 +28,12 @@ def get_orders_collection():
     return db.orders
 
 
-@router.get("", response_model=List[Order])
+@router.get("", response_model=List[OrderSummary])
 async def get_all_orders(
+    request: Request,
     username: str = Depends(get_current_user),
     status_filter: Optional[str] = None,
+    fields: Optional[str] = None,
     limit: int = Query(default=100, le=500),
     skip: int = 0
 ):
@@ -30,9 +41,20 @@ async def get_all_orders(
     Get all orders (admin only)
     
     - **status_filter**: Filter by status (pending, paid, completed, cancelled)
+    - **fields**: Comma-separated fields to return, `*` for full orders (default: summary)
     - **limit**: Maximum number of orders to return
     - **skip**: Number of orders to skip (pagination)
+    
+    Send `Accept: application/msgpack` to receive MessagePack instead of JSON.
     """
+    try:
+        projection = build_projection(fields, Order, OrderSummary)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {e}"
+        )
+    
     try:
         orders_collection = get_orders_collection()
         
@@ -40,10 +62,11 @@ async def get_all_orders(
         if status_filter:
             query["status"] = status_filter
         
-        cursor = orders_collection.find(query).sort("created_at", -1).skip(skip).limit(limit)
+        cursor = orders_collection.find(query, projection).sort("created_at", -1).skip(skip).limit(limit)
         orders = await cursor.to_list(length=limit)
         
-        return [Order(**order) for order in orders]
+        # Documents were validated as Order on insert, skip re-validation
+        return encoded_response(request, orders)
     
     except Exception as e:
         logger.error(f"Error fetching orders: {str(e)}")
@@ -53,32 +76,40 @@ async def get_all_orders(
         )
 
 
+@router.get("/archive", response_model=List[Order])
+async def get_archived_orders(
+    request: Request,
+    start: date,
+    end: date,
+    username: str = Depends(get_current_user),
+    limit: int = Query(default=500, le=5000)
+):
+    """
+    Get archived orders created between two dates (admin only)
+    
+    - **start**: First day (YYYY-MM-DD)
+    - **end**: Last day, inclusive (YYYY-MM-DD)
+    - **limit**: Maximum number of orders to return
+    """
+    try:
+        orders = await read_archived_range(get_db(), "orders", start.isoformat(), end.isoformat(), limit)
+        return encoded_response(request, orders)
+    
+    except Exception as e:
+        logger.error(f"Error fetching archived orders: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching archived orders"
+        )
+
+
 @router.get("/stats")
 async def get_order_stats(username: str = Depends(get_current_user)):
     """
     Get order statistics (admin only)
     """
     try:
-        orders_collection = get_orders_collection()
-        
-        total_orders = await orders_collection.count_documents({})
-        paid_orders = await orders_collection.count_documents({"status": "paid"})
-        pending_orders = await orders_collection.count_documents({"status": "pending"})
-        
-        # Calculate total revenue
-        pipeline = [
-            {"$match": {"status": "paid"}},
-            {"$group": {"_id": None, "total_revenue": {"$sum": "$total"}}}
-        ]
-        revenue_result = await orders_collection.aggregate(pipeline).to_list(1)
-        total_revenue = revenue_result[0]["total_revenue"] if revenue_result else 0
-        
-        return {
-            "total_orders": total_orders,
-            "paid_orders": paid_orders,
-            "pending_orders": pending_orders,
-            "total_revenue": round(total_revenue, 2)
-        }
+        return await order_stats(get_db())
     
     except Exception as e:
         logger.error(f"Error fetching order stats: {str(e)}")
@@ -107,17 +138,24 @@ async def update_order_status(
                 detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
             )
         
-        result = await orders_collection.update_one(
+        previous = await orders_collection.find_one_and_update(
             {"id": order_id},
-            {"$set": {"status": new_status}}
+            {"$set": {"status": new_status, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "id": 1, "status": 1, "total": 1, "fx_rate": 1}
         )
         
-        if result.matched_count == 0:
+        if previous is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Order not found"
             )
         
+        if previous["status"] != new_status:
+            await order_status_changed(previous, new_status, previous["status"])
+        if new_status == "cancelled" and previous["status"] in ("paid", "completed"):
+            await sale_cancelled(get_db(), order_id)
+        audit_log.record(username, "update_status", "order", order_id, {"from": previous["status"], "to": new_status})
+        
         logger.info(f"Order {order_id} status updated to {new_status} by {username}")
         
         return {"success": True, "message": "Order status updated"}
@@ -130,3 +168,51 @@ async def update_order_status(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error updating order status"
         )
+
+
+@router.post("/bulk-status", response_model=BulkStatusResult)
+async def bulk_update_order_status(
+    bulk_request: BulkStatusRequest,
+    username: str = Depends(get_current_user)
+):
+    """
+    Update the status of many orders at once (admin only)
+    
+    - **status**: Target status
+    - **ids**: Orders to update, or
+    - **filter**: Orders to update by current `status` and `created_after`/`created_before`
+    
+    Only pending -> cancelled and paid -> completed/cancelled are allowed.
+    Each order gets its own outcome: updated, unchanged, invalid_transition,
+    not_found or conflict (its status changed meanwhile, or it is a pending
+    order whose payment went through or is in progress).
+    """
+    targets = sorted(set().union(*ORDER_TRANSITIONS.values()))
+    if bulk_request.status not in targets:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid status. Bulk updates can only move orders to: {', '.join(targets)}"
+        )
+    
+    try:
+        query = status_filter_query(**bulk_request.filter.model_dump()) if bulk_request.filter else None
+        summary = await bulk_set_order_status(get_db(), bulk_request.status, ids=bulk_request.ids, query=query)
+        audit_log.record(username, "bulk_update_status", "order", details=bulk_audit_details(bulk_request, summary))
+        
+        logger.info(
+            f"Bulk order status to {bulk_request.status} by {username}: "
+            f"{summary['updated']} updated of {len(summary['results'])}"
+        )
+        return summary
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many orders: {e}"
+        )
+    except Exception as e:
+        logger.error(f"Error updating order statuses: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error updating order statuses"
+        )
@@ -0,0 +1,196 @@
+from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List, Optional
+from pymongo.errors import DuplicateKeyError
+from models.promotion import Promotion, PromotionCreate, PromotionUpdate, PERCENT_KINDS
+from auth import get_current_user
+from services.promotions import promotions_index
+from services.versioning import update_versioned
+from services.shared_cache import shared_cache
+from services.audit import audit_log
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin/promotions", tags=["admin-promotions"])
+
+
+def get_db():
+    from server import db
+    return db
+
+
+def get_promotions_collection():
+    db = get_db()
+    return db.promotions
+
+
+@shared_cache.subscribe("promotions")
+async def refresh_promotions(promotion_ids: Optional[List[str]]):
+    """Apply promotions changed by another worker to this worker's index"""
+    if promotion_ids is None:
+        promotions_index.clear()
+        return
+    promotions = await get_promotions_collection().find(
+        {"id": {"$in": promotion_ids}}, {"_id": 0}
+    ).to_list(length=len(promotion_ids))
+    for promotion in promotions:
+        promotions_index.upsert(promotion)
+    for promotion_id in set(promotion_ids) - {promotion["id"] for promotion in promotions}:
+        promotions_index.remove(promotion_id)
+
+
+@router.get("", response_model=List[Promotion])
+async def get_promotions(username: str = Depends(get_current_user)):
+    """
+    List all promotions and coupons with their redemption counts (admin only)
+    """
+    try:
+        promotions_collection = get_promotions_collection()
+        return await promotions_collection.find({}, {"_id": 0}).sort("created_at", -1).to_list(length=None)
+    
+    except Exception as e:
+        logger.error(f"Error fetching promotions: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching promotions"
+        )
+
+
+@router.post("", response_model=Promotion, status_code=status.HTTP_201_CREATED)
+async def create_promotion(
+    promotion: PromotionCreate,
+    username: str = Depends(get_current_user)
+):
+    """
+    Create a promotion (admin only)
+    
+    - **code**: Coupon code; leave empty for a promotion applied automatically
+    - **kind**: percentage, fixed (base-currency amount) or bundle (value% off every `min_quantity` eligible units)
+    - **category** / **product_ids**: Limit the promotion to a category or to products
+    - **starts_at** / **ends_at**: Validity window (UTC)
+    - **max_redemptions**: Total uses allowed, enforced atomically at checkout
+    """
+    try:
+        promotions_collection = get_promotions_collection()
+        
+        data = promotion.model_dump()
+        if data["code"]:
+            data["code"] = data["code"].strip().upper()
+        promotion_data = Promotion(**data)
+        
+        await promotions_collection.insert_one(promotion_data.model_dump())
+        promotions_index.upsert(promotion_data.model_dump())
+        await shared_cache.invalidate("promotions", [promotion_data.id])
+        
+        audit_log.record(username, "create", "promotion", promotion_data.id, {"code": promotion_data.code})
+        logger.info(f"Promotion {promotion_data.id} created by {username}")
+        return promotion_data
+    
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A promotion with this code already exists"
+        )
+    except Exception as e:
+        logger.error(f"Error creating promotion: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error creating promotion"
+        )
+
+
+@router.patch("/{promotion_id}", response_model=Promotion)
+async def update_promotion(
+    promotion_id: str,
+    promotion_update: PromotionUpdate,
+    username: str = Depends(get_current_user)
+):
+    """
+    Update a promotion (admin only)
+    
+    Send the promotion's current `version` to get 409 instead of overwriting
+    a concurrent edit.
+    """
+    try:
+        promotions_collection = get_promotions_collection()
+        
+        update_data = promotion_update.model_dump(exclude_unset=True)
+        expected_version = update_data.pop("version", None)
+        update_data["updated_at"] = datetime.utcnow()
+        
+        query = {"id": promotion_id}
+        if (update_data.get("value") or 0) > 100:
+            # A percentage above 100 would take the whole order; only fixed amounts may go that high
+            query["kind"] = {"$nin": list(PERCENT_KINDS)}
+        
+        updated = await update_versioned(
+            promotions_collection, query, update_data, expected_version
+        )
+        
+        if not updated:
+            if "kind" in query and await promotions_collection.count_documents(
+                {"id": promotion_id, "kind": {"$in": list(PERCENT_KINDS)}}, limit=1
+            ):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="value is a percentage for this promotion and must not exceed 100"
+                )
+            if expected_version is not None and await promotions_collection.count_documents({"id": promotion_id}, limit=1):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Promotion was changed by someone else. Reload and try again"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Promotion not found"
+            )
+        
+        promotions_index.upsert(updated)
+        await shared_cache.invalidate("promotions", [promotion_id])
+        
+        audit_log.record(username, "update", "promotion", promotion_id, {"fields": sorted(k for k in update_data if k != "updated_at")})
+        logger.info(f"Promotion {promotion_id} updated by {username}")
+        return Promotion(**updated)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating promotion: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error updating promotion"
+        )
+
+
+@router.delete("/{promotion_id}")
+async def delete_promotion(promotion_id: str, username: str = Depends(get_current_user)):
+    """
+    Delete a promotion (admin only)
+    
+    Orders that already redeemed it keep their discount.
+    """
+    try:
+        result = await get_promotions_collection().delete_one({"id": promotion_id})
+        
+        if result.deleted_count == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Promotion not found"
+            )
+        
+        promotions_index.remove(promotion_id)
+        await shared_cache.invalidate("promotions", [promotion_id])
+        
+        audit_log.record(username, "delete", "promotion", promotion_id)
+        logger.info(f"Promotion {promotion_id} deleted by {username}")
+        return {"success": True, "message": "Promotion deleted"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting promotion: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error deleting promotion"
+        )
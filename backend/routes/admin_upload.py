@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
 from auth import get_current_user
-from PIL import Image
+from services.audit import audit_log
 import os
 import uuid
 import logging
@@ -10,9 +10,7 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin/upload", tags=["admin-upload"])
 
-# Create uploads directory if it doesn't exist
 UPLOAD_DIR = Path("/app/frontend/public/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
@@ -47,6 +45,9 @@ async def upload_image(
                 detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
             )
         
+        # Create uploads directory on first upload, not at import
+        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        
         # Generate unique filename
         unique_filename = f"{uuid.uuid4()}{file_ext}"
         file_path = UPLOAD_DIR / unique_filename
@@ -55,8 +56,9 @@ async def upload_image(
         with open(file_path, "wb") as f:
             f.write(contents)
         
-        # Optimize image with PIL
+        # Optimize image with PIL (imported here, only admins upload)
         try:
+            from PIL import Image
             img = Image.open(file_path)
             
             # Convert to RGB if necessary
@@ -72,13 +74,14 @@ async def upload_image(
             
             # Save optimized image
             img.save(file_path, optimize=True, quality=85)
-            
+        
         except Exception as e:
             logger.warning(f"Image optimization failed: {str(e)}")
         
         # Return public URL
         public_url = f"/uploads/{unique_filename}"
         
+        audit_log.record(username, "upload", "image", unique_filename, {"original_filename": file.filename})
         logger.info(f"Image uploaded by {username}: {unique_filename}")
         
         return {
@@ -123,6 +126,7 @@ async def delete_image(
         
         file_path.unlink()
         
+        audit_log.record(username, "delete", "image", filename)
         logger.info(f"Image deleted by {username}: {filename}")
         
         return {"success": True, "message": "Image deleted"}
@@ -0,0 +1,189 @@
+from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+from models.cart import Cart, CartSnapshot, CartUpdate, CartResponse, cart_expiry
+from models.order import OrderItem
+from services.cart import get_priced_cart, price_items
+from services.pricing import quote, resolve_currency
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/cart", tags=["cart"])
+
+
+def get_db():
+    from server import db
+    return db
+
+
+def get_carts_collection():
+    db = get_db()
+    return db.carts
+
+
+def get_products_collection():
+    db = get_db()
+    return db.products
+
+
+def to_response(cart: dict, currency: str, region: Optional[str]) -> CartResponse:
+    """Convert the base-currency snapshot for the visitor, from in-memory rates"""
+    priced = quote([OrderItem(**item) for item in cart["snapshot"]["items"]], currency, region)
+    return CartResponse(
+        id=cart["id"],
+        items=priced.items,
+        subtotal=priced.subtotal,
+        tax=priced.tax,
+        total=priced.total,
+        currency=currency,
+        expires_at=cart["expires_at"]
+    )
+
+
+async def load_priced_cart(cart_id: str) -> dict:
+    cart = await get_priced_cart(get_carts_collection(), get_products_collection(), cart_id)
+    if not cart:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Carrito no encontrado"
+        )
+    return cart
+
+
+@router.post("", response_model=CartResponse, status_code=status.HTTP_201_CREATED)
+async def create_cart(
+    cart_update: CartUpdate,
+    currency: Optional[str] = None,
+    region: Optional[str] = None
+):
+    """
+    Create a server-side cart.
+    
+    The cart is priced immediately and expires after a period of inactivity.
+    
+    - **currency**: Currency to price the cart in (default: USD)
+    - **region**: Country code whose tax applies, e.g. CL
+    """
+    try:
+        currency = resolve_currency(currency)
+        carts_collection = get_carts_collection()
+        
+        # Price (and validate) before inserting, so a rejected cart leaves nothing behind
+        items, subtotal = await price_items(get_products_collection(), cart_update.items)
+        cart = Cart(items=cart_update.items, snapshot=CartSnapshot(items=items, subtotal=subtotal))
+        cart_doc = cart.model_dump()
+        await carts_collection.insert_one(cart_doc)
+        
+        logger.info(f"Cart created: {cart.id}")
+        return to_response(cart_doc, currency, region)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating cart: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al crear el carrito"
+        )
+
+
+@router.get("/{cart_id}", response_model=CartResponse)
+async def get_cart(cart_id: str, currency: Optional[str] = None, region: Optional[str] = None):
+    """
+    Get a priced cart.
+    
+    Served from the cached snapshot unless a contained product changed.
+    
+    - **currency**: Currency to price the cart in (default: USD)
+    - **region**: Country code whose tax applies, e.g. CL
+    """
+    try:
+        currency = resolve_currency(currency)
+        return to_response(await load_priced_cart(cart_id), currency, region)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching cart: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al obtener el carrito"
+        )
+
+
+@router.put("/{cart_id}/items", response_model=CartResponse)
+async def update_cart_items(
+    cart_id: str,
+    cart_update: CartUpdate,
+    currency: Optional[str] = None,
+    region: Optional[str] = None
+):
+    """
+    Replace the contents of a cart and reprice it.
+    
+    - **currency**: Currency to price the cart in (default: USD)
+    - **region**: Country code whose tax applies, e.g. CL
+    """
+    try:
+        currency = resolve_currency(currency)
+        carts_collection = get_carts_collection()
+        
+        # Validate before writing, so rejected items never replace a working cart
+        await price_items(get_products_collection(), cart_update.items)
+        
+        result = await carts_collection.update_one(
+            {"id": cart_id, "expires_at": {"$gt": datetime.utcnow()}},
+            {
+                "$set": {
+                    "items": [item.model_dump() for item in cart_update.items],
+                    "snapshot": None,
+                    "updated_at": datetime.utcnow(),
+                    "expires_at": cart_expiry()
+                },
+                "$inc": {"revision": 1}
+            }
+        )
+        
+        if result.matched_count == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Carrito no encontrado"
+            )
+        
+        return to_response(await load_priced_cart(cart_id), currency, region)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating cart: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al actualizar el carrito"
+        )
+
+
+@router.delete("/{cart_id}")
+async def delete_cart(cart_id: str):
+    """
+    Delete a cart.
+    """
+    try:
+        result = await get_carts_collection().delete_one({"id": cart_id})
+        
+        if result.deleted_count == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Carrito no encontrado"
+            )
+        
+        return {"success": True, "message": "Carrito eliminado correctamente"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting cart: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al eliminar el carrito"
+        )
@@ -1,19 +1,29 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr
-from typing import List
-import stripe
+from typing import List, Optional
+import asyncio
 import os
 import logging
-from models.order import Order, OrderItem, OrderCreate
+from models.order import Order, OrderItem, OrderCreate, OrderStatus
+from services.cart import get_priced_cart, price_items
+from services.reservations import hold_stock, release_holds
+from services.orders import mark_order_paid, cancel_order, order_created, get_order_status, ORDER_EVENTS, FINAL_STATUSES
+from services.events import event_bus, sse_message, SSE_HEARTBEAT, SSE_HEARTBEAT_SECONDS
+from services.idempotency import run_idempotent
+from services.stripe_client import get_stripe
+from services.archive import find_archived
+from services.pricing import quote, resolve_currency
+from services.promotions import apply_promotions, release_redemptions
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-# Initialize Stripe
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
-
 router = APIRouter(prefix="/checkout", tags=["checkout"])
 
+ORDER_STATUS_MAX_WAIT = int(os.environ.get('ORDER_STATUS_MAX_WAIT_SECONDS', '30'))
+ORDER_EVENTS_MAX_SECONDS = int(os.environ.get('ORDER_EVENTS_MAX_SECONDS', '600'))
+
 
 def get_db():
     from server import db
@@ -30,11 +40,25 @@ def get_products_collection():
     return db.products
 
 
+def get_carts_collection():
+    db = get_db()
+    return db.carts
+
+
+def get_idempotency_collection():
+    db = get_db()
+    return db.idempotency_keys
+
+
 class CheckoutRequest(BaseModel):
     customer_name: str
     customer_email: EmailStr
     customer_phone: str = None
-    items: List[OrderItem]
+    items: List[OrderItem] = []
+    cart_id: Optional[str] = None  # server-side cart, replaces items when given
+    currency: Optional[str] = None  # currency to charge in (default: USD)
+    region: Optional[str] = None  # country code whose tax applies
+    coupon_code: Optional[str] = None
     billing_address: dict = None
 
 
@@ -42,111 +66,127 @@ class PaymentIntentResponse(BaseModel):
     client_secret: str
     order_id: str
     amount: float
+    currency: str = "USD"
 
 
 @router.post("/create-payment-intent", response_model=PaymentIntentResponse)
-async def create_payment_intent(checkout_request: CheckoutRequest):
+async def create_payment_intent(
+    checkout_request: CheckoutRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
     """
     Create a Stripe payment intent for the order.
     
     This generates a client_secret that the frontend will use to complete the payment.
+    
+    Send an `Idempotency-Key` header to make retries safe: repeating the
+    request with the same key returns the original order and client_secret
+    instead of creating new ones.
+    
+    `currency` and `region` price and tax the order for the customer; the
+    Stripe charge uses the same currency and exact minor-unit amount.
+    `coupon_code` applies a coupon on top of the best automatic promotion.
     """
     try:
+        result, replayed = await run_idempotent(
+            get_idempotency_collection(),
+            idempotency_key,
+            "create-payment-intent",
+            checkout_request,
+            lambda: _create_payment_intent(checkout_request)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating payment intent: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al crear la intención de pago"
+        )
+    
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _create_payment_intent(checkout_request: CheckoutRequest) -> PaymentIntentResponse:
+    try:
+        currency = resolve_currency(checkout_request.currency)
         products_collection = get_products_collection()
         orders_collection = get_orders_collection()
         
-        # Validate all products exist and calculate total
-        subtotal = 0
-        validated_items = []
-        
-        for item in checkout_request.items:
-            product = await products_collection.find_one({"id": item.product_id})
-            
-            if not product:
+        if checkout_request.cart_id:
+            # Reuse the cart's already validated, priced snapshot
+            cart = await get_priced_cart(
+                get_carts_collection(), products_collection, checkout_request.cart_id
+            )
+            if not cart:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Producto {item.product_id} no encontrado"
-                )
-            
-            if not product.get("is_active", True):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Producto {product['name']} no está disponible"
+                    detail="Carrito no encontrado"
                 )
-            
-            # Check stock if applicable
-            if product.get("stock") is not None and product["stock"] < item.quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Stock insuficiente para {product['name']}"
-                )
-            
-            item_total = product["price"] * item.quantity
-            subtotal += item_total
-            
-            validated_items.append(OrderItem(
-                product_id=product["id"],
-                product_name=product["name"],
-                price=product["price"],
-                quantity=item.quantity
-            ))
+            validated_items = [OrderItem(**item) for item in cart["snapshot"]["items"]]
+        else:
+            validated_items, _ = await price_items(products_collection, checkout_request.items)
+        
+        if not validated_items:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El carrito está vacío"
+            )
+        
+        # Apply promotions from the in-memory rule index and take their uses
+        evaluation = await apply_promotions(get_db(), validated_items, checkout_request.coupon_code)
+        
+        # Convert to the customer's currency, discount and add tax, from in-memory rates
+        priced = quote(validated_items, currency, checkout_request.region, evaluation.discount)
         
-        # Create order in database
         order = Order(
             customer_name=checkout_request.customer_name,
             customer_email=checkout_request.customer_email,
             customer_phone=checkout_request.customer_phone,
-            items=validated_items,
-            subtotal=subtotal,
-            total=subtotal,  # Add tax calculation if needed
+            items=priced.items,
+            subtotal=priced.subtotal,
+            discount=priced.discount,
+            tax=priced.tax,
+            total=priced.total,
+            currency=priced.currency,
+            total_minor=priced.total_minor,
+            fx_rate=float(priced.fx_rate),
+            tax_region=checkout_request.region.upper() if checkout_request.region else None,
+            coupon_code=checkout_request.coupon_code.strip().upper() if checkout_request.coupon_code else None,
+            promotion_ids=evaluation.promotion_ids,
             status="pending",
             billing_address=checkout_request.billing_address
         )
         
-        await orders_collection.insert_one(order.model_dump())
-        
-        # Create Stripe payment intent
-        # Amount must be in cents for Stripe
-        amount_cents = int(order.total * 100)
-        
-        payment_intent = stripe.PaymentIntent.create(
-            amount=amount_cents,
-            currency="usd",
-            payment_method_types=["card"],  # Only allow card payments
-            metadata={
-                "order_id": order.id,
-                "customer_email": order.customer_email,
-                "customer_name": order.customer_name
-            },
-            description=f"Compra IDEF - {len(order.items)} producto(s)",
-            # Completely disable Link
-            payment_method_options={
-                "card": {
-                    "request_three_d_secure": "automatic"
-                }
-            }
-        )
-        
-        # Update order with payment intent ID
-        await orders_collection.update_one(
-            {"id": order.id},
-            {"$set": {
-                "payment_intent_id": payment_intent.id,
-                "updated_at": datetime.utcnow()
-            }}
-        )
+        try:
+            # Atomically reserve limited seats before the order exists
+            holds = await hold_stock(get_db(), order.id, validated_items)
+            order.stock_holds = len(holds)
+            
+            payment_intent = await _create_order_payment_intent(orders_collection, order)
+        except Exception:
+            # Once stored, the order carries its holds and promotion uses: cancel it
+            # so they are given back once, not again by a later cancel or sweep
+            if not await cancel_order(get_db(), order.model_dump(), "canceled"):
+                await release_holds(get_db(), order.id)
+                await release_redemptions(get_db(), order.promotion_ids)
+            raise
         
         logger.info(f"Payment intent created for order {order.id}: {payment_intent.id}")
         
         return PaymentIntentResponse(
             client_secret=payment_intent.client_secret,
             order_id=order.id,
-            amount=order.total
+            amount=order.total,
+            currency=order.currency
         )
     
     except HTTPException:
         raise
-    except stripe.error.StripeError as e:
+    except get_stripe().error.StripeError as e:
         logger.error(f"Stripe error: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -160,14 +200,83 @@ async def create_payment_intent(checkout_request: CheckoutRequest):
         )
 
 
+async def _create_order_payment_intent(orders_collection, order: Order):
+    """Store the order and create its Stripe payment intent"""
+    await orders_collection.insert_one(order.model_dump())
+    await order_created(order.model_dump())
+    
+    # Create Stripe payment intent
+    # Amount is in the currency's minor unit (cents, or whole pesos for CLP)
+    payment_intent = get_stripe().PaymentIntent.create(
+        amount=order.total_minor,
+        currency=order.currency.lower(),
+        payment_method_types=["card"],  # Only allow card payments
+        metadata={
+            "order_id": order.id,
+            "customer_email": order.customer_email,
+            "customer_name": order.customer_name
+        },
+        description=f"Compra IDEF - {len(order.items)} producto(s)",
+        # Completely disable Link
+        payment_method_options={
+            "card": {
+                "request_three_d_secure": "automatic"
+            }
+        }
+    )
+    
+    # Update order with payment intent ID
+    await orders_collection.update_one(
+        {"id": order.id},
+        {"$set": {
+            "payment_intent_id": payment_intent.id,
+            "updated_at": datetime.utcnow()
+        }}
+    )
+    
+    return payment_intent
+
+
 @router.post("/confirm-payment/{order_id}")
-async def confirm_payment(order_id: str, payment_intent_id: str):
+async def confirm_payment(
+    order_id: str,
+    payment_intent_id: str,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
     """
     Confirm payment was successful and update order status.
+    
+    Honours the `Idempotency-Key` header like create-payment-intent; a
+    payment not completed yet is checked again on a retry with the same key.
     """
+    try:
+        result, replayed = await run_idempotent(
+            get_idempotency_collection(),
+            idempotency_key,
+            f"confirm-payment:{order_id}",
+            {"payment_intent_id": payment_intent_id},
+            lambda: _confirm_payment(order_id, payment_intent_id),
+            # An unpaid result may change; only a confirmed payment is replayed
+            is_final=lambda result: result["success"]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error confirming payment: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al confirmar el pago"
+        )
+    
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _confirm_payment(order_id: str, payment_intent_id: str) -> dict:
     try:
         orders_collection = get_orders_collection()
-        products_collection = get_products_collection()
         
         # Get order
         order = await orders_collection.find_one({"id": order_id})
@@ -178,28 +287,11 @@ async def confirm_payment(order_id: str, payment_intent_id: str):
             )
         
         # Verify payment with Stripe
-        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        payment_intent = get_stripe().PaymentIntent.retrieve(payment_intent_id)
         
         if payment_intent.status == "succeeded":
-            # Update order status
-            await orders_collection.update_one(
-                {"id": order_id},
-                {"$set": {
-                    "status": "paid",
-                    "payment_status": "succeeded",
-                    "updated_at": datetime.utcnow()
-                }}
-            )
-            
-            # Update product stock if applicable
-            for item in order["items"]:
-                product = await products_collection.find_one({"id": item["product_id"]})
-                if product and product.get("stock") is not None:
-                    new_stock = product["stock"] - item["quantity"]
-                    await products_collection.update_one(
-                        {"id": item["product_id"]},
-                        {"$set": {"stock": new_stock, "updated_at": datetime.utcnow()}}
-                    )
+            # Mark paid and turn reserved seats into sales, once even if retried
+            await mark_order_paid(get_db(), order)
             
             logger.info(f"Order {order_id} marked as paid")
             
@@ -214,7 +306,7 @@ async def confirm_payment(order_id: str, payment_intent_id: str):
                 "message": f"Pago no completado. Estado: {payment_intent.status}"
             }
     
-    except stripe.error.StripeError as e:
+    except get_stripe().error.StripeError as e:
         logger.error(f"Stripe error: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -236,6 +328,8 @@ async def get_order(order_id: str):
     try:
         orders_collection = get_orders_collection()
         order = await orders_collection.find_one({"id": order_id})
+        if not order:
+            order = await find_archived(get_db(), "orders", order_id)
         
         if not order:
             raise HTTPException(
@@ -253,3 +347,100 @@ async def get_order(order_id: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener la orden"
         )
+
+
+@router.get("/order/{order_id}/status", response_model=OrderStatus)
+async def get_order_status_compact(
+    order_id: str,
+    wait: int = Query(default=0, ge=0, le=ORDER_STATUS_MAX_WAIT),
+    since: str = "pending"
+):
+    """
+    Compact order status: status, total and item names.
+    
+    - **wait**: Seconds to hold the request while the status is still `since` (long-poll)
+    - **since**: Status the client already shows (default: pending)
+    
+    Served from a short-lived cache dropped on every status change; a
+    waiting request answers as soon as the status changes.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        
+        # Subscribe before reading so a change in between is not missed
+        async with event_bus.subscribe(ORDER_EVENTS) as events:
+            order = await get_order_status(get_db(), order_id)
+            if not order:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Orden no encontrada"
+                )
+            
+            while order["status"] == since and loop.time() < deadline:
+                try:
+                    event = await asyncio.wait_for(events.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if event.get("order_id") == order_id:
+                    order = await get_order_status(get_db(), order_id)
+        
+        return OrderStatus(**order)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching order status: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al obtener el estado de la orden"
+        )
+
+
+@router.get("/order/{order_id}/events")
+async def stream_order_status(order_id: str):
+    """
+    Server-sent events with the compact order status.
+    
+    Sends a `status` event with the current status, then one per change,
+    and ends once the order is paid, completed or cancelled.
+    """
+    try:
+        order = await get_order_status(get_db(), order_id)
+    except Exception as e:
+        logger.error(f"Error fetching order status: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al obtener el estado de la orden"
+        )
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Orden no encontrada"
+        )
+    
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + ORDER_EVENTS_MAX_SECONDS
+        async with event_bus.subscribe(ORDER_EVENTS) as events:
+            current = await get_order_status(get_db(), order_id)
+            yield sse_message("status", OrderStatus(**current).model_dump_json())
+            
+            while current["status"] not in FINAL_STATUSES and loop.time() < deadline:
+                try:
+                    event = await asyncio.wait_for(
+                        events.get(), min(SSE_HEARTBEAT_SECONDS, deadline - loop.time())
+                    )
+                except asyncio.TimeoutError:
+                    yield SSE_HEARTBEAT
+                    continue
+                if event.get("order_id") != order_id:
+                    continue
+                current = await get_order_status(get_db(), order_id)
+                yield sse_message("status", OrderStatus(**current).model_dump_json())
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
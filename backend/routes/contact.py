@@ -1,18 +1,38 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from typing import List, Optional
 from models.contact import (
     ContactSubmission,
     ContactSubmissionCreate,
-    ContactSubmissionResponse
+    ContactSubmissionResponse,
+    ContactSubmissionSummary,
+    ContactSearchResults
 )
+from models.bulk import BulkStatusRequest, BulkStatusResult
+from auth import get_current_user, get_optional_user
+from services.search import contacts_index, fetch_ranked
+from services.serialization import encoded_response
+from services.projection import build_projection
+from services.archive import find_archived, read_archived_range
+from services.mailer import enqueue_contact_received
+from services.shared_cache import shared_cache
+from services.dashboard import contact_created, contact_status_changed
+from services.bulk_status import bulk_transition, status_filter_query, bulk_audit_details
+from services.audit import audit_log
 import os
-from datetime import datetime
+from datetime import date, datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/contact", tags=["contact"])
 
+# Moves allowed in bulk triage; a responded submission can only be reopened for review
+CONTACT_TRANSITIONS = {
+    "pending": {"reviewed", "responded"},
+    "reviewed": {"pending", "responded"},
+    "responded": {"reviewed"},
+}
+
 # Database will be accessed from the main server.py
 def get_db():
     from server import db
@@ -23,6 +43,21 @@ def get_contacts_collection():
     return db.contacts
 
 
+@shared_cache.subscribe("contacts")
+async def refresh_contacts(contact_ids: Optional[List[str]]):
+    """Apply submissions created or changed by another worker to this worker's search index"""
+    if contact_ids is None:
+        contacts_index.clear()
+        return
+    contacts = await get_contacts_collection().find(
+        {"id": {"$in": contact_ids}}, {"_id": 0}
+    ).to_list(length=len(contact_ids))
+    for contact in contacts:
+        contacts_index.upsert(contact)
+    for contact_id in set(contact_ids) - {contact["id"] for contact in contacts}:
+        contacts_index.remove(contact_id)
+
+
 @router.post("", response_model=ContactSubmissionResponse, status_code=status.HTTP_201_CREATED)
 async def create_contact_submission(submission: ContactSubmissionCreate):
     """
@@ -54,6 +89,11 @@ async def create_contact_submission(submission: ContactSubmissionCreate):
                 detail="Error al guardar la consulta"
             )
         
+        contacts_index.upsert(contact_data.model_dump())
+        await shared_cache.invalidate("contacts", [contact_data.id])
+        await contact_created(contact_data.model_dump())
+        await enqueue_contact_received(get_db(), contact_data.model_dump())
+        
         logger.info(f"Contact submission created: {contact_data.id}")
         
         return ContactSubmissionResponse(
@@ -76,11 +116,13 @@ async def create_contact_submission(submission: ContactSubmissionCreate):
         )
 
 
-@router.get("", response_model=List[ContactSubmission])
+@router.get("", response_model=List[ContactSubmissionSummary])
 async def get_contact_submissions(
+    request: Request,
     limit: int = 100,
     skip: int = 0,
-    status_filter: str = None
+    status_filter: str = None,
+    fields: str = None
 ):
     """
     Get all contact submissions (admin endpoint).
@@ -88,7 +130,18 @@ async def get_contact_submissions(
     - **limit**: Maximum number of submissions to return
     - **skip**: Number of submissions to skip (for pagination)
     - **status_filter**: Filter by status (pending, reviewed, responded)
+    - **fields**: Comma-separated fields to return, `*` for full submissions (default: summary)
+    
+    Send `Accept: application/msgpack` to receive MessagePack instead of JSON.
     """
+    try:
+        projection = build_projection(fields, ContactSubmission, ContactSubmissionSummary)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos desconocidos: {e}"
+        )
+    
     try:
         contacts_collection = get_contacts_collection()
         
@@ -96,10 +149,11 @@ async def get_contact_submissions(
         if status_filter:
             query["status"] = status_filter
         
-        cursor = contacts_collection.find(query).sort("created_at", -1).skip(skip).limit(limit)
+        cursor = contacts_collection.find(query, projection).sort("created_at", -1).skip(skip).limit(limit)
         submissions = await cursor.to_list(length=limit)
         
-        return [ContactSubmission(**submission) for submission in submissions]
+        # Documents were validated as ContactSubmission on insert
+        return encoded_response(request, submissions)
     
     except Exception as e:
         logger.error(f"Error fetching contact submissions: {str(e)}")
@@ -109,6 +163,71 @@ async def get_contact_submissions(
         )
 
 
+@router.get("/archive", response_model=List[ContactSubmission])
+async def get_archived_contact_submissions(
+    request: Request,
+    start: date,
+    end: date,
+    username: str = Depends(get_current_user),
+    limit: int = Query(default=500, le=1000)
+):
+    """
+    Get archived contact submissions received between two dates (admin only)
+    
+    - **start**: First day (YYYY-MM-DD)
+    - **end**: Last day, inclusive (YYYY-MM-DD)
+    - **limit**: Maximum number of submissions to return
+    """
+    try:
+        submissions = await read_archived_range(get_db(), "contacts", start.isoformat(), end.isoformat(), limit)
+        return encoded_response(request, submissions)
+    
+    except Exception as e:
+        logger.error(f"Error fetching archived contact submissions: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al obtener las consultas archivadas"
+        )
+
+
+@router.get("/search", response_model=ContactSearchResults)
+async def search_contact_submissions(
+    q: str = Query(..., min_length=2),
+    status_filter: str = None,
+    limit: int = Query(default=20, le=100),
+    skip: int = 0,
+    username: str = Depends(get_current_user)
+):
+    """
+    Full-text search over contact submissions (admin only)
+    
+    Matches name, subject and message, accent-insensitive and with Spanish
+    stemming. Results are ordered by relevance.
+    
+    - **q**: Search terms
+    - **status_filter**: Filter by status (pending, reviewed, responded)
+    - **limit**: Maximum number of results to return
+    - **skip**: Number of results to skip (pagination)
+    """
+    try:
+        contacts_collection = get_contacts_collection()
+        await contacts_index.ensure_loaded(contacts_collection)
+        
+        total, hits = contacts_index.search(
+            q, filters={"status": status_filter}, limit=limit, skip=skip
+        )
+        results = await fetch_ranked(contacts_collection, hits)
+        
+        return ContactSearchResults(total=total, limit=limit, skip=skip, results=results)
+    
+    except Exception as e:
+        logger.error(f"Error searching contact submissions: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al buscar las consultas"
+        )
+
+
 @router.get("/{submission_id}", response_model=ContactSubmission)
 async def get_contact_submission(submission_id: str):
     """
@@ -117,6 +236,8 @@ async def get_contact_submission(submission_id: str):
     try:
         contacts_collection = get_contacts_collection()
         submission = await contacts_collection.find_one({"id": submission_id})
+        if not submission:
+            submission = await find_archived(get_db(), "contacts", submission_id)
         
         if not submission:
             raise HTTPException(
@@ -137,7 +258,11 @@ async def get_contact_submission(submission_id: str):
 
 
 @router.patch("/{submission_id}/status")
-async def update_contact_status(submission_id: str, new_status: str):
+async def update_contact_status(
+    submission_id: str,
+    new_status: str,
+    username: Optional[str] = Depends(get_optional_user)
+):
     """
     Update the status of a contact submission.
     
@@ -153,17 +278,24 @@ async def update_contact_status(submission_id: str, new_status: str):
                 detail=f"Estado inválido. Debe ser uno de: {', '.join(valid_statuses)}"
             )
         
-        result = await contacts_collection.update_one(
+        previous = await contacts_collection.find_one_and_update(
             {"id": submission_id},
-            {"$set": {"status": new_status, "updated_at": datetime.utcnow()}}
+            {"$set": {"status": new_status, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "status": 1}
         )
         
-        if result.matched_count == 0:
+        if previous is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Consulta no encontrada"
             )
         
+        contacts_index.set_attr(submission_id, "status", new_status)
+        await shared_cache.invalidate("contacts", [submission_id])
+        if previous.get("status") != new_status:
+            await contact_status_changed(submission_id, new_status, previous.get("status"))
+        audit_log.record(username, "update_status", "contact", submission_id, {"from": previous.get("status"), "to": new_status})
+        
         return {"success": True, "message": "Estado actualizado correctamente"}
     
     except HTTPException:
@@ -174,3 +306,58 @@ async def update_contact_status(submission_id: str, new_status: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al actualizar el estado"
         )
+
+
+@router.post("/bulk-status", response_model=BulkStatusResult)
+async def bulk_update_contact_status(
+    bulk_request: BulkStatusRequest,
+    username: str = Depends(get_current_user)
+):
+    """
+    Update the status of many contact submissions at once (admin only).
+    
+    - **status**: New status (pending, reviewed, responded)
+    - **ids**: Submissions to update, or
+    - **filter**: Submissions to update by current `status` and `created_after`/`created_before`
+    
+    Each submission gets its own outcome: updated, unchanged,
+    invalid_transition, not_found or conflict (its status changed meanwhile).
+    """
+    if bulk_request.status not in CONTACT_TRANSITIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Estado inválido. Debe ser uno de: {', '.join(CONTACT_TRANSITIONS)}"
+        )
+    
+    try:
+        query = status_filter_query(**bulk_request.filter.model_dump()) if bulk_request.filter else None
+        summary, changed = await bulk_transition(
+            get_contacts_collection(), bulk_request.status, CONTACT_TRANSITIONS,
+            ids=bulk_request.ids, query=query
+        )
+        
+        if changed:
+            for contact in changed:
+                contacts_index.set_attr(contact["id"], "status", bulk_request.status)
+            await shared_cache.invalidate("contacts", [contact["id"] for contact in changed])
+            for contact in changed:
+                await contact_status_changed(contact["id"], bulk_request.status, contact["status"])
+        audit_log.record(username, "bulk_update_status", "contact", details=bulk_audit_details(bulk_request, summary))
+        
+        logger.info(
+            f"Bulk contact status to {bulk_request.status} by {username}: "
+            f"{summary['updated']} updated of {len(summary['results'])}"
+        )
+        return summary
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Demasiadas consultas: {e}"
+        )
+    except Exception as e:
+        logger.error(f"Error updating contact statuses: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al actualizar los estados"
+        )
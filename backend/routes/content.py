@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, status, Request
+from models.landing_content import LandingContent
+from routes.admin_content import get_content_collection, LANDING_PAYLOAD
+from services.compression import published_payloads
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/content", tags=["content"])
+
+
+@router.get("/landing", response_model=LandingContent)
+async def get_public_landing_content(request: Request):
+    """
+    Get the published landing page content.
+    
+    Rendered and compressed once per content change, shared between
+    workers, then served from memory.
+    """
+    payload = published_payloads.get(LANDING_PAYLOAD)
+    if payload is not None:
+        return payload.response(request)
+    
+    async def render():
+        content = await get_content_collection().find_one({}, {"_id": 0})
+        
+        if not content:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Contenido no encontrado"
+            )
+        
+        return LandingContent(**content).model_dump()
+    
+    try:
+        payload = await published_payloads.get_or_publish(LANDING_PAYLOAD, render)
+        return payload.response(request)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching public landing content: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al obtener el contenido"
+        )
@@ -1,6 +1,30 @@
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from typing import List, Optional
-from models.product import Product, ProductCreate, ProductUpdate
+from pymongo.errors import DuplicateKeyError
+from models.product import (
+    Product,
+    ProductSummary,
+    ProductCreate,
+    ProductUpdate,
+    ProductSearchResults,
+    CatalogBrowseResults,
+    ProductBulkRequest,
+    ProductBulkResult
+)
+from services.search import products_index, fetch_ranked
+from services.facets import catalog_facets, FACETS, SORTS
+from services.serialization import encoded_response, wants_msgpack
+from services.compression import published_payloads
+from services.shared_cache import shared_cache
+from services.single_flight import single_flight
+from services.swr_cache import SwrCache
+from services.cart import invalidate_carts_for_products
+from services.projection import build_projection
+from services.product_import import bulk_upsert_products, PRODUCT_BULK_MAX_ROWS
+from services.versioning import update_versioned
+from services.pricing import localize_products, resolve_currency
+from services.audit import audit_log
+from auth import get_optional_user
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,10 +42,73 @@ def get_products_collection():
     return db.products
 
 
-@router.get("", response_model=List[Product])
+CATALOG_PAYLOAD = "catalog"
+
+# Public catalog reads: served slightly stale while refreshing, and from the
+# last good copy while MongoDB is unavailable
+catalog_cache = SwrCache("catalog")
+
+
+async def index_products(products: List[dict]):
+    """Reflect created or updated products in the catalog indexes of every worker"""
+    for product in products:
+        products_index.upsert(product)
+        catalog_facets.upsert(product)
+    catalog_cache.invalidate()
+    await published_payloads.invalidate(CATALOG_PAYLOAD)
+    await shared_cache.invalidate("products", [product["id"] for product in products])
+
+
+async def unindex_product(product_id: str):
+    """Remove a deleted product from the catalog indexes of every worker"""
+    products_index.remove(product_id)
+    catalog_facets.remove(product_id)
+    catalog_cache.invalidate()
+    await published_payloads.invalidate(CATALOG_PAYLOAD)
+    await shared_cache.invalidate("products", [product_id])
+
+
+@shared_cache.subscribe("products")
+async def refresh_products(product_ids: Optional[List[str]]):
+    """Apply products changed by another worker to this worker's indexes"""
+    catalog_cache.invalidate()
+    if product_ids is None:
+        # Rebuilt from the database on next use
+        products_index.expire()
+        catalog_facets.expire()
+        return
+    products = await get_products_collection().find(
+        {"id": {"$in": product_ids}}, {"_id": 0}
+    ).to_list(length=len(product_ids))
+    for product in products:
+        products_index.upsert(product)
+        catalog_facets.upsert(product)
+    for product_id in set(product_ids) - {product["id"] for product in products}:
+        products_index.remove(product_id)
+        catalog_facets.remove(product_id)
+
+
+async def load_products(category: Optional[str], is_active: bool, projection: dict, skip: int, limit: int) -> List[dict]:
+    """One page of the catalog, through the catalog cache"""
+    query = {"is_active": is_active}
+    if category:
+        query["category"] = category
+    
+    async def fetch():
+        cursor = get_products_collection().find(query, projection).sort("name", 1).skip(skip).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    key = ("list", category, is_active, tuple(sorted(projection.items())), skip, limit)
+    return await catalog_cache.get(key, fetch)
+
+
+@router.get("", response_model=List[ProductSummary])
 async def get_products(
+    request: Request,
     category: Optional[str] = None,
     is_active: bool = True,
+    fields: Optional[str] = None,
+    currency: Optional[str] = None,
     limit: int = Query(default=100, le=100),
     skip: int = 0
 ):
@@ -30,37 +117,204 @@ async def get_products(
     
     - **category**: Filter by category
     - **is_active**: Show only active products (default: True)
+    - **fields**: Comma-separated fields to return, `*` for full products (default: summary)
+    - **currency**: Show prices converted to this currency
     - **limit**: Maximum number of products to return
     - **skip**: Number of products to skip (pagination)
+    
+    The default catalog page is rendered and compressed once per catalog
+    change, shared between workers and served from memory until the next
+    change. Other pages come from the catalog cache, which keeps answering
+    with the last good data while the database is unavailable.
     """
+    default_page = (
+        category is None and is_active and fields is None and currency is None
+        and limit == 100 and skip == 0 and not wants_msgpack(request)
+    )
+    if default_page:
+        payload = published_payloads.get(CATALOG_PAYLOAD)
+        if payload is not None:
+            return payload.response(request)
+    
     try:
+        projection = build_projection(fields, Product, ProductSummary)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos desconocidos: {e}"
+        )
+    if currency:
+        currency = resolve_currency(currency)
+    
+    try:
+        if default_page:
+            payload = await published_payloads.get_or_publish(
+                CATALOG_PAYLOAD, lambda: load_products(None, True, projection, 0, limit)
+            )
+            return payload.response(request)
+        
+        products = await load_products(category, is_active, projection, skip, limit)
+        if currency:
+            products = localize_products(products, currency)
+        return encoded_response(request, products)
+    
+    except Exception as e:
+        logger.error(f"Error fetching products: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al obtener los productos"
+        )
+
+
+@router.get("/search", response_model=ProductSearchResults)
+async def search_products(
+    q: str = Query(..., min_length=2),
+    category: Optional[str] = None,
+    is_active: bool = True,
+    currency: Optional[str] = None,
+    limit: int = Query(default=20, le=100),
+    skip: int = 0
+):
+    """
+    Full-text search over the catalog.
+    
+    Matches name, description and features, accent-insensitive and with
+    Spanish stemming. Results are ordered by relevance.
+    
+    - **q**: Search terms
+    - **category**: Filter by category
+    - **is_active**: Show only active products (default: True)
+    - **currency**: Show prices converted to this currency
+    - **limit**: Maximum number of products to return
+    - **skip**: Number of products to skip (pagination)
+    """
+    if currency:
+        currency = resolve_currency(currency)
+    
+    async def run_search():
         products_collection = get_products_collection()
+        await products_index.ensure_loaded(products_collection)
+        
+        total, hits = products_index.search(
+            q,
+            filters={"is_active": is_active, "category": category},
+            limit=limit,
+            skip=skip
+        )
+        return total, await fetch_ranked(products_collection, hits)
+    
+    try:
+        total, results = await catalog_cache.get(("search", q, category, is_active, limit, skip), run_search)
+        if currency:
+            results = localize_products(results, currency)
         
-        query = {"is_active": is_active}
-        if category:
-            query["category"] = category
+        return ProductSearchResults(total=total, limit=limit, skip=skip, results=results)
+    
+    except Exception as e:
+        logger.error(f"Error searching products: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al buscar los productos"
+        )
+
+
+@router.get("/browse", response_model=CatalogBrowseResults)
+async def browse_products(
+    category: List[str] = Query(default=[]),
+    price_range: List[str] = Query(default=[]),
+    duration: List[str] = Query(default=[]),
+    modules: List[str] = Query(default=[]),
+    certificate: List[str] = Query(default=[]),
+    sort: str = "name",
+    currency: Optional[str] = None,
+    limit: int = Query(default=20, le=100),
+    skip: int = 0
+):
+    """
+    Browse active products by facets.
+    
+    Repeating a facet parameter selects any of its values. Facet counts are
+    computed against the other selected facets.
+    
+    - **category**, **price_range**, **duration**, **modules**, **certificate**: Facet filters
+    - **sort**: name, price_asc, price_desc, newest or modules
+    - **currency**: Show prices converted to this currency
+    - **limit**: Maximum number of products to return
+    - **skip**: Number of products to skip (pagination)
+    """
+    if sort not in SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Orden inválido. Debe ser uno de: {', '.join(SORTS)}"
+        )
+    if currency:
+        currency = resolve_currency(currency)
+    
+    try:
+        await catalog_facets.ensure_loaded(get_products_collection())
         
-        cursor = products_collection.find(query).sort("name", 1).skip(skip).limit(limit)
-        products = await cursor.to_list(length=limit)
+        filters = dict(zip(FACETS, (category, price_range, duration, modules, certificate)))
+        total, products = catalog_facets.browse(filters, sort=sort, limit=limit, skip=skip)
+        if currency:
+            products = localize_products(products, currency)
+        facets = {
+            facet: [{"value": value, "count": count} for value, count in counts]
+            for facet, counts in catalog_facets.counts(filters).items()
+        }
         
-        return [Product(**product) for product in products]
+        return CatalogBrowseResults(
+            total=total,
+            limit=limit,
+            skip=skip,
+            sort=sort,
+            results=products,
+            facets=facets
+        )
     
     except Exception as e:
-        logger.error(f"Error fetching products: {str(e)}")
+        logger.error(f"Error browsing products: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al obtener los productos"
         )
 
 
+@router.get("/bulk", response_model=List[Product])
+async def export_products(request: Request):
+    """
+    Export the whole catalog, active and inactive (admin only).
+    
+    The output can be sent back as the `products` of `POST /products/bulk`.
+    """
+    try:
+        products_collection = get_products_collection()
+        products = await products_collection.find({}, {"_id": 0}).sort("slug", 1).to_list(length=None)
+        return encoded_response(request, products)
+    
+    except Exception as e:
+        logger.error(f"Error exporting products: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al exportar los productos"
+        )
+
+
 @router.get("/{product_id}", response_model=Product)
-async def get_product(product_id: str):
+@single_flight("products:id")
+async def get_product(product_id: str, currency: Optional[str] = None):
     """
     Get a specific product by ID.
+    
+    - **currency**: Show the price converted to this currency
+    
+    Identical concurrent requests share one database read, and recent
+    reads are served from the catalog cache.
     """
     try:
         products_collection = get_products_collection()
-        product = await products_collection.find_one({"id": product_id})
+        product = await catalog_cache.get(
+            ("id", product_id), lambda: products_collection.find_one({"id": product_id}, {"_id": 0})
+        )
         
         if not product:
             raise HTTPException(
@@ -68,6 +322,8 @@ async def get_product(product_id: str):
                 detail="Producto no encontrado"
             )
         
+        if currency:
+            product = localize_products([product], resolve_currency(currency))[0]
         return Product(**product)
     
     except HTTPException:
@@ -81,13 +337,21 @@ async def get_product(product_id: str):
 
 
 @router.get("/slug/{slug}", response_model=Product)
-async def get_product_by_slug(slug: str):
+@single_flight("products:slug")
+async def get_product_by_slug(slug: str, currency: Optional[str] = None):
     """
     Get a specific product by slug.
+    
+    - **currency**: Show the price converted to this currency
+    
+    Identical concurrent requests share one database read, and recent
+    reads are served from the catalog cache.
     """
     try:
         products_collection = get_products_collection()
-        product = await products_collection.find_one({"slug": slug})
+        product = await catalog_cache.get(
+            ("slug", slug), lambda: products_collection.find_one({"slug": slug}, {"_id": 0})
+        )
         
         if not product:
             raise HTTPException(
@@ -95,6 +359,8 @@ async def get_product_by_slug(slug: str):
                 detail="Producto no encontrado"
             )
         
+        if currency:
+            product = localize_products([product], resolve_currency(currency))[0]
         return Product(**product)
     
     except HTTPException:
@@ -108,7 +374,7 @@ async def get_product_by_slug(slug: str):
 
 
 @router.post("", response_model=Product, status_code=status.HTTP_201_CREATED)
-async def create_product(product: ProductCreate):
+async def create_product(product: ProductCreate, username: Optional[str] = Depends(get_optional_user)):
     """
     Create a new product (admin only).
     """
@@ -125,12 +391,20 @@ async def create_product(product: ProductCreate):
         
         product_data = Product(**product.model_dump())
         await products_collection.insert_one(product_data.model_dump())
+        await index_products([product_data.model_dump()])
         
+        audit_log.record(username, "create", "product", product_data.id, {"slug": product_data.slug})
         logger.info(f"Product created: {product_data.id}")
         return product_data
     
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        # Created by a concurrent request or import since the check above
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ya existe un producto con este slug"
+        )
     except Exception as e:
         logger.error(f"Error creating product: {str(e)}")
         raise HTTPException(
@@ -139,43 +413,104 @@ async def create_product(product: ProductCreate):
         )
 
 
+@router.post("/bulk", response_model=ProductBulkResult)
+async def bulk_upsert(bulk_request: ProductBulkRequest, username: Optional[str] = Depends(get_optional_user)):
+    """
+    Create or update many products at once, matched by slug (admin only).
+    
+    - **products**: Product rows; fields omitted from a row keep their current value
+    - **dry_run**: Validate and report what would change without writing
+    
+    Invalid rows are reported individually and do not stop the others.
+    """
+    if len(bulk_request.products) > PRODUCT_BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {PRODUCT_BULK_MAX_ROWS} productos por importación"
+        )
+    
+    try:
+        products_collection = get_products_collection()
+        
+        summary, written_ids = await bulk_upsert_products(
+            products_collection,
+            bulk_request.products,
+            dry_run=bulk_request.dry_run
+        )
+        
+        if written_ids:
+            written = await products_collection.find(
+                {"id": {"$in": written_ids}}, {"_id": 0}
+            ).to_list(length=len(written_ids))
+            await index_products(written)
+            await invalidate_carts_for_products(get_db().carts, written_ids)
+            audit_log.record(username, "bulk_upsert", "product", details={
+                "created": summary["created"], "updated": summary["updated"], "ids": written_ids
+            })
+        
+        logger.info(
+            f"Bulk product import: {summary['created']} created, {summary['updated']} updated, "
+            f"{summary['errors']} errors{' (dry run)' if bulk_request.dry_run else ''}"
+        )
+        return summary
+    
+    except Exception as e:
+        logger.error(f"Error importing products: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al importar los productos"
+        )
+
+
 @router.patch("/{product_id}", response_model=Product)
-async def update_product(product_id: str, product_update: ProductUpdate):
+async def update_product(
+    product_id: str,
+    product_update: ProductUpdate,
+    username: Optional[str] = Depends(get_optional_user)
+):
     """
     Update a product (admin only).
+    
+    Send the product's current `version` to reject the edit with 409 if
+    someone else changed the product since it was loaded.
     """
     try:
         products_collection = get_products_collection()
         
-        # Get existing product
-        existing_product = await products_collection.find_one({"id": product_id})
-        if not existing_product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Producto no encontrado"
-            )
-        
         # Update only provided fields
         update_data = product_update.model_dump(exclude_unset=True)
+        expected_version = update_data.pop("version", None)
         update_data["updated_at"] = datetime.utcnow()
         
-        result = await products_collection.update_one(
-            {"id": product_id},
-            {"$set": update_data}
+        updated_product = await update_versioned(
+            products_collection, {"id": product_id}, update_data, expected_version
         )
         
-        if result.modified_count == 0:
+        if not updated_product:
+            if expected_version is not None and await products_collection.count_documents({"id": product_id}, limit=1):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="El producto fue modificado por otra persona. Recárgalo e inténtalo de nuevo"
+                )
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No se pudo actualizar el producto"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Producto no encontrado"
             )
         
-        # Get updated product
-        updated_product = await products_collection.find_one({"id": product_id})
+        await index_products([updated_product])
+        await invalidate_carts_for_products(get_db().carts, [product_id])
+        audit_log.record(username, "update", "product", product_id, {
+            "fields": sorted(k for k in update_data if k != "updated_at"), "version": updated_product.get("version")
+        })
         return Product(**updated_product)
     
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ya existe un producto con este slug"
+        )
     except Exception as e:
         logger.error(f"Error updating product: {str(e)}")
         raise HTTPException(
@@ -185,7 +520,7 @@ async def update_product(product_id: str, product_update: ProductUpdate):
 
 
 @router.delete("/{product_id}")
-async def delete_product(product_id: str):
+async def delete_product(product_id: str, username: Optional[str] = Depends(get_optional_user)):
     """
     Delete a product (admin only).
     """
@@ -200,6 +535,10 @@ async def delete_product(product_id: str):
                 detail="Producto no encontrado"
             )
         
+        await unindex_product(product_id)
+        await invalidate_carts_for_products(get_db().carts, [product_id])
+        audit_log.record(username, "delete", "product", product_id)
+        
         return {"success": True, "message": "Producto eliminado correctamente"}
     
     except HTTPException:
@@ -1,13 +1,15 @@
 """
 Script to seed the database with IDEF diplomados
-Run this once to populate the products collection
+Upserts by slug, so it is safe to run again after editing the list
 """
 
 import asyncio
+import sys
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from services.product_import import bulk_upsert_products
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -223,26 +225,22 @@ DIPLOMADOS = [
 ]
 
 
-async def seed_products():
+async def seed_products(dry_run: bool = False):
     """Seed the database with diplomados"""
     try:
-        # Clear existing products (optional - comment out if you want to keep existing)
-        # await products_collection.delete_many({})
+        summary, _ = await bulk_upsert_products(products_collection, DIPLOMADOS, dry_run=dry_run)
         
-        # Check if products already exist
-        existing_count = await products_collection.count_documents({})
-        
-        if existing_count > 0:
-            print(f"Database already has {existing_count} products. Skipping seed.")
-            return
-        
-        # Insert diplomados
-        result = await products_collection.insert_many(DIPLOMADOS)
-        
-        print(f"✅ Successfully seeded {len(result.inserted_ids)} diplomados!")
+        prefix = "[dry run] " if dry_run else ""
+        print(f"✅ {prefix}{summary['created']} created, {summary['updated']} updated, {summary['errors']} errors")
         print("\nImported products:")
-        for i, diplomado in enumerate(DIPLOMADOS, 1):
-            print(f"{i}. {diplomado['name']} - ${diplomado['price']}")
+        for row in summary["results"]:
+            diplomado = DIPLOMADOS[row["index"]]
+            line = f"{row['index'] + 1}. {diplomado['name']} - ${diplomado['price']} ({row['action']})"
+            if row.get("error"):
+                line += f": {row['error']}"
+            print(line)
+        if not dry_run:
+            print("\nThe API reloads its catalog indexes within a few minutes; restart the backend to see changes at once.")
     
     except Exception as e:
         print(f"❌ Error seeding products: {str(e)}")
@@ -252,4 +250,4 @@ async def seed_products():
 
 if __name__ == "__main__":
     print("🌱 Seeding IDEF diplomados...")
-    asyncio.run(seed_products())
+    asyncio.run(seed_products(dry_run="--dry-run" in sys.argv))
@@ -1,10 +1,14 @@
 from fastapi import FastAPI, APIRouter
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
+
+# Load settings before importing modules that read them at import time
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List
 import uuid
@@ -16,21 +20,63 @@ from routes.admin_auth import router as admin_auth_router
 from routes.admin_content import router as admin_content_router
 from routes.admin_orders import router as admin_orders_router
 from routes.admin_upload import router as admin_upload_router
-
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+from routes.content import router as content_router
+from routes.cart import router as cart_router
+from routes.admin_jobs import router as admin_jobs_router
+from routes.admin_promotions import router as admin_promotions_router
+from routes.admin_metrics import router as admin_metrics_router
+from routes.admin_events import router as admin_events_router
+from routes.admin_audit import router as admin_audit_router
+from routes.admin_analytics import router as admin_analytics_router
+from services.serialization import FastJSONResponse
+from services.compression import CompressionMiddleware
+from services.structured_logging import configure_logging, RequestContextMiddleware
+from services import cart as cart_service
+from services import reservations
+from services import idempotency
+from services import orders as order_jobs
+from services import archive
+from services import pricing
+from services import promotions
+from services import mailer as mail_service
+from services import audit
+from services import analytics
+from services import product_import
+from services.scheduler import Scheduler
+from services.shared_cache import shared_cache
+from services.warmup import warm_up
+
+
+# MongoDB connection, created on first use so importing this module stays
+# cheap; routes keep using ``from server import db``
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return _client
+
+
+def get_db():
+    return get_client()[os.environ['DB_NAME']]
+
+
+def __getattr__(name):
+    if name == "client":
+        return get_client()
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Create the main app without a prefix
 app = FastAPI(
     title="IDEF Internacional API",
     description="API para el Instituto Forense IDEF Internacional",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Create a router with the /api prefix
@@ -62,13 +108,13 @@ async def create_status_check(input: StatusCheckCreate):
     doc = status_obj.model_dump()
     doc['timestamp'] = doc['timestamp'].isoformat()
     
-    _ = await db.status_checks.insert_one(doc)
+    _ = await get_db().status_checks.insert_one(doc)
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     # Exclude MongoDB's _id field from the query results
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
+    status_checks = await get_db().status_checks.find({}, {"_id": 0}).to_list(1000)
     
     # Convert ISO string timestamps back to datetime objects
     for check in status_checks:
@@ -85,10 +131,20 @@ api_router.include_router(admin_auth_router)
 api_router.include_router(admin_content_router)
 api_router.include_router(admin_orders_router)
 api_router.include_router(admin_upload_router)
+api_router.include_router(content_router)
+api_router.include_router(cart_router)
+api_router.include_router(admin_jobs_router)
+api_router.include_router(admin_promotions_router)
+api_router.include_router(admin_metrics_router)
+api_router.include_router(admin_events_router)
+api_router.include_router(admin_audit_router)
+api_router.include_router(admin_analytics_router)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -97,13 +153,100 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Outermost, so the request id and duration cover the whole request
+app.add_middleware(RequestContextMiddleware)
+
+# Configure logging: records are written by a background thread (LOG_FORMAT=json for JSON lines)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Background jobs, run by whichever worker holds the scheduler lease
+BACKGROUND_JOBS = [
+    ("release_expired_holds", reservations.HOLD_SWEEP_INTERVAL_SECONDS, reservations.sweep_expired_holds),
+    ("reconcile_pending_orders", order_jobs.RECONCILE_INTERVAL_SECONDS, order_jobs.reconcile_pending_orders),
+    ("purge_finished_holds", 6 * 3600, reservations.purge_finished_holds),
+    ("archive_finished", archive.ARCHIVE_INTERVAL_SECONDS, archive.archive_finished),
+    ("refresh_fx_rates", pricing.FX_REFRESH_SECONDS, pricing.refresh_fx_rates),
+]
+
+# Created at startup, together with the database client
+scheduler = None
+# Outbox workers run on every node; claims are atomic
+mailer = None
+
+@app.on_event("startup")
+async def ensure_indexes():
+    db = get_db()
+    await cart_service.ensure_indexes(db)
+    await reservations.ensure_indexes(db)
+    await idempotency.ensure_indexes(db)
+    await archive.ensure_indexes(db)
+    await promotions.ensure_indexes(db)
+    await mail_service.ensure_indexes(db)
+    await audit.ensure_indexes(db)
+    await analytics.ensure_indexes(db)
+    await product_import.ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_scheduler():
+    global scheduler
+    scheduler = Scheduler(get_db())
+    for name, interval, func in BACKGROUND_JOBS:
+        scheduler.add_job(name, interval, func)
+    await scheduler.ensure_indexes()
+    scheduler.start()
+
+@app.on_event("startup")
+async def start_mailer():
+    global mailer
+    mailer = mail_service.Mailer(get_db())
+    mailer.start()
+
+@app.on_event("startup")
+async def start_audit_log():
+    # Admin actions are buffered in memory and written in batches
+    audit.audit_log.start(get_db())
+
+@app.on_event("startup")
+async def load_fx_rates():
+    # Rates are read from memory on the request path; keep them fresh in the background
+    await pricing.fx_rates.reload(get_db())
+    pricing.fx_rates.start(get_db())
+
+@app.on_event("startup")
+async def start_cache_sync():
+    # Invalidations from the other workers
+    shared_cache.start()
+
+@app.on_event("startup")
+async def start_warm_up():
+    # Import what checkout and admin routes need off the request path
+    warm_up()
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    if scheduler is not None:
+        await scheduler.stop()
+
+@app.on_event("shutdown")
+async def stop_mailer():
+    if mailer is not None:
+        await mailer.stop()
+
+@app.on_event("shutdown")
+async def stop_cache_sync():
+    await shared_cache.stop()
+
+@app.on_event("shutdown")
+async def stop_fx_rates():
+    await pricing.fx_rates.stop()
+
+@app.on_event("shutdown")
+async def stop_audit_log():
+    # Writes what is still buffered, so it must run before the client closes
+    await audit.audit_log.stop()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    if _client is not None:
+        _client.close()
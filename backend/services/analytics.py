@@ -0,0 +1,209 @@
+"""
+Sales analytics from pre-aggregated daily buckets.
+
+When an order is paid, each of its lines is added to a ``sales_daily``
+bucket keyed by day (UTC, of the payment), product and currency. Buckets
+also carry the product's category and the start of their week (Monday)
+and month, so range queries with day, week or month rollups are a small
+aggregation over the buckets and never read the ``orders`` collection.
+
+Revenue is net of the order's discount (spread over its lines by value)
+and excludes tax; ``revenue`` is in the bucket's currency and
+``revenue_base`` in the pricing base currency. ``orders`` counts the
+orders containing the product, so it adds up to order lines, not orders,
+when products are combined. Each order is counted once: it is flagged
+``analytics_recorded`` (with the payment time the buckets used) before its
+lines are added. Cancelling a counted order subtracts the same lines from
+the same buckets, once, flagged ``analytics_reversed``.
+"""
+
+import asyncio
+import io
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Sequence
+import os
+
+from pymongo import UpdateOne
+
+PERIODS = ("day", "week", "month")
+GROUPS = ("product", "category", "currency")
+ANALYTICS_MAX_ROWS = int(os.environ.get('ANALYTICS_MAX_ROWS', '50000'))
+
+_GROUP_FIELDS = {"product": "product_id", "category": "category", "currency": "currency"}
+
+
+async def ensure_indexes(db):
+    await db.sales_daily.create_index([("day", 1), ("product_id", 1), ("currency", 1)], unique=True)
+    await db.sales_daily.create_index([("product_id", 1), ("day", 1)])
+    await db.sales_daily.create_index([("category", 1), ("day", 1)])
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time())
+
+
+def period_starts(day: date) -> dict:
+    """Start of the day, week (Monday) and month containing ``day``"""
+    return {
+        "day": _midnight(day),
+        "week": _midnight(day - timedelta(days=day.weekday())),
+        "month": _midnight(day.replace(day=1))
+    }
+
+
+def sale_increments(order: dict) -> List[dict]:
+    """Bucket key and increments for each line of a paid order"""
+    paid_at = order.get("analytics_paid_at") or order.get("updated_at") or datetime.utcnow()
+    starts = period_starts(paid_at.date())
+    currency = order.get("currency", "USD")
+    fx_rate = order.get("fx_rate") or 1
+    subtotal = order.get("subtotal") or 0
+    # Share of each line's value left after the order-level discount
+    net_share = (subtotal - (order.get("discount") or 0)) / subtotal if subtotal else 1
+
+    increments = {}
+    for item in order["items"]:
+        gross = item["price"] * item.get("quantity", 1)
+        key = item["product_id"]
+        entry = increments.get(key)
+        if entry is None:
+            entry = increments[key] = {
+                "key": {"day": starts["day"], "product_id": key, "currency": currency},
+                "set": {
+                    "week": starts["week"],
+                    "month": starts["month"],
+                    "product_name": item["product_name"],
+                    "category": item.get("category")
+                },
+                "inc": {"orders": 1, "quantity": 0, "revenue": 0.0, "revenue_base": 0.0}
+            }
+        net = gross * net_share
+        entry["inc"]["quantity"] += item.get("quantity", 1)
+        entry["inc"]["revenue"] += net
+        entry["inc"]["revenue_base"] += net / fx_rate
+    return list(increments.values())
+
+
+def _bucket_writes(order: dict, sign: int = 1) -> List[UpdateOne]:
+    writes = []
+    for increment in sale_increments(order):
+        inc = {field: sign * value for field, value in increment["inc"].items()}
+        writes.append(UpdateOne(increment["key"], {"$set": increment["set"], "$inc": inc}, upsert=True))
+    return writes
+
+
+async def record_sale(db, order: dict) -> bool:
+    """Add a newly paid order to the daily buckets; returns False if it was already added"""
+    paid_at = order.get("updated_at") or datetime.utcnow()
+    claimed = await db.orders.update_one(
+        {"id": order["id"], "analytics_recorded": {"$ne": True}},
+        {"$set": {"analytics_recorded": True, "analytics_paid_at": paid_at}}
+    )
+    if not claimed.modified_count:
+        return False
+    try:
+        await db.sales_daily.bulk_write(_bucket_writes({**order, "analytics_paid_at": paid_at}), ordered=False)
+    except Exception:
+        # Not counted; let a later call add it
+        await db.orders.update_one({"id": order["id"]}, {"$set": {"analytics_recorded": False}})
+        raise
+    return True
+
+
+async def reverse_sale(db, order_id: str) -> bool:
+    """Take a cancelled order back out of the daily buckets; returns False if it was not in them"""
+    order = await db.orders.find_one_and_update(
+        {"id": order_id, "analytics_recorded": True, "analytics_reversed": {"$ne": True}},
+        {"$set": {"analytics_reversed": True}},
+        projection={"_id": 0}
+    )
+    if order is None:
+        return False
+    try:
+        await db.sales_daily.bulk_write(_bucket_writes(order, sign=-1), ordered=False)
+    except Exception:
+        await db.orders.update_one({"id": order_id}, {"$set": {"analytics_reversed": False}})
+        raise
+    return True
+
+
+def sales_pipeline(
+    start: date,
+    end: date,
+    period: str = "day",
+    group_by: Sequence[str] = (),
+    product_id: Optional[str] = None,
+    category: Optional[str] = None,
+    currency: Optional[str] = None
+) -> list:
+    """Aggregation over ``sales_daily`` for ``start``..``end`` (inclusive), one row per period and group"""
+    match: dict = {"day": {"$gte": _midnight(start), "$lt": _midnight(end + timedelta(days=1))}}
+    if product_id:
+        match["product_id"] = product_id
+    if category:
+        match["category"] = category
+    if currency:
+        match["currency"] = currency.upper()
+
+    group_id = {"period": f"${period}", **{_GROUP_FIELDS[g]: f"${_GROUP_FIELDS[g]}" for g in group_by}}
+    group = {
+        "_id": group_id,
+        "orders": {"$sum": "$orders"},
+        "quantity": {"$sum": "$quantity"},
+        "revenue_base": {"$sum": "$revenue_base"}
+    }
+    # Amounts in different currencies are only added up within one currency
+    by_currency = "currency" in group_by or bool(currency)
+    if by_currency:
+        group["revenue"] = {"$sum": "$revenue"}
+    if "product" in group_by:
+        group["product_name"] = {"$last": "$product_name"}
+
+    project = {
+        "_id": 0,
+        "period": "$_id.period",
+        **{_GROUP_FIELDS[g]: f"$_id.{_GROUP_FIELDS[g]}" for g in group_by},
+        "orders": 1,
+        "quantity": 1,
+        "revenue_base": {"$round": ["$revenue_base", 2]}
+    }
+    if by_currency:
+        project["revenue"] = {"$round": ["$revenue", 2]}
+    if "product" in group_by:
+        project["product_name"] = 1
+
+    sort = {"_id.period": 1, **{f"_id.{_GROUP_FIELDS[g]}": 1 for g in group_by}}
+    return [
+        {"$match": match},
+        {"$sort": {"day": 1}},
+        {"$group": group},
+        {"$sort": sort},
+        {"$limit": ANALYTICS_MAX_ROWS},
+        {"$project": project}
+    ]
+
+
+async def sales_report(db, start: date, end: date, **options) -> List[dict]:
+    rows = await db.sales_daily.aggregate(sales_pipeline(start, end, **options)).to_list(length=ANALYTICS_MAX_ROWS)
+    for row in rows:
+        row["period"] = row["period"].date().isoformat()
+    return rows
+
+
+def _export(rows: List[dict], fmt: str) -> bytes:
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(rows)
+    if not frame.empty:
+        frame["period"] = pd.to_datetime(frame["period"])
+    buffer = io.BytesIO()
+    if fmt == "parquet":
+        frame.to_parquet(buffer, index=False)
+    else:
+        frame.to_csv(buffer, index=False, date_format="%Y-%m-%d")
+    return buffer.getvalue()
+
+
+async def export_sales(rows: List[dict], fmt: str) -> bytes:
+    """``rows`` as CSV or Parquet, built off the event loop"""
+    return await asyncio.to_thread(_export, rows, fmt)
@@ -0,0 +1,184 @@
+"""
+Hot/cold archival of finished orders and contacts.
+
+Completed or cancelled orders and responded contacts older than
+``ARCHIVE_AFTER_DAYS`` are moved out of the hot collections into
+compressed segments in ``<collection>_archive``. A segment holds the
+NDJSON of one day's documents (by ``created_at``), compressed with zstd
+when available and zlib otherwise, plus the list of ids it contains so
+single documents can be read back on demand.
+
+A hot document is only deleted if its ``updated_at`` is still the one
+that was copied; one edited while its segment was written stays hot and
+is taken out of the segment again, to be archived by a later run.
+Archived contacts are evicted from every worker's search index.
+"""
+
+import json
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import os
+import logging
+
+from bson import Binary
+from pymongo import ASCENDING, DeleteOne
+
+from services.search import contacts_index
+from services.shared_cache import shared_cache
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '180'))
+ARCHIVE_BATCH = int(os.environ.get('ARCHIVE_BATCH', '5000'))
+ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ARCHIVE_INTERVAL_SECONDS', '3600'))
+
+# Collection -> filter selecting documents that are finished and may be archived
+ARCHIVABLE = {
+    "orders": {"status": {"$in": ["completed", "cancelled"]}},
+    "contacts": {"status": "responded"},
+}
+
+_DATETIME_FIELDS = ("created_at", "updated_at", "last_login")
+
+
+def _compress(data: bytes) -> tuple:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd archive segments")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _encode(doc: dict) -> str:
+    return json.dumps(doc, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+
+def _decode(line: str) -> dict:
+    doc = json.loads(line)
+    for name in _DATETIME_FIELDS:
+        if isinstance(doc.get(name), str):
+            doc[name] = datetime.fromisoformat(doc[name])
+    return doc
+
+
+async def ensure_indexes(db):
+    for name in ARCHIVABLE:
+        archive = db[f"{name}_archive"]
+        await archive.create_index([("ids", ASCENDING)])
+        await archive.create_index([("day", ASCENDING)])
+
+
+def _segment_fields(day_docs: List[dict]) -> dict:
+    raw = "\n".join(_encode(doc) for doc in day_docs).encode()
+    codec, payload = _compress(raw)
+    return {
+        "codec": codec,
+        "count": len(day_docs),
+        "raw_bytes": len(raw),
+        "ids": [doc["id"] for doc in day_docs],
+        "payload": Binary(payload)
+    }
+
+
+async def _evict(name: str, ids: List[str]):
+    """Drop archived documents from the in-memory indexes of every worker"""
+    if name != "contacts" or not ids:
+        return
+    for doc_id in ids:
+        contacts_index.remove(doc_id)
+    # The other workers look the ids up, find them gone and remove them too
+    await shared_cache.invalidate("contacts", ids)
+
+
+async def archive_collection(db, name: str, older_than: Optional[datetime] = None) -> Dict[str, int]:
+    """Move one batch of finished documents of ``name`` into day segments"""
+    older_than = older_than or datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    query = {**ARCHIVABLE[name], "created_at": {"$lt": older_than}}
+    docs = await db[name].find(query, {"_id": 0}).sort("created_at", 1).limit(ARCHIVE_BATCH).to_list(length=ARCHIVE_BATCH)
+
+    by_day: Dict[str, List[dict]] = defaultdict(list)
+    for doc in docs:
+        by_day[doc["created_at"].strftime("%Y-%m-%d")].append(doc)
+
+    segments = archived = 0
+    for day, day_docs in by_day.items():
+        segment_id = str(uuid.uuid4())
+        ids = [doc["id"] for doc in day_docs]
+        await db[f"{name}_archive"].insert_one({
+            "id": segment_id,
+            "day": day,
+            **_segment_fields(day_docs),
+            "archived_at": datetime.utcnow()
+        })
+        # The segment is durable, now drop the hot copies that were not edited since they were read
+        result = await db[name].bulk_write([
+            DeleteOne({**ARCHIVABLE[name], "id": doc["id"], "updated_at": doc.get("updated_at")})
+            for doc in day_docs
+        ], ordered=False)
+        if result.deleted_count != len(ids):
+            kept = await db[name].find({"id": {"$in": ids}}, {"_id": 0, "id": 1}).to_list(length=len(ids))
+            kept_ids = {doc["id"] for doc in kept}
+            day_docs = [doc for doc in day_docs if doc["id"] not in kept_ids]
+            ids = [doc["id"] for doc in day_docs]
+            # Edited meanwhile: they stay hot, so the segment must not hold a second, stale copy
+            if day_docs:
+                await db[f"{name}_archive"].update_one({"id": segment_id}, {"$set": _segment_fields(day_docs)})
+            else:
+                await db[f"{name}_archive"].delete_one({"id": segment_id})
+            logger.info(f"{len(kept_ids)} {name} for {day} changed while archiving, left in the hot collection")
+        await _evict(name, ids)
+        if day_docs:
+            segments += 1
+        archived += len(ids)
+
+    return {"segments": segments, "archived": archived}
+
+
+async def archive_finished(db) -> Dict[str, int]:
+    """Scheduler job: archive old finished orders and contacts"""
+    counts = {}
+    for name in ARCHIVABLE:
+        for key, value in (await archive_collection(db, name)).items():
+            counts[f"{name}_{key}"] = value
+    return counts
+
+
+async def find_archived(db, name: str, doc_id: str) -> Optional[dict]:
+    """Read one archived document back from its segment"""
+    segment = await db[f"{name}_archive"].find_one({"ids": doc_id}, {"_id": 0, "codec": 1, "payload": 1})
+    if segment is None:
+        return None
+    for line in _decompress(segment["codec"], segment["payload"]).decode().splitlines():
+        doc = _decode(line)
+        if doc.get("id") == doc_id:
+            return doc
+    return None
+
+
+async def read_archived_range(db, name: str, start: str, end: str, limit: int = 1000) -> List[dict]:
+    """Archived documents whose segment day falls within [start, end] (YYYY-MM-DD)"""
+    docs: List[dict] = []
+    cursor = db[f"{name}_archive"].find(
+        {"day": {"$gte": start, "$lte": end}},
+        {"_id": 0, "codec": 1, "payload": 1}
+    ).sort("day", -1)
+    async for segment in cursor:
+        for line in _decompress(segment["codec"], segment["payload"]).decode().splitlines():
+            docs.append(_decode(line))
+            if len(docs) >= limit:
+                return docs
+    return docs
@@ -0,0 +1,182 @@
+"""
+Append-only audit log of admin actions.
+
+Handlers call ``audit_log.record(...)``, which only appends to an
+in-memory buffer, so auditing adds no database write to the request.
+A background task writes the buffer with one ``insert_many`` every
+``AUDIT_FLUSH_SECONDS``, or as soon as ``AUDIT_BATCH`` records are
+waiting, into the capped ``audit_log`` collection (the oldest records
+are dropped once it reaches ``AUDIT_MAX_MB``). Records still buffered are
+written on shutdown; if MongoDB is unavailable they are kept and retried,
+up to ``AUDIT_BUFFER_MAX`` records, after which the oldest are dropped
+(and counted in the log). Only the records that failed are retried, and
+``id`` is unique, so a record written by an attempt that looked failed
+is not written twice.
+"""
+
+import asyncio
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+import os
+import logging
+
+from pymongo.errors import BulkWriteError, CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', '2'))
+AUDIT_BATCH = int(os.environ.get('AUDIT_BATCH', '200'))
+AUDIT_BUFFER_MAX = int(os.environ.get('AUDIT_BUFFER_MAX', '10000'))
+AUDIT_MAX_MB = int(os.environ.get('AUDIT_MAX_MB', '256'))
+AUDIT_QUERY_MAX = int(os.environ.get('AUDIT_QUERY_MAX', '1000'))
+
+
+async def ensure_indexes(db):
+    try:
+        await db.create_collection("audit_log", capped=True, size=AUDIT_MAX_MB * 1024 * 1024)
+    except CollectionInvalid:
+        pass  # already exists
+    await db.audit_log.create_index("id", unique=True)
+    await db.audit_log.create_index([("at", -1)])
+    await db.audit_log.create_index([("actor", 1), ("at", -1)])
+    await db.audit_log.create_index([("entity", 1), ("entity_id", 1), ("at", -1)])
+
+
+class AuditLog:
+    """Buffered writer for the ``audit_log`` collection"""
+
+    def __init__(self):
+        self.db = None
+        self._buffer: Deque[dict] = deque(maxlen=AUDIT_BUFFER_MAX)
+        self._dropped = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def record(
+        self,
+        actor: Optional[str],
+        action: str,
+        entity: str,
+        entity_id: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None
+    ):
+        """Queue one audit record, e.g. ``record(username, "update_status", "order", order_id)``"""
+        if len(self._buffer) == self._buffer.maxlen:
+            self._dropped += 1
+        self._buffer.append({
+            "id": str(uuid.uuid4()),
+            "at": datetime.utcnow(),
+            "actor": actor,
+            "action": action,
+            "entity": entity,
+            "entity_id": entity_id,
+            "details": details or {}
+        })
+        if self._wake is not None and len(self._buffer) >= AUDIT_BATCH:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Write the buffered records; returns how many were written"""
+        written = 0
+        try:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(AUDIT_BATCH, len(self._buffer)))]
+                try:
+                    await self.db.audit_log.insert_many(batch, ordered=False)
+                except BulkWriteError as e:
+                    # Duplicate ids were written by an earlier attempt; retry the rest
+                    failed = [
+                        batch[error["index"]] for error in e.details.get("writeErrors", [])
+                        if error.get("code") != 11000
+                    ]
+                    written += len(batch) - len(failed)
+                    if failed:
+                        self._requeue(failed)
+                        raise
+                    continue
+                except Exception:
+                    self._requeue(batch)
+                    raise
+                written += len(batch)
+        finally:
+            if self._dropped:
+                logger.error(f"Audit buffer full, {self._dropped} records dropped")
+                self._dropped = 0
+        return written
+
+    def _requeue(self, records: List[dict]):
+        """Put records back at the front, in order; new ones may have arrived meanwhile"""
+        overflow = len(self._buffer) + len(records) - self._buffer.maxlen
+        if overflow > 0:
+            # Drop the oldest, as ``record`` does, not the newest
+            self._dropped += overflow
+            records = records[overflow:]
+        self._buffer.extendleft(reversed(records))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), AUDIT_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error writing audit log ({len(self._buffer)} records kept): {str(e)}")
+
+    def start(self, db):
+        self.db = db
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.db is not None and self._buffer:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error writing audit log on shutdown, {len(self._buffer)} records lost: {str(e)}")
+
+
+def audit_query(
+    actor: Optional[str] = None,
+    entity: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> dict:
+    query: dict = {}
+    if actor:
+        query["actor"] = actor
+    if entity:
+        query["entity"] = entity
+    if entity_id:
+        query["entity_id"] = entity_id
+    if start or end:
+        query["at"] = {}
+        if start:
+            query["at"]["$gte"] = start
+        if end:
+            query["at"]["$lt"] = end
+    return query
+
+
+async def find_records(db, query: dict, limit: int = 100, skip: int = 0) -> List[dict]:
+    """Audit records matching ``query``, newest first"""
+    cursor = db.audit_log.find(query, {"_id": 0}).sort("at", -1).skip(skip).limit(min(limit, AUDIT_QUERY_MAX))
+    return await cursor.to_list(length=min(limit, AUDIT_QUERY_MAX))
+
+
+audit_log = AuditLog()
@@ -0,0 +1,136 @@
+"""
+Bulk status transitions.
+
+Documents are selected by id or by a filter, read once, checked against a
+transition table and written with a single ``bulk_write``: one
+``UpdateMany`` per current status, conditional on that status so a
+document changed concurrently is left alone and reported as a conflict
+instead of being overwritten. A ``before_write`` hook can veto documents
+just before the write; they are reported as conflicts too.
+"""
+
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import os
+
+from pymongo import UpdateMany
+
+BULK_STATUS_MAX_ITEMS = int(os.environ.get('BULK_STATUS_MAX_ITEMS', '1000'))
+
+
+def status_filter_query(
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+) -> dict:
+    query: dict = {}
+    if status:
+        query["status"] = status
+    if created_after or created_before:
+        query["created_at"] = {}
+        if created_after:
+            query["created_at"]["$gte"] = created_after
+        if created_before:
+            query["created_at"]["$lt"] = created_before
+    return query
+
+
+async def bulk_transition(
+    collection,
+    target: str,
+    transitions: Dict[str, Set[str]],
+    ids: Optional[List[str]] = None,
+    query: Optional[dict] = None,
+    fields: Iterable[str] = (),
+    limit: int = BULK_STATUS_MAX_ITEMS,
+    before_write: Optional[Callable[[List[dict]], Awaitable[Set[str]]]] = None
+) -> Tuple[dict, List[dict]]:
+    """
+    Move the documents with ``ids``, or matching ``query``, to ``target``.
+
+    Returns the summary (``BulkStatusResult`` shape) and the documents that
+    were changed, as read before the write: their ``status`` is the previous
+    one and they include ``fields``. ``before_write`` gets the documents
+    about to be written and returns the ids to leave alone. Raises
+    ValueError when more than ``limit`` documents are selected.
+    """
+    projection = {"_id": 0, "id": 1, "status": 1, **{field: 1 for field in fields}}
+    if ids is not None:
+        requested = list(dict.fromkeys(ids))
+        if len(requested) > limit:
+            raise ValueError(f"at most {limit} ids per request")
+        docs = await collection.find({"id": {"$in": requested}}, projection).to_list(length=len(requested))
+    else:
+        docs = await collection.find(query or {}, projection).sort("created_at", 1).to_list(length=limit + 1)
+        if len(docs) > limit:
+            raise ValueError(f"the filter matches more than {limit} documents")
+        requested = [doc["id"] for doc in docs]
+
+    found = {doc["id"]: doc for doc in docs}
+    outcomes: Dict[str, str] = {}
+    groups: Dict[str, List[str]] = {}
+    for doc_id in requested:
+        doc = found.get(doc_id)
+        if doc is None:
+            outcomes[doc_id] = "not_found"
+        elif doc["status"] == target:
+            outcomes[doc_id] = "unchanged"
+        elif target not in transitions.get(doc["status"], ()):
+            outcomes[doc_id] = "invalid_transition"
+        else:
+            groups.setdefault(doc["status"], []).append(doc_id)
+
+    if groups and before_write is not None:
+        refused = await before_write([found[doc_id] for group in groups.values() for doc_id in group])
+        for doc_id in refused:
+            outcomes[doc_id] = "conflict"
+        for previous in list(groups):
+            groups[previous] = [doc_id for doc_id in groups[previous] if doc_id not in refused]
+            if not groups[previous]:
+                del groups[previous]
+
+    changed: List[dict] = []
+    if groups:
+        now = datetime.utcnow()
+        candidates = [doc_id for group in groups.values() for doc_id in group]
+        result = await collection.bulk_write([
+            UpdateMany(
+                {"id": {"$in": group}, "status": previous},
+                {"$set": {"status": target, "updated_at": now}}
+            )
+            for previous, group in groups.items()
+        ], ordered=False)
+        written = set(candidates)
+        if result.modified_count < len(candidates):
+            # Some changed status in between; the ones written carry this batch's timestamp
+            cursor = collection.find(
+                {"id": {"$in": candidates}, "status": target, "updated_at": now}, {"_id": 0, "id": 1}
+            )
+            written = {doc["id"] for doc in await cursor.to_list(length=len(candidates))}
+        for doc_id in candidates:
+            if doc_id in written:
+                outcomes[doc_id] = "updated"
+                changed.append(found[doc_id])
+            else:
+                outcomes[doc_id] = "conflict"
+
+    summary = {
+        "status": target,
+        "matched": len(found),
+        "updated": len(changed),
+        "results": [
+            {"id": doc_id, "outcome": outcomes[doc_id], "previous": found[doc_id]["status"] if doc_id in found else None}
+            for doc_id in requested
+        ]
+    }
+    return summary, changed
+
+
+def bulk_audit_details(request, summary: dict) -> dict:
+    """Audit details of a bulk change: the selection and the ids actually changed"""
+    return {
+        "status": summary["status"],
+        "filter": request.filter.model_dump(mode="json") if request.filter else None,
+        "requested": len(summary["results"]),
+        "updated_ids": [item["id"] for item in summary["results"] if item["outcome"] == "updated"]
+    }
@@ -0,0 +1,117 @@
+"""
+Cart pricing and priced-snapshot caching.
+
+A cart stores the requested items plus a priced snapshot. Any change to a
+contained product clears the snapshot and bumps the cart revision, and a
+snapshot is only written back if the revision it was priced at is still
+current, so a stale price can never be cached over an invalidation.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, List, Tuple
+
+from fastapi import HTTPException, status
+from pymongo import ASCENDING
+
+from models.cart import CartItem, CartSnapshot, cart_expiry
+from models.order import OrderItem
+from services.pricing import PRICING_BASE_CURRENCY, localize_price, to_float, to_minor
+
+
+async def ensure_indexes(db):
+    """TTL expiry for abandoned carts and lookup by contained product"""
+    await db.carts.create_index("expires_at", expireAfterSeconds=0)
+    await db.carts.create_index([("items.product_id", ASCENDING)])
+    await db.carts.create_index("id", unique=True)
+
+
+async def price_items(products_collection, items) -> Tuple[List[OrderItem], float]:
+    """
+    Validate and price cart items with a single catalog query.
+
+    Raises 404 for unknown products and 400 for inactive products or
+    insufficient stock, with the same messages checkout has always used.
+    """
+    product_ids = list({item.product_id for item in items})
+    products = await products_collection.find(
+        {"id": {"$in": product_ids}},
+        {"_id": 0, "id": 1, "name": 1, "price": 1, "currency": 1, "category": 1, "is_active": 1, "stock": 1}
+    ).to_list(length=len(product_ids))
+    by_id = {product["id"]: product for product in products}
+
+    subtotal_minor = 0
+    validated_items = []
+
+    for item in items:
+        product = by_id.get(item.product_id)
+
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Producto {item.product_id} no encontrado"
+            )
+
+        if not product.get("is_active", True):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Producto {product['name']} no está disponible"
+            )
+
+        if product.get("stock") is not None and product["stock"] < item.quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Stock insuficiente para {product['name']}"
+            )
+
+        # Lines are kept in the base currency; checkout converts them with quote()
+        price = localize_price(product["price"], product.get("currency"), PRICING_BASE_CURRENCY)
+        subtotal_minor += to_minor(Decimal(str(price)), PRICING_BASE_CURRENCY) * item.quantity
+        validated_items.append(OrderItem(
+            product_id=product["id"],
+            product_name=product["name"],
+            price=price,
+            quantity=item.quantity,
+            category=product.get("category")
+        ))
+
+    return validated_items, to_float(subtotal_minor, PRICING_BASE_CURRENCY)
+
+
+async def get_priced_cart(carts_collection, products_collection, cart_id: str) -> dict:
+    """
+    Load a cart with a valid priced snapshot.
+
+    Returns the cached snapshot when nothing has invalidated it, otherwise
+    reprices the cart and caches the new snapshot. Returns ``None`` when the
+    cart does not exist or has expired.
+    """
+    cart = await carts_collection.find_one(
+        {"id": cart_id, "expires_at": {"$gt": datetime.utcnow()}},
+        {"_id": 0}
+    )
+    if not cart or cart.get("snapshot"):
+        return cart
+
+    cart_items = [CartItem(**item) for item in cart.get("items", [])]
+    items, subtotal = await price_items(products_collection, cart_items)
+    snapshot = CartSnapshot(items=items, subtotal=subtotal).model_dump()
+
+    # Only cache if no invalidation happened while we were pricing
+    await carts_collection.update_one(
+        {"id": cart_id, "revision": cart.get("revision", 0)},
+        {"$set": {"snapshot": snapshot, "expires_at": cart_expiry()}}
+    )
+    cart["snapshot"] = snapshot
+    return cart
+
+
+async def invalidate_carts_for_products(carts_collection, product_ids: Iterable[str]):
+    """Drop cached snapshots of every cart containing one of ``product_ids``"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    await carts_collection.update_many(
+        {"items.product_id": {"$in": product_ids}},
+        {"$set": {"snapshot": None}, "$inc": {"revision": 1}}
+    )
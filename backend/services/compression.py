@@ -0,0 +1,362 @@
+"""
+Response compression.
+
+``CompressionMiddleware`` compresses compressible responses above a size
+threshold with brotli (when installed) or gzip, flushing each chunk of
+streaming responses as it goes. Responses that already carry a
+``Content-Encoding`` pass through untouched, which is how precompressed
+payloads built once at publish time skip per-request compression.
+
+Published payloads are also kept in the shared cache tier, so after a
+change only one worker renders and compresses them again.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+import os
+import logging
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+from services.serialization import dumps_json
+from services.shared_cache import shared_cache, CACHE_TTL_SECONDS
+from services.single_flight import flight_group
+from services.swr_cache import SWR_MAX_STALE_SECONDS, SWR_RETRY_SECONDS
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+PAYLOADS_TOPIC = "payloads"
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/msgpack",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def supported_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str, available: Iterable[str] = None) -> Optional[str]:
+    """Preferred encoding allowed by an Accept-Encoding header"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in available or supported_encodings():
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type or content_type.startswith("text/event-stream"):
+        return False
+    return any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self.app, encoding, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _new_compressor(self):
+        if self.encoding == "br":
+            return _BrotliCompressor(BROTLI_QUALITY)
+        return _GzipCompressor(GZIP_LEVEL)
+
+    async def send_compressed(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the headers until the first body chunk shows the size
+            self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(scope=self.start_message)
+            if (
+                "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = self._new_compressor()
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body:
+                data = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(data))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": data})
+                return
+
+            # Streaming: length is unknown, flush every chunk to the client
+            del headers["Content-Length"]
+            await self.send(self.start_message)
+
+        data = self.compressor.compress(body)
+        data += self.compressor.flush() if more_body else self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+class PrecompressedPayload:
+    """A response body rendered and compressed once, served many times"""
+
+    def __init__(self, body: bytes, media_type: str = "application/json", variants: Optional[Dict[str, bytes]] = None):
+        self.body = body
+        self.media_type = media_type
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if variants is None:
+            variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(body, quality=11)
+        self.variants = variants
+
+    @classmethod
+    def from_content(cls, content) -> "PrecompressedPayload":
+        return cls(dumps_json(content))
+
+    def response(self, request: Request) -> Response:
+        """Best stored variant for the client, or 304 when its copy is current"""
+        headers = {"ETag": self.etag, "Vary": "Accept-Encoding"}
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=304, headers=headers)
+        encoding = choose_encoding(
+            request.headers.get("accept-encoding", ""),
+            available=[e for e in supported_encodings() if e in self.variants]
+        )
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(
+            self.variants.get(encoding, self.body),
+            media_type=self.media_type,
+            headers=headers
+        )
+
+
+class PrecompressedCache:
+    """
+    Published payloads by name, dropped when their source changes.
+
+    Each worker serves its own copy from memory. Copies are also stored in
+    the shared tier under a per-name generation that every invalidation
+    bumps, so a render started before a change can never be stored as
+    current, and other workers are told to drop their copy. A dropped copy
+    is kept as last-known-good and served if rendering the new one fails,
+    for up to ``SWR_MAX_STALE_SECONDS``; until a render succeeds again it is
+    served without waiting, and one render is retried in the background
+    every ``SWR_RETRY_SECONDS``.
+    """
+
+    def __init__(self, shared=None):
+        self._payloads: Dict[str, PrecompressedPayload] = {}
+        self._invalidations: Dict[str, int] = {}
+        self._last_good: Dict[str, Tuple[PrecompressedPayload, float]] = {}
+        self._retry_at: Dict[str, float] = {}  # names whose last render failed
+        self.shared = shared
+        self._flight = flight_group("payloads")
+        if shared is not None:
+            shared.subscribe(PAYLOADS_TOPIC)(self._drop)
+
+    def get(self, name: str) -> Optional[PrecompressedPayload]:
+        return self._payloads.get(name)
+
+    async def get_or_publish(self, name: str, render: Callable[[], Awaitable]) -> PrecompressedPayload:
+        """This worker's copy, else the shared one, else render and publish ``await render()``"""
+        payload = self._payloads.get(name)
+        if payload is not None:
+            return payload
+        # Requests missing the same payload together render it once; one
+        # started before an invalidation is not joined after it
+        key = (name, self._invalidations.get(name, 0))
+        retry_at = self._retry_at.get(name)
+        fallback = self._fallback(name) if retry_at is not None else None
+        if fallback is not None:
+            # The last render failed: answer from the old copy, retry in the background
+            if time.monotonic() >= retry_at:
+                self._retry_at[name] = time.monotonic() + SWR_RETRY_SECONDS
+                task = asyncio.ensure_future(self._flight.do(key, lambda: self._fetch_or_render(name, render)))
+                task.add_done_callback(lambda done: self._retry_done(name, done))
+            return fallback
+        return await self._flight.do(key, lambda: self._fetch_or_render(name, render))
+
+    def _retry_done(self, name: str, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background render of {name} payload failed: {task.exception()}")
+
+    async def _fetch_or_render(self, name: str, render: Callable[[], Awaitable]) -> PrecompressedPayload:
+        seen = self._invalidations.get(name, 0)
+        generation = await self._generation(name)
+        payload = await self._load(name, generation)
+        if payload is None:
+            try:
+                content = await render()
+            except HTTPException:
+                raise
+            except Exception as e:
+                fallback = self._fallback(name)
+                if fallback is None:
+                    raise
+                logger.warning(f"Serving last-known-good {name} payload: {str(e)}")
+                self._retry_at[name] = time.monotonic() + SWR_RETRY_SECONDS
+                return fallback
+            payload = PrecompressedPayload.from_content(content)
+            await self._store(name, generation, payload)
+        self._retry_at.pop(name, None)
+
+        # Keep it only if nothing changed while we were rendering
+        if self._invalidations.get(name, 0) == seen:
+            self._payloads[name] = payload
+        return payload
+
+    async def invalidate(self, name: str):
+        await self._drop([name])
+        if self.shared is None:
+            return
+        try:
+            await self.shared.backend.incr(f"payload-generation:{name}")
+        except Exception as e:
+            logger.error(f"Error bumping payload generation for {name}: {str(e)}")
+        await self.shared.invalidate(PAYLOADS_TOPIC, [name])
+
+    def _fallback(self, name: str) -> Optional[PrecompressedPayload]:
+        payload, dropped_at = self._last_good.get(name, (None, 0.0))
+        if payload is not None and time.monotonic() - dropped_at < SWR_MAX_STALE_SECONDS:
+            return payload
+        return None
+
+    async def _drop(self, names):
+        for name in list(self._payloads) if names is None else names:
+            payload = self._payloads.pop(name, None)
+            if payload is not None:
+                self._last_good[name] = (payload, time.monotonic())
+            self._invalidations[name] = self._invalidations.get(name, 0) + 1
+            self._retry_at.pop(name, None)
+
+    async def _generation(self, name: str) -> Optional[int]:
+        if self.shared is None:
+            return None
+        try:
+            return await self.shared.backend.get_int(f"payload-generation:{name}")
+        except Exception as e:
+            logger.error(f"Error reading payload generation for {name}: {str(e)}")
+            return None
+
+    async def _load(self, name: str, generation: Optional[int]) -> Optional[PrecompressedPayload]:
+        if generation is None:
+            return None
+        encodings = ("identity", "gzip", "br")
+        try:
+            values = await self.shared.backend.get_many([f"payload:{name}:{generation}:{e}" for e in encodings])
+        except Exception as e:
+            logger.error(f"Error loading shared payload {name}: {str(e)}")
+            return None
+        stored = {encoding: value for encoding, value in zip(encodings, values) if value is not None}
+        if "identity" not in stored:
+            return None
+        body = stored.pop("identity")
+        return PrecompressedPayload(body, variants=stored)
+
+    async def _store(self, name: str, generation: Optional[int], payload: PrecompressedPayload):
+        if generation is None:
+            return
+        values = {"identity": payload.body, **payload.variants}
+        try:
+            await self.shared.backend.set_many(
+                {f"payload:{name}:{generation}:{e}": value for e, value in values.items()},
+                CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Error storing shared payload {name}: {str(e)}")
+
+
+published_payloads = PrecompressedCache(shared_cache)
@@ -0,0 +1,89 @@
+"""
+Live admin dashboard.
+
+The admin event stream starts with a snapshot of the order statistics and
+then follows the order and contact events of the write routes, turning
+each one into a small change (delta) of those statistics, so an open
+dashboard does not re-run the list and stats queries to stay current.
+The snapshot is sent again every ``ADMIN_STATS_RESYNC_SECONDS`` to correct
+any drift from events a slow stream lost.
+"""
+
+from typing import Dict, Optional
+import os
+
+from services.events import event_bus
+
+CONTACT_EVENTS = "contacts"
+ADMIN_STATS_RESYNC_SECONDS = int(os.environ.get('ADMIN_STATS_RESYNC_SECONDS', '300'))
+
+# Order statuses with their own counter in the stats
+_COUNTED_STATUSES = {"paid": "paid_orders", "pending": "pending_orders"}
+
+
+async def order_stats(db) -> dict:
+    """Order counts and revenue (in the base currency) for the dashboard"""
+    total_orders = await db.orders.count_documents({})
+    paid_orders = await db.orders.count_documents({"status": "paid"})
+    pending_orders = await db.orders.count_documents({"status": "pending"})
+    # Calculate total revenue, in the base currency (orders may be charged in others)
+    revenue_result = await db.orders.aggregate([
+        {"$match": {"status": "paid"}},
+        {"$group": {"_id": None, "total_revenue": {
+            "$sum": {"$divide": ["$total", {"$ifNull": ["$fx_rate", 1]}]}
+        }}}
+    ]).to_list(1)
+    total_revenue = revenue_result[0]["total_revenue"] if revenue_result else 0
+    # Archived orders are finished ones, only their count is needed here
+    archived_result = await db.orders_archive.aggregate([
+        {"$group": {"_id": None, "count": {"$sum": "$count"}}}
+    ]).to_list(1)
+    archived_orders = archived_result[0]["count"] if archived_result else 0
+    return {
+        "total_orders": total_orders + archived_orders,
+        "archived_orders": archived_orders,
+        "paid_orders": paid_orders,
+        "pending_orders": pending_orders,
+        "total_revenue": round(total_revenue, 2)
+    }
+
+
+def stats_delta(event: dict) -> Optional[Dict[str, float]]:
+    """How an order event changes ``order_stats``; None when it does not"""
+    if "order_id" not in event:
+        return None
+    status, previous = event.get("status"), event.get("previous")
+    delta: Dict[str, float] = {}
+    if event.get("type") == "created":
+        delta["total_orders"] = 1
+        previous = None
+    for counted, field in _COUNTED_STATUSES.items():
+        change = (status == counted) - (previous == counted)
+        if change:
+            delta[field] = change
+    amount = event.get("amount")
+    if amount is not None and "paid" in (status, previous) and status != previous:
+        delta["total_revenue"] = round(amount if status == "paid" else -amount, 2)
+    return delta or None
+
+
+async def contact_created(contact: dict):
+    await event_bus.publish(CONTACT_EVENTS, {
+        "type": "created",
+        "contact_id": contact["id"],
+        "status": contact["status"],
+        "contact": {
+            "id": contact["id"],
+            "name": contact["name"],
+            "email": contact["email"],
+            "subject": contact["subject"],
+            "status": contact["status"],
+            "created_at": contact["created_at"].isoformat()
+        }
+    })
+
+
+async def contact_status_changed(contact_id: str, status: str, previous: Optional[str] = None):
+    await event_bus.publish(CONTACT_EVENTS, {
+        "type": "status", "contact_id": contact_id, "status": status, "previous": previous
+    })
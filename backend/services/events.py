@@ -0,0 +1,73 @@
+"""
+Internal event bus.
+
+Code that changes state publishes small JSON-serializable events on a
+topic; long-poll and server-sent-event handlers subscribe to the topics
+they stream. Events are delivered to the subscribers of every worker:
+locally right away and to the other workers through the shared cache
+channel. Delivery is best effort. A subscriber that falls
+``EVENT_QUEUE_SIZE`` events behind loses the oldest ones, so streams must
+also be able to re-read current state.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Set
+import os
+import logging
+
+from services.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', '100'))
+# Comment lines sent on idle streams so proxies keep them open
+SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+SSE_HEARTBEAT = ": keep-alive\n\n"
+
+
+def sse_message(event: str, data: str) -> str:
+    """One server-sent event; ``data`` must be a single line (e.g. JSON)"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+class EventBus:
+    """Topic-based publish/subscribe across the workers"""
+
+    def __init__(self, shared=None):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.shared = shared
+        if shared is not None:
+            shared.on_event(self._deliver)
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._subscribers.get(topic, ()))
+
+    async def publish(self, topic: str, event: dict):
+        self._deliver(topic, event)
+        if self.shared is not None:
+            await self.shared.send_event(topic, event)
+
+    def _deliver(self, topic: str, event: dict):
+        for queue in self._subscribers.get(topic, ()):
+            if queue.full():
+                queue.get_nowait()  # drop the oldest for a slow subscriber
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, *topics: str) -> AsyncIterator[asyncio.Queue]:
+        """Queue receiving the events of ``topics`` while the context is open"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        for topic in topics:
+            self._subscribers.setdefault(topic, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            for topic in topics:
+                subscribers = self._subscribers[topic]
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+
+event_bus = EventBus(shared_cache)
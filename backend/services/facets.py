@@ -0,0 +1,199 @@
+"""
+Faceted catalog browsing with incrementally maintained facet counts.
+
+Active products are held in memory together with one posting set per facet
+value. Writes move a product between posting sets, so unfiltered counts are
+just set sizes and filtered counts are set intersections.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import os
+import logging
+
+from services.swr_cache import SWR_FRESH_SECONDS, SWR_MAX_STALE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CATALOG_INDEX_MAX_AGE = int(os.environ.get('CATALOG_INDEX_MAX_AGE_SECONDS', '300'))
+
+# Price range buckets as "low-high" pairs, the last one may be open ended
+PRICE_RANGES = os.environ.get('CATALOG_PRICE_RANGES', '0-250,250-500,500-1000,1000-')
+
+FACETS = ("category", "price_range", "duration", "modules", "certificate")
+
+SORTS = {
+    "name": (lambda p: p.get("name", "").lower(), False),
+    "price_asc": (lambda p: p.get("price", 0), False),
+    "price_desc": (lambda p: p.get("price", 0), True),
+    "newest": (lambda p: p.get("created_at") or datetime.min, True),
+    "modules": (lambda p: p.get("modules") or 0, True),
+}
+
+
+def _parse_price_ranges(spec: str) -> List[Tuple[str, float, Optional[float]]]:
+    ranges = []
+    for part in spec.split(','):
+        low, _, high = part.strip().partition('-')
+        ranges.append((part.strip(), float(low), float(high) if high else None))
+    return ranges
+
+
+_price_ranges = _parse_price_ranges(PRICE_RANGES)
+
+
+def price_range(price) -> Optional[str]:
+    """Label of the configured price bucket containing ``price``"""
+    if price is None:
+        return None
+    for label, low, high in _price_ranges:
+        if price >= low and (high is None or price < high):
+            return label
+    return None
+
+
+def facet_values(product: dict) -> Dict[str, Optional[str]]:
+    """Facet value of each facet for a product, as strings"""
+    certificate = product.get("certificate")
+    modules = product.get("modules")
+    return {
+        "category": product.get("category"),
+        "price_range": price_range(product.get("price")),
+        "duration": product.get("duration"),
+        "modules": str(modules) if modules is not None else None,
+        "certificate": None if certificate is None else str(bool(certificate)).lower(),
+    }
+
+
+class FacetIndex:
+    """In-memory catalog of active products with per-value posting sets"""
+
+    def __init__(self):
+        self._products: Dict[str, dict] = {}
+        self._postings: Dict[str, Dict[str, Set[str]]] = {facet: {} for facet in FACETS}
+        self._values: Dict[str, Dict[str, Optional[str]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._built_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._products)
+
+    def upsert(self, product: dict):
+        """Add or move a product; inactive products are dropped"""
+        product_id = product["id"]
+        self.remove(product_id)
+        if not product.get("is_active", True):
+            return
+        product = {k: v for k, v in product.items() if k != "_id"}
+        values = facet_values(product)
+        for facet, value in values.items():
+            if value is not None:
+                self._postings[facet].setdefault(value, set()).add(product_id)
+        self._products[product_id] = product
+        self._values[product_id] = values
+
+    def remove(self, product_id: str):
+        """Drop a product and decrement its facet counts"""
+        values = self._values.pop(product_id, None)
+        if values is None:
+            return
+        self._products.pop(product_id, None)
+        for facet, value in values.items():
+            postings = self._postings[facet].get(value)
+            if postings is not None:
+                postings.discard(product_id)
+                if not postings:
+                    del self._postings[facet][value]
+
+    def clear(self):
+        self._products.clear()
+        self._values.clear()
+        for postings in self._postings.values():
+            postings.clear()
+        self._loaded_at = None
+        self._built_at = None
+
+    def expire(self):
+        """Rebuild on next use, serving the current contents if that fails"""
+        self._loaded_at = None
+
+    def _matching(self, filters: Dict[str, List[str]], exclude: Optional[str] = None) -> Set[str]:
+        """Ids matching every facet filter (values within a facet are OR-ed)"""
+        matching: Optional[Set[str]] = None
+        for facet, values in filters.items():
+            if facet == exclude or not values:
+                continue
+            ids = set()
+            for value in values:
+                ids |= self._postings[facet].get(value, set())
+            matching = ids if matching is None else matching & ids
+        return set(self._products) if matching is None else matching
+
+    def counts(self, filters: Dict[str, List[str]]) -> Dict[str, List[Tuple[str, int]]]:
+        """
+        Count per facet value.
+
+        Each facet is counted against the filters on the *other* facets, so
+        selecting a category still shows the alternatives next to it.
+        """
+        result = {}
+        for facet in FACETS:
+            postings = self._postings[facet]
+            if not any(values for other, values in filters.items() if other != facet):
+                counts = [(value, len(ids)) for value, ids in postings.items()]
+            else:
+                base = self._matching(filters, exclude=facet)
+                counts = [(value, len(ids & base)) for value, ids in postings.items()]
+            result[facet] = sorted(
+                ((value, count) for value, count in counts if count),
+                key=lambda item: (-item[1], item[0])
+            )
+        return result
+
+    def browse(
+        self,
+        filters: Dict[str, List[str]],
+        sort: str = "name",
+        limit: int = 20,
+        skip: int = 0
+    ) -> Tuple[int, List[dict]]:
+        """Filtered, sorted page of products and the total match count"""
+        key, reverse = SORTS[sort]
+        products = [self._products[pid] for pid in self._matching(filters)]
+        products.sort(key=key, reverse=reverse)
+        return len(products), products[skip:skip + limit]
+
+    async def ensure_loaded(self, collection):
+        """
+        Load active products from ``collection`` on first use or when too old.
+
+        If the database fails, a previous load younger than
+        ``SWR_MAX_STALE_SECONDS`` keeps being served.
+        """
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < CATALOG_INDEX_MAX_AGE:
+            return
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < CATALOG_INDEX_MAX_AGE:
+                return
+            try:
+                products = await collection.find(
+                    {"is_active": True, "id": {"$exists": True}}, {"_id": 0}
+                ).to_list(length=None)
+            except Exception as e:
+                if self._built_at is None or time.monotonic() - self._built_at > SWR_MAX_STALE_SECONDS:
+                    raise
+                # Keep serving the last build; retry shortly instead of on every request
+                logger.warning(f"Catalog facet index not rebuilt, serving the previous one: {str(e)}")
+                self._loaded_at = time.monotonic() - CATALOG_INDEX_MAX_AGE + SWR_FRESH_SECONDS
+                return
+            self.clear()
+            for product in products:
+                self.upsert(product)
+            self._loaded_at = self._built_at = time.monotonic()
+            logger.info(f"Catalog facet index built with {len(products)} products")
+
+
+catalog_facets = FacetIndex()
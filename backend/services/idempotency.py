@@ -0,0 +1,150 @@
+"""
+Idempotency-Key support for non-idempotent POST routes.
+
+The first request with a key claims it in the ``idempotency_keys``
+collection, runs, and stores its response; later requests with the same key
+and payload get the stored response back. Concurrent duplicates in the same
+process await the in-flight call instead of running it again, and
+duplicates arriving on another process while the first is running get 409.
+Responses that are not final (``is_final`` returns False) are not stored,
+so a retry with the same key runs again. Keys expire after
+``IDEMPOTENCY_TTL_HOURS``.
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import os
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+
+IDEMPOTENCY_CLAIM_ATTEMPTS = 3
+
+_inflight: Dict[str, Tuple[str, asyncio.Future]] = {}  # key -> (request hash, future)
+
+
+async def ensure_indexes(db):
+    await db.idempotency_keys.create_index("key", unique=True)
+    await db.idempotency_keys.create_index(
+        "created_at", expireAfterSeconds=IDEMPOTENCY_TTL_HOURS * 3600
+    )
+
+
+def request_hash(payload: Any) -> str:
+    """Stable fingerprint of a request payload"""
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+async def run_idempotent(
+    collection,
+    key: Optional[str],
+    scope: str,
+    payload: Any,
+    func: Callable[[], Awaitable[Any]],
+    is_final: Callable[[Any], bool] = lambda response: True
+) -> Tuple[Any, bool]:
+    """
+    Run ``func`` at most once per ``scope`` and ``key``.
+
+    Returns the JSON-compatible response and whether it was replayed from a
+    previous request. Without a key, ``func`` simply runs. A response for
+    which ``is_final`` is False releases the key instead of being stored.
+    """
+    if not key:
+        return await func(), False
+
+    full_key = f"{scope}:{key}"
+    fingerprint = request_hash(payload)
+    inflight = _inflight.get(full_key)
+    if inflight is not None:
+        inflight_hash, inflight_future = inflight
+        _check_hash(inflight_hash, fingerprint)
+        response, _ = await asyncio.shield(inflight_future)
+        return response, True
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[full_key] = (fingerprint, future)
+    try:
+        result = await _execute(collection, full_key, fingerprint, func, is_final)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # waiters re-raise it; keep asyncio from warning when there are none
+        raise
+    finally:
+        _inflight.pop(full_key, None)
+
+
+def _check_hash(stored: str, fingerprint: str):
+    if stored != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="La Idempotency-Key ya se usó con una solicitud distinta"
+        )
+
+
+def _replay(existing: dict, fingerprint: str) -> Tuple[Any, bool]:
+    _check_hash(existing["request_hash"], fingerprint)
+    if existing["status"] != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ya hay una solicitud en curso con esta Idempotency-Key"
+        )
+    return existing["response"], True
+
+
+async def _claim(collection, full_key: str, fingerprint: str) -> Optional[dict]:
+    """Claim the key; returns the stored request instead when another one holds it"""
+    for _ in range(IDEMPOTENCY_CLAIM_ATTEMPTS):
+        existing = await collection.find_one({"key": full_key}, {"_id": 0})
+        if existing:
+            return existing
+        try:
+            await collection.insert_one({
+                "key": full_key,
+                "request_hash": fingerprint,
+                "status": "in_progress",
+                "created_at": datetime.utcnow()
+            })
+            return None
+        except DuplicateKeyError:
+            # Taken in between; if that request has already failed and let go of it, try again
+            continue
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Ya hay una solicitud en curso con esta Idempotency-Key"
+    )
+
+
+async def _execute(collection, full_key: str, fingerprint: str, func, is_final) -> Tuple[Any, bool]:
+    existing = await _claim(collection, full_key, fingerprint)
+    if existing:
+        return _replay(existing, fingerprint)
+
+    try:
+        response = jsonable_encoder(await func())
+    except BaseException:
+        # Let the client retry a failed request with the same key
+        await collection.delete_one({"key": full_key, "status": "in_progress"})
+        raise
+
+    if not is_final(response):
+        # Worth asking again later (e.g. a payment still processing)
+        await collection.delete_one({"key": full_key, "status": "in_progress"})
+        return response, False
+    await collection.update_one(
+        {"key": full_key},
+        {"$set": {"status": "completed", "response": response}}
+    )
+    return response, False
@@ -0,0 +1,274 @@
+"""
+Transactional email through a durable outbox.
+
+Request handlers only insert into ``email_outbox``. Background workers
+claim due messages in batches, send each batch over one pooled SMTP
+connection (kept open between batches while busy) and record the outcome.
+Failed sends are retried with exponential backoff up to
+``MAIL_MAX_ATTEMPTS``, except messages that cannot be built, which fail
+at once; messages claimed by a worker that died are picked
+up again once their claim expires.
+"""
+
+import asyncio
+import smtplib
+import ssl
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import List, Optional
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.environ.get('SMTP_HOST', '')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
+SMTP_USER = os.environ.get('SMTP_USER', '')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', 'true').lower() == 'true'
+SMTP_TIMEOUT_SECONDS = int(os.environ.get('SMTP_TIMEOUT_SECONDS', '20'))
+# Close the pooled connection after this long without sending
+SMTP_IDLE_SECONDS = int(os.environ.get('SMTP_IDLE_SECONDS', '60'))
+MAIL_FROM = os.environ.get('MAIL_FROM', 'IDEF Internacional <no-reply@idef.cl>')
+STAFF_EMAIL = os.environ.get('STAFF_EMAIL', '')
+
+MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS', '1'))
+MAIL_BATCH = int(os.environ.get('MAIL_BATCH', '50'))
+MAIL_POLL_SECONDS = int(os.environ.get('MAIL_POLL_SECONDS', '5'))
+MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', '6'))
+MAIL_BACKOFF_SECONDS = int(os.environ.get('MAIL_BACKOFF_SECONDS', '30'))
+MAIL_CLAIM_SECONDS = int(os.environ.get('MAIL_CLAIM_SECONDS', '300'))
+MAIL_RETENTION_DAYS = int(os.environ.get('MAIL_RETENTION_DAYS', '30'))
+
+
+def backoff_delay(attempts: int) -> int:
+    """Seconds to wait before retry number ``attempts``"""
+    return MAIL_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0)
+
+
+def build_message(mail: dict, sender: str = MAIL_FROM) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = mail["to"]
+    message["Subject"] = mail["subject"]
+    message["Message-ID"] = f"<{mail['id']}@idef>"
+    message.set_content(mail["body"])
+    return message
+
+
+class InvalidMessage(str):
+    """Error returned for a mail that cannot be built; retrying will not help"""
+
+
+class SmtpPool:
+    """A single reusable SMTP connection; not thread-safe, one per worker"""
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: str = SMTP_USER,
+        password: str = SMTP_PASSWORD,
+        starttls: bool = SMTP_STARTTLS,
+        idle_seconds: int = SMTP_IDLE_SECONDS
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.idle_seconds = idle_seconds
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+        smtp.ehlo()
+        if self.starttls:
+            smtp.starttls(context=ssl.create_default_context())
+            smtp.ehlo()
+        if self.user:
+            smtp.login(self.user, self.password)
+        return smtp
+
+    def close_if_idle(self):
+        """Close the connection once it has gone ``idle_seconds`` without sending"""
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            self.close()
+
+    def _connection(self) -> smtplib.SMTP:
+        self.close_if_idle()
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+            except smtplib.SMTPException:
+                self.close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    def send_batch(self, mails: List[dict]) -> List[Optional[str]]:
+        """Send ``mails`` over one connection; returns an error message or None per mail"""
+        errors: List[Optional[str]] = []
+        for mail in mails:
+            try:
+                message = build_message(mail)
+            except Exception as e:
+                # A malformed mail (e.g. a line break in a header) fails alone, not the batch
+                errors.append(InvalidMessage(f"Invalid message: {str(e) or e.__class__.__name__}"))
+                continue
+            try:
+                self._connection().send_message(message)
+                errors.append(None)
+            except (smtplib.SMTPException, OSError) as e:
+                errors.append(str(e) or e.__class__.__name__)
+                if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                    self.close()  # reconnect for the next one
+            self._last_used = time.monotonic()
+        return errors
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._smtp = None
+
+
+async def ensure_indexes(db):
+    await db.email_outbox.create_index([("status", 1), ("next_attempt_at", 1)])
+    await db.email_outbox.create_index("sent_at", expireAfterSeconds=MAIL_RETENTION_DAYS * 86400)
+
+
+async def enqueue(db, to: str, subject: str, body: str, kind: str, ref: Optional[str] = None):
+    """Queue an email; sending happens in the background"""
+    now = datetime.utcnow()
+    await db.email_outbox.insert_one({
+        "id": str(uuid.uuid4()),
+        "to": to,
+        "subject": subject,
+        "body": body,
+        "kind": kind,
+        "ref": ref,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now
+    })
+
+
+async def enqueue_order_paid(db, order: dict):
+    lines = "\n".join(
+        f"- {item['product_name']} x{item['quantity']}: {item['price']:.2f} {order.get('currency', 'USD')}"
+        for item in order["items"]
+    )
+    body = (
+        f"Hola {order['customer_name']},\n\n"
+        f"Recibimos tu pago. Detalle de tu orden {order['id']}:\n\n{lines}\n\n"
+        f"Total: {order['total']:.2f} {order.get('currency', 'USD')}\n\n"
+        "Pronto recibirás las instrucciones de acceso.\n\nIDEF Internacional"
+    )
+    await enqueue(db, order["customer_email"], "Confirmación de tu compra - IDEF", body, "order_paid", order["id"])
+
+
+async def enqueue_contact_received(db, submission: dict):
+    if not STAFF_EMAIL:
+        return
+    body = (
+        f"Nueva consulta de {submission['name']} <{submission['email']}>"
+        f"{' - ' + submission['phone'] if submission.get('phone') else ''}\n\n"
+        f"Asunto: {submission['subject']}\n\n{submission['message']}\n"
+    )
+    await enqueue(db, STAFF_EMAIL, f"Nueva consulta: {submission['subject']}", body, "contact_received", submission["id"])
+
+
+class Mailer:
+    """Background workers draining the outbox"""
+
+    def __init__(self, db, workers: int = MAIL_WORKERS):
+        self.db = db
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._pools: List[SmtpPool] = []
+
+    def start(self):
+        if not SMTP_HOST:
+            logger.warning("SMTP_HOST is not set; emails stay queued in email_outbox")
+            return
+        for _ in range(self.workers):
+            pool = SmtpPool()
+            self._pools.append(pool)
+            self._tasks.append(asyncio.create_task(self._worker(pool)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for pool in self._pools:
+            await asyncio.to_thread(pool.close)
+        self._tasks, self._pools = [], []
+
+    async def _claim(self) -> List[dict]:
+        now = datetime.utcnow()
+        claimed = []
+        for _ in range(MAIL_BATCH):
+            mail = await self.db.email_outbox.find_one_and_update(
+                {"$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "claimed_until": {"$lt": now}}
+                ]},
+                {"$set": {"status": "sending", "claimed_until": now + timedelta(seconds=MAIL_CLAIM_SECONDS)}},
+                projection={"_id": 0},
+                sort=[("next_attempt_at", 1)]
+            )
+            if mail is None:
+                break
+            claimed.append(mail)
+        return claimed
+
+    async def drain_once(self, pool: SmtpPool) -> int:
+        """Send one batch; returns how many mails were claimed"""
+        mails = await self._claim()
+        if not mails:
+            return 0
+        errors = await asyncio.to_thread(pool.send_batch, mails)
+        now = datetime.utcnow()
+        for mail, error in zip(mails, errors):
+            if error is None:
+                update = {"status": "sent", "sent_at": now, "attempts": mail["attempts"] + 1}
+            else:
+                attempts = mail["attempts"] + 1
+                failed = attempts >= MAIL_MAX_ATTEMPTS or isinstance(error, InvalidMessage)
+                update = {
+                    "status": "failed" if failed else "pending",
+                    "attempts": attempts,
+                    "last_error": error,
+                    "next_attempt_at": now + timedelta(seconds=backoff_delay(attempts))
+                }
+                log = logger.error if failed else logger.warning
+                log(f"Email {mail['id']} ({mail['kind']}) attempt {attempts} failed: {error}")
+            await self.db.email_outbox.update_one(
+                {"id": mail["id"]}, {"$set": update, "$unset": {"claimed_until": ""}}
+            )
+        return len(mails)
+
+    async def _worker(self, pool: SmtpPool):
+        while True:
+            try:
+                # Keep draining while there is a backlog, otherwise poll
+                if await self.drain_once(pool) == MAIL_BATCH:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Mail worker error: {str(e)}")
+            await asyncio.to_thread(pool.close_if_idle)
+            await asyncio.sleep(MAIL_POLL_SECONDS)
@@ -0,0 +1,279 @@
+"""
+Order state transitions shared by checkout and background jobs.
+
+Every status change drops the order's cached compact status on all
+workers and publishes an ``ORDER_EVENTS`` event, which is what long-poll
+and event-stream clients wait on instead of polling the database. New
+orders are published too, for the admin dashboard stream.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+import os
+import logging
+
+from pymongo import ReturnDocument
+
+from services.reservations import convert_holds, release_holds
+from services.promotions import release_redemptions
+from services.mailer import enqueue_order_paid
+from services.stripe_client import get_stripe
+from services.archive import find_archived
+from services.bulk_status import bulk_transition
+from services.analytics import record_sale, reverse_sale
+from services.events import event_bus
+from services.shared_cache import shared_cache
+from services.swr_cache import SwrCache
+
+logger = logging.getLogger(__name__)
+
+# Pending orders younger than this are left alone, the customer may still pay
+RECONCILE_AFTER_MINUTES = int(os.environ.get('RECONCILE_AFTER_MINUTES', '30'))
+# Pending orders older than this whose payment never succeeded are cancelled
+PENDING_ORDER_TTL_HOURS = int(os.environ.get('PENDING_ORDER_TTL_HOURS', '24'))
+RECONCILE_BATCH = int(os.environ.get('RECONCILE_BATCH', '100'))
+RECONCILE_INTERVAL_SECONDS = int(os.environ.get('RECONCILE_INTERVAL_SECONDS', '300'))
+
+# Stripe states in which the customer can no longer complete the payment
+_DEAD_INTENT_STATES = {"canceled"}
+# Stripe states in which the payment went through or is about to
+_PAYING_INTENT_STATES = {"succeeded", "processing"}
+
+ORDER_EVENTS = "orders"
+ORDER_STATUS_CACHE_SECONDS = float(os.environ.get('ORDER_STATUS_CACHE_SECONDS', '2'))
+# Statuses the payment confirmation page stops waiting at
+FINAL_STATUSES = {"paid", "completed", "cancelled"}
+# Moves allowed in bulk; payments are only recorded through Stripe
+ORDER_TRANSITIONS = {
+    "pending": {"cancelled"},
+    "paid": {"completed", "cancelled"},
+}
+
+_STATUS_FIELDS = ("id", "status", "payment_status", "total", "currency", "updated_at")
+ORDER_STATUS_PROJECTION = {
+    "_id": 0, **{field: 1 for field in _STATUS_FIELDS}, "items.product_name": 1, "items.quantity": 1
+}
+# Fields of a new order sent to the admin dashboards (as in OrderSummary)
+_SUMMARY_FIELDS = ("id", "customer_name", "customer_email", "customer_phone", "items", "total", "currency", "status")
+
+# Short-lived; entries are also dropped on every status change
+order_status_cache = SwrCache(
+    "order-status", fresh=ORDER_STATUS_CACHE_SECONDS, stale=ORDER_STATUS_CACHE_SECONDS
+)
+
+
+async def get_order_status(db, order_id: str) -> Optional[dict]:
+    """Compact status of an order (archived ones included), or None"""
+    async def load():
+        order = await db.orders.find_one({"id": order_id}, ORDER_STATUS_PROJECTION)
+        if order is None:
+            archived = await find_archived(db, "orders", order_id)
+            if archived is not None:
+                order = {field: archived.get(field) for field in _STATUS_FIELDS}
+                order["items"] = [
+                    {"product_name": item["product_name"], "quantity": item.get("quantity", 1)}
+                    for item in archived["items"]
+                ]
+        return order
+
+    return await order_status_cache.get(order_id, load)
+
+
+@shared_cache.subscribe("order-status")
+async def _forget_order_status(order_ids: Optional[List[str]]):
+    if order_ids is None:
+        order_status_cache.invalidate()
+    for order_id in order_ids or ():
+        order_status_cache.invalidate(order_id)
+
+
+def base_amount(order: dict) -> Optional[float]:
+    """Order total in the base currency, or None when the total is not known"""
+    if order.get("total") is None:
+        return None
+    return order["total"] / (order.get("fx_rate") or 1)
+
+
+async def order_created(order: dict):
+    """Tell the admin dashboards about a new order"""
+    summary = {field: order.get(field) for field in _SUMMARY_FIELDS}
+    summary["created_at"] = order["created_at"].isoformat()
+    await event_bus.publish(ORDER_EVENTS, {
+        "type": "created", "order_id": order["id"], "status": order["status"],
+        "amount": base_amount(order), "order": summary
+    })
+
+
+async def order_status_changed(order: dict, status: str, previous: Optional[str] = None):
+    """
+    Drop the cached status everywhere, then tell the waiting clients.
+
+    ``order`` needs its id; with its total and fx rate the event also
+    carries the amount the dashboard revenue moves by.
+    """
+    order_id = order["id"]
+    order_status_cache.invalidate(order_id)
+    await shared_cache.invalidate("order-status", [order_id])
+    await event_bus.publish(ORDER_EVENTS, _status_event(order, status, previous))
+
+
+def _status_event(order: dict, status: str, previous: Optional[str]) -> dict:
+    return {
+        "type": "status", "order_id": order["id"], "status": status, "previous": previous,
+        "amount": base_amount(order)
+    }
+
+
+async def bulk_set_order_status(db, status: str, ids: Optional[List[str]] = None, query: Optional[dict] = None) -> dict:
+    """
+    Move many orders to ``status`` in one write (see ``services.bulk_status``).
+
+    Pending orders that get cancelled have their PaymentIntent cancelled
+    first, so a late payment cannot revive them, and give back their stock
+    holds and promotion uses, as in ``cancel_order``. Those whose payment
+    went through or is in progress are left pending and reported as
+    conflicts. Paid orders that get cancelled leave the sales analytics.
+    Returns the bulk summary.
+    """
+    summary, changed = await bulk_transition(
+        db.orders, status, ORDER_TRANSITIONS, ids=ids, query=query,
+        fields=("total", "fx_rate", "promotion_ids", "payment_intent_id"),
+        before_write=_stop_payments if status == "cancelled" else None
+    )
+    if not changed:
+        return summary
+    for order in changed:
+        order_status_cache.invalidate(order["id"])
+    await shared_cache.invalidate("order-status", [order["id"] for order in changed])
+    for order in changed:
+        await event_bus.publish(ORDER_EVENTS, _status_event(order, status, order["status"]))
+        if status == "cancelled" and order["status"] == "pending":
+            await release_holds(db, order["id"])
+            await release_redemptions(db, order.get("promotion_ids", []))
+        elif status == "cancelled":
+            await sale_cancelled(db, order["id"])
+    return summary
+
+
+async def sale_cancelled(db, order_id: str):
+    """Take a paid order that was cancelled out of the sales analytics"""
+    try:
+        await reverse_sale(db, order_id)
+    except Exception as e:
+        # Reporting only; the cancellation stands either way
+        logger.error(f"Error removing order {order_id} from sales analytics: {str(e)}")
+
+
+async def _cancel_intent(intent) -> bool:
+    """Cancel a PaymentIntent unless it is paid or being paid; returns whether it can no longer be paid"""
+    if intent.status in _PAYING_INTENT_STATES:
+        return False
+    if intent.status not in _DEAD_INTENT_STATES:
+        await asyncio.to_thread(get_stripe().PaymentIntent.cancel, intent.id)
+    return True
+
+
+async def _stop_payments(orders: List[dict]) -> Set[str]:
+    """Cancel the PaymentIntents of the pending ``orders``; returns the ids that must stay pending"""
+    refused = set()
+    for order in orders:
+        if order["status"] != "pending" or not order.get("payment_intent_id"):
+            continue
+        try:
+            intent = await asyncio.to_thread(get_stripe().PaymentIntent.retrieve, order["payment_intent_id"])
+            if not await _cancel_intent(intent):
+                refused.add(order["id"])
+        except Exception as e:
+            refused.add(order["id"])
+            logger.error(f"Error cancelling the payment of order {order['id']}: {str(e)}")
+    return refused
+
+
+async def mark_order_paid(db, order: dict, payment_status: str = "succeeded") -> bool:
+    """
+    Move an order to paid, convert its stock holds, queue the customer's
+    confirmation email and add it to the sales analytics.
+
+    Conditional on the order still being pending, so concurrent or repeated
+    confirmations apply it once and never move a completed or cancelled
+    order back to paid. Returns whether this call did it.
+    """
+    paid = await db.orders.find_one_and_update(
+        {"id": order["id"], "status": "pending"},
+        {"$set": {
+            "status": "paid",
+            "payment_status": payment_status,
+            "updated_at": datetime.utcnow()
+        }},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if paid is None:
+        if order.get("status") == "cancelled":
+            logger.error(f"Payment succeeded for cancelled order {order['id']}; it needs a refund")
+        return False
+    await order_status_changed(paid, "paid", "pending")
+    await convert_holds(db, paid)
+    await enqueue_order_paid(db, paid)
+    try:
+        await record_sale(db, paid)
+    except Exception as e:
+        # Reporting only; the payment is recorded either way
+        logger.error(f"Error adding order {paid['id']} to sales analytics: {str(e)}")
+    return True
+
+
+async def cancel_order(db, order: dict, payment_status: str = None) -> bool:
+    """Cancel a pending order and give back its stock holds and promotion uses"""
+    update = {"status": "cancelled", "updated_at": datetime.utcnow()}
+    if payment_status:
+        update["payment_status"] = payment_status
+    result = await db.orders.update_one(
+        {"id": order["id"], "status": "pending"},
+        {"$set": update}
+    )
+    if not result.modified_count:
+        return False
+    await order_status_changed(order, "cancelled", "pending")
+    await release_holds(db, order["id"])
+    await release_redemptions(db, order.get("promotion_ids", []))
+    return True
+
+
+async def reconcile_pending_orders(db) -> Dict[str, int]:
+    """
+    Check a batch of old pending orders against Stripe.
+
+    Succeeded payments whose confirmation never reached us are marked paid;
+    orders that can no longer be paid, or have been pending for longer than
+    ``PENDING_ORDER_TTL_HOURS``, are cancelled.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(hours=PENDING_ORDER_TTL_HOURS)
+    orders = await db.orders.find(
+        {"status": "pending", "created_at": {"$lt": now - timedelta(minutes=RECONCILE_AFTER_MINUTES)}},
+        {"_id": 0, "id": 1, "status": 1, "payment_intent_id": 1, "stock_holds": 1, "promotion_ids": 1, "created_at": 1}
+    ).sort("created_at", 1).limit(RECONCILE_BATCH).to_list(length=RECONCILE_BATCH)
+
+    counts = {"checked": len(orders), "paid": 0, "cancelled": 0, "errors": 0}
+
+    for order in orders:
+        try:
+            intent = None
+            if order.get("payment_intent_id"):
+                intent = await asyncio.to_thread(get_stripe().PaymentIntent.retrieve, order["payment_intent_id"])
+
+            if intent is not None and intent.status == "succeeded":
+                counts["paid"] += await mark_order_paid(db, order)
+            elif intent is not None and intent.status in _DEAD_INTENT_STATES:
+                counts["cancelled"] += await cancel_order(db, order, intent.status)
+            elif order["created_at"] < stale_before:
+                if intent is not None and not await _cancel_intent(intent):
+                    continue  # money is moving, check again next run
+                counts["cancelled"] += await cancel_order(db, order, "canceled")
+        except Exception as e:
+            counts["errors"] += 1
+            logger.error(f"Error reconciling order {order['id']}: {str(e)}")
+
+    return counts
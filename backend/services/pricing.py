@@ -0,0 +1,245 @@
+"""
+Currency conversion and tax.
+
+Amounts are computed with ``Decimal`` and rounded once per line to the
+currency's minor unit, so totals add up exactly and Stripe receives the
+same integer amount the order records. Catalog prices are converted from
+``PRICING_BASE_CURRENCY`` with rates held in memory by ``fx_rates``: the
+``refresh_fx_rates`` scheduler job fetches them into the ``fx_rates``
+collection and every worker reloads that document in the background, so
+pricing never waits on the network.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional
+import os
+import logging
+
+from fastapi import HTTPException, status
+
+from models.order import OrderItem
+from services.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+PRICING_BASE_CURRENCY = os.environ.get('PRICING_BASE_CURRENCY', 'USD').upper()
+# Digits after the decimal point of each supported currency
+CURRENCY_EXPONENTS = {"USD": 2, "EUR": 2, "CLP": 0, "MXN": 2, "COP": 2, "PEN": 2, "ARS": 2}
+SUPPORTED_CURRENCIES = [
+    code.strip().upper()
+    for code in os.environ.get('PRICING_CURRENCIES', ','.join(CURRENCY_EXPONENTS)).split(',')
+    if code.strip()
+]
+# Country code -> tax rate, e.g. "CL:0.19,MX:0.16"; regions not listed pay no tax
+TAX_RATES = {
+    region.strip().upper(): Decimal(rate)
+    for region, rate in (
+        entry.split(':') for entry in os.environ.get('TAX_RATES', '').split(',') if entry.strip()
+    )
+}
+# Rates source returning {"rates": {"CLP": 950.1, ...}} relative to the base currency
+FX_RATES_URL = os.environ.get('FX_RATES_URL', '')
+FX_REFRESH_SECONDS = int(os.environ.get('FX_REFRESH_SECONDS', '3600'))
+FX_RELOAD_SECONDS = int(os.environ.get('FX_RELOAD_SECONDS', '60'))
+
+FX_DOCUMENT_ID = "latest"
+
+
+def exponent(currency: str) -> int:
+    return CURRENCY_EXPONENTS.get(currency, 2)
+
+
+def to_minor(amount: Decimal, currency: str) -> int:
+    """Round ``amount`` to the currency's minor unit, as an integer"""
+    return int((amount * (10 ** exponent(currency))).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount: int, currency: str) -> Decimal:
+    return Decimal(amount) / (10 ** exponent(currency))
+
+
+def to_float(amount: int, currency: str) -> float:
+    return float(from_minor(amount, currency))
+
+
+def resolve_currency(currency: Optional[str]) -> str:
+    """Validate a requested currency, defaulting to the base currency"""
+    currency = (currency or PRICING_BASE_CURRENCY).upper()
+    if currency not in SUPPORTED_CURRENCIES or not fx_rates.has(currency):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Moneda no soportada: {currency}"
+        )
+    return currency
+
+
+class FxTable:
+    """Exchange rates from the base currency, held in memory"""
+
+    def __init__(self):
+        self.rates: Dict[str, Decimal] = {PRICING_BASE_CURRENCY: Decimal(1)}
+        self.updated_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._db = None
+
+    def has(self, currency: str) -> bool:
+        return currency in self.rates
+
+    def rate(self, currency: str) -> Decimal:
+        return self.rates[currency]
+
+    def convert(self, amount: Decimal, source: str, target: str) -> Decimal:
+        if source == target:
+            return amount
+        return amount / self.rates[source] * self.rates[target]
+
+    def load(self, document: Optional[dict]):
+        if not document:
+            return
+        rates = {code: Decimal(str(rate)) for code, rate in document["rates"].items() if rate}
+        rates[PRICING_BASE_CURRENCY] = Decimal(1)
+        self.rates = rates
+        self.updated_at = document.get("updated_at")
+
+    async def reload(self, db):
+        self.load(await db.fx_rates.find_one({"_id": FX_DOCUMENT_ID}))
+
+    async def reload_now(self, ids=None):
+        """Reload without waiting for the loop, when another worker fetched new rates"""
+        if self._db is not None:
+            await self.reload(self._db)
+
+    def start(self, db):
+        self._db = db
+        self._task = asyncio.create_task(self._reload_loop(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _reload_loop(self, db):
+        while True:
+            try:
+                await self.reload(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reloading FX rates: {str(e)}")
+            await asyncio.sleep(FX_RELOAD_SECONDS)
+
+
+fx_rates = FxTable()
+
+shared_cache.subscribe("fx_rates")(fx_rates.reload_now)
+
+
+async def refresh_fx_rates(db) -> Dict[str, int]:
+    """Scheduler job: fetch current rates for the supported currencies"""
+    if not FX_RATES_URL:
+        return {"currencies": 0}
+    import requests
+    response = await asyncio.to_thread(requests.get, FX_RATES_URL, timeout=10)
+    response.raise_for_status()
+    fetched = response.json()["rates"]
+    rates = {code: fetched[code] for code in SUPPORTED_CURRENCIES if code in fetched}
+    await db.fx_rates.update_one(
+        {"_id": FX_DOCUMENT_ID},
+        {"$set": {"base": PRICING_BASE_CURRENCY, "rates": rates, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    fx_rates.load({"rates": rates, "updated_at": datetime.utcnow()})
+    await shared_cache.invalidate("fx_rates")
+    return {"currencies": len(rates)}
+
+
+def localize_price(price: float, source: Optional[str], target: str) -> float:
+    """Catalog price converted for display in ``target``"""
+    amount = fx_rates.convert(Decimal(str(price)), source or PRICING_BASE_CURRENCY, target)
+    return to_float(to_minor(amount, target), target)
+
+
+def localize_products(products: List[dict], target: str) -> List[dict]:
+    """Copies of catalog documents with ``price`` converted to ``target``"""
+    localized = []
+    for product in products:
+        source = product.get("currency")
+        product = {**product, "currency": target}
+        if "price" in product:
+            product["price"] = localize_price(product["price"], source, target)
+        localized.append(product)
+    return localized
+
+
+@dataclass
+class Quote:
+    """Priced order lines and totals in one currency"""
+    currency: str
+    items: List[OrderItem]
+    subtotal_minor: int
+    discount_minor: int
+    tax_minor: int
+    total_minor: int
+    tax_rate: Decimal
+    fx_rate: Decimal
+
+    @property
+    def subtotal(self) -> float:
+        return to_float(self.subtotal_minor, self.currency)
+
+    @property
+    def discount(self) -> float:
+        return to_float(self.discount_minor, self.currency)
+
+    @property
+    def tax(self) -> float:
+        return to_float(self.tax_minor, self.currency)
+
+    @property
+    def total(self) -> float:
+        return to_float(self.total_minor, self.currency)
+
+
+def quote(
+    items: List[OrderItem],
+    currency: str,
+    region: Optional[str] = None,
+    discount: Decimal = Decimal(0)
+) -> Quote:
+    """
+    Price base-currency order lines in ``currency`` with the tax of ``region``.
+
+    Each unit price is rounded to the currency's minor unit before being
+    multiplied, so the lines shown to the customer add up to the total.
+    ``discount`` (base currency) is taken off before tax.
+    """
+    priced: List[OrderItem] = []
+    subtotal_minor = 0
+    for item in items:
+        unit_minor = to_minor(fx_rates.convert(Decimal(str(item.price)), PRICING_BASE_CURRENCY, currency), currency)
+        subtotal_minor += unit_minor * item.quantity
+        priced.append(item.model_copy(update={"price": to_float(unit_minor, currency)}))
+
+    discount_minor = min(
+        to_minor(fx_rates.convert(discount, PRICING_BASE_CURRENCY, currency), currency), subtotal_minor
+    )
+    taxable_minor = subtotal_minor - discount_minor
+    tax_rate = TAX_RATES.get((region or "").upper(), Decimal(0))
+    tax_minor = to_minor(from_minor(taxable_minor, currency) * tax_rate, currency)
+    return Quote(
+        currency=currency,
+        items=priced,
+        subtotal_minor=subtotal_minor,
+        discount_minor=discount_minor,
+        tax_minor=tax_minor,
+        total_minor=taxable_minor + tax_minor,
+        tax_rate=tax_rate,
+        fx_rate=fx_rates.rate(currency)
+    )
+
@@ -0,0 +1,133 @@
+"""
+Bulk product upserts keyed by slug.
+
+Rows are validated one by one so a bad row is reported instead of failing
+the whole import. Existing slugs are looked up with a single ``$in`` query
+and every valid row is written in one unordered ``bulk_write``. Slugs are
+unique in the collection, so a row racing another import or an admin
+create for the same new slug fails on its own instead of duplicating it.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+import os
+import uuid
+import logging
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from models.product import Product, ProductImport
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_BULK_MAX_ROWS = int(os.environ.get('PRODUCT_BULK_MAX_ROWS', '1000'))
+
+DUPLICATE_KEY = 11000
+
+
+async def ensure_indexes(db):
+    try:
+        await db.products.create_index("slug", unique=True)
+    except OperationFailure as e:
+        # Existing duplicates must be merged by hand; keep serving meanwhile
+        logger.error(f"Cannot create the unique products.slug index, duplicate slugs exist: {str(e)}")
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+async def bulk_upsert_products(
+    collection,
+    rows: List[Dict[str, Any]],
+    dry_run: bool = False
+) -> Tuple[dict, List[str]]:
+    """
+    Create or update products by slug.
+
+    Returns the import summary (``ProductBulkResult`` shape) and the ids of
+    the products written, empty on a dry run. Fields missing from a row are
+    left untouched on existing products and defaulted on new ones.
+    """
+    results: List[dict] = []
+    valid: List[Tuple[int, ProductImport]] = []
+    seen = set()
+
+    for index, row in enumerate(rows):
+        try:
+            product = ProductImport(**row)
+        except ValidationError as e:
+            results.append({"index": index, "slug": row.get("slug"), "action": "error", "error": _validation_message(e)})
+            continue
+        if product.slug in seen:
+            results.append({"index": index, "slug": product.slug, "action": "error", "error": "Slug repetido en la importación"})
+            continue
+        seen.add(product.slug)
+        valid.append((index, product))
+
+    existing = {}
+    if valid:
+        cursor = collection.find(
+            {"slug": {"$in": [product.slug for _, product in valid]}},
+            {"_id": 0, "id": 1, "slug": 1}
+        )
+        existing = {doc["slug"]: doc.get("id") async for doc in cursor}
+
+    now = datetime.utcnow()
+    operations = []
+    planned = []
+    for index, product in valid:
+        fields = product.model_dump(exclude_unset=True)
+        fields["updated_at"] = now
+        product_id = existing.get(product.slug)
+        on_insert = {}
+        if product.slug not in existing:
+            product_id = str(uuid.uuid4())
+            defaults = Product(**product.model_dump(), id=product_id, created_at=now, updated_at=now)
+            on_insert = {key: value for key, value in defaults.model_dump().items() if key not in fields}
+            action = "created"
+        else:
+            if not product_id:
+                # Products seeded before ids were assigned get one now
+                product_id = str(uuid.uuid4())
+                fields.update({"id": product_id, "created_at": now})
+            action = "updated"
+
+        update = {"$set": fields}
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        else:
+            update["$inc"] = {"version": 1}
+        operations.append(UpdateOne({"slug": product.slug}, update, upsert=True))
+        planned.append({"index": index, "slug": product.slug, "action": action, "id": product_id})
+
+    written = list(planned)
+    if operations and not dry_run:
+        try:
+            await collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            failed = {
+                error["index"]: (
+                    "Otro proceso creó este slug al mismo tiempo; vuelve a importar la fila"
+                    if error.get("code") == DUPLICATE_KEY else error.get("errmsg", "Error de escritura")
+                )
+                for error in e.details.get("writeErrors", [])
+            }
+            for position, message in failed.items():
+                planned[position].update({"action": "error", "error": message})
+            written = [row for position, row in enumerate(planned) if position not in failed]
+
+    results.extend(planned)
+    results.sort(key=lambda row: row["index"])
+    summary = {
+        "dry_run": dry_run,
+        "created": sum(row["action"] == "created" for row in results),
+        "updated": sum(row["action"] == "updated" for row in results),
+        "errors": sum(row["action"] == "error" for row in results),
+        "results": results
+    }
+    return summary, [] if dry_run else [row["id"] for row in written]
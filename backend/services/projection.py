@@ -0,0 +1,40 @@
+"""
+Sparse fieldsets for list endpoints.
+
+A ``fields=`` query parameter is translated into a Mongo projection so only
+the requested fields leave the database. Without it, list endpoints return
+the fields of their summary model.
+"""
+
+from typing import Optional, Type
+
+from pydantic import BaseModel
+
+ALL_FIELDS = ("*", "all")
+
+
+def build_projection(
+    fields: Optional[str],
+    model: Type[BaseModel],
+    summary: Type[BaseModel]
+) -> dict:
+    """
+    Mongo projection for a comma-separated ``fields`` parameter.
+
+    ``None`` selects the summary view and ``*``/``all`` the full document.
+    Dotted paths are allowed when their first segment is a model field.
+    Raises ``ValueError`` naming any unknown fields.
+    """
+    if fields is None:
+        names = list(summary.model_fields)
+    elif fields.strip() in ALL_FIELDS:
+        return {"_id": 0}
+    else:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name.split(".")[0] not in model.model_fields]
+        if unknown:
+            raise ValueError(", ".join(unknown))
+
+    projection = {"_id": 0, "id": 1}
+    projection.update({name: 1 for name in names})
+    return projection
@@ -0,0 +1,289 @@
+"""
+Coupon and promotion evaluation.
+
+Active promotions are compiled once into ``Rule`` objects held in memory
+and indexed by coupon code and, for automatic promotions, by the product
+or category that triggers them, so evaluating a cart only looks at the
+rules that can apply to it and never touches the database. Redemptions
+are counted with one conditional ``$inc`` per promotion, which enforces
+``max_redemptions`` under concurrent checkouts; cancelled orders give
+their redemptions back.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, FrozenSet, List, Optional, Set
+import os
+import logging
+
+from fastapi import HTTPException, status
+
+from models.order import OrderItem
+
+logger = logging.getLogger(__name__)
+
+PROMOTION_INDEX_MAX_AGE = int(os.environ.get('PROMOTION_INDEX_MAX_AGE_SECONDS', '60'))
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A promotion compiled for evaluation"""
+    id: str
+    name: str
+    code: Optional[str]
+    kind: str
+    value: Decimal
+    product_ids: FrozenSet[str]
+    category: Optional[str]
+    min_quantity: int
+    min_subtotal: Decimal
+    starts_at: Optional[datetime]
+    ends_at: Optional[datetime]
+
+    @classmethod
+    def compile(cls, promotion: dict) -> "Rule":
+        code = promotion.get("code")
+        return cls(
+            id=promotion["id"],
+            name=promotion["name"],
+            code=code.upper() if code else None,
+            kind=promotion["kind"],
+            value=Decimal(str(promotion["value"])),
+            product_ids=frozenset(promotion.get("product_ids") or ()),
+            category=promotion.get("category"),
+            min_quantity=promotion.get("min_quantity", 1),
+            min_subtotal=Decimal(str(promotion.get("min_subtotal", 0))),
+            starts_at=promotion.get("starts_at"),
+            ends_at=promotion.get("ends_at")
+        )
+
+    def live(self, now: datetime) -> bool:
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
+    def eligible(self, item: OrderItem) -> bool:
+        if self.product_ids and item.product_id not in self.product_ids:
+            return False
+        return self.category is None or item.category == self.category
+
+    def discount(self, items: List[OrderItem], subtotal: Decimal) -> Decimal:
+        """Base-currency discount this rule gives ``items``, 0 if it does not apply"""
+        if subtotal < self.min_subtotal:
+            return Decimal(0)
+        lines = [(Decimal(str(item.price)), item.quantity) for item in items if self.eligible(item)]
+        quantity = sum(qty for _, qty in lines)
+        if quantity < self.min_quantity:
+            return Decimal(0)
+        amount = sum(price * qty for price, qty in lines)
+
+        if self.kind == "percentage":
+            return amount * self.value / 100
+        if self.kind == "fixed":
+            return min(self.value, amount)
+        # bundle: every complete group of min_quantity units gets value% off, cheapest units first
+        units = (quantity // self.min_quantity) * self.min_quantity
+        discounted = Decimal(0)
+        for price, qty in sorted(lines):
+            take = min(qty, units)
+            discounted += price * take
+            units -= take
+            if not units:
+                break
+        return discounted * self.value / 100
+
+
+@dataclass
+class Evaluation:
+    """Promotions applied to a cart and their total base-currency discount"""
+    discount: Decimal
+    rules: List[Rule]
+
+    @property
+    def promotion_ids(self) -> List[str]:
+        return [rule.id for rule in self.rules]
+
+
+class PromotionIndex:
+    """Compiled active promotions, indexed by code, product and category"""
+
+    def __init__(self):
+        self._rules: Dict[str, Rule] = {}
+        self._by_code: Dict[str, Rule] = {}
+        self._by_product: Dict[str, Set[str]] = {}
+        self._by_category: Dict[str, Set[str]] = {}
+        self._everywhere: Set[str] = set()
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._rules)
+
+    def upsert(self, promotion: dict):
+        """Compile a created or updated promotion; inactive ones are dropped"""
+        self.remove(promotion["id"])
+        if not promotion.get("is_active", True):
+            return
+        rule = Rule.compile(promotion)
+        self._rules[rule.id] = rule
+        if rule.code:
+            self._by_code[rule.code] = rule
+        elif rule.product_ids:
+            for product_id in rule.product_ids:
+                self._by_product.setdefault(product_id, set()).add(rule.id)
+        elif rule.category:
+            self._by_category.setdefault(rule.category, set()).add(rule.id)
+        else:
+            self._everywhere.add(rule.id)
+
+    def remove(self, promotion_id: str):
+        rule = self._rules.pop(promotion_id, None)
+        if rule is None:
+            return
+        if rule.code:
+            self._by_code.pop(rule.code, None)
+        for postings in (*self._by_product.values(), *self._by_category.values(), self._everywhere):
+            postings.discard(promotion_id)
+
+    def clear(self):
+        self._rules.clear()
+        self._by_code.clear()
+        self._by_product.clear()
+        self._by_category.clear()
+        self._everywhere.clear()
+        self._loaded_at = None
+
+    def _candidates(self, items: List[OrderItem]) -> Set[str]:
+        ids = set(self._everywhere)
+        for item in items:
+            ids |= self._by_product.get(item.product_id, set())
+            if item.category:
+                ids |= self._by_category.get(item.category, set())
+        return ids
+
+    def evaluate(
+        self,
+        items: List[OrderItem],
+        code: Optional[str] = None,
+        exclude: FrozenSet[str] = frozenset(),
+        now: Optional[datetime] = None
+    ) -> Evaluation:
+        """
+        Best automatic promotion plus the coupon, if one is given.
+
+        Raises 400 for unknown, expired or non-applicable coupons. The
+        discount never exceeds the subtotal.
+        """
+        now = now or datetime.utcnow()
+        subtotal = sum(Decimal(str(item.price)) * item.quantity for item in items)
+        rules, discount = [], Decimal(0)
+
+        best, best_discount = None, Decimal(0)
+        for rule_id in self._candidates(items) - exclude:
+            rule = self._rules[rule_id]
+            if not rule.live(now):
+                continue
+            amount = rule.discount(items, subtotal)
+            if amount > best_discount:
+                best, best_discount = rule, amount
+        if best is not None:
+            rules.append(best)
+            discount += best_discount
+
+        if code:
+            rule = self._by_code.get(code.strip().upper())
+            if rule is None or not rule.live(now):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cupón inválido o vencido"
+                )
+            amount = rule.discount(items, subtotal)
+            if not amount:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="El cupón no aplica a este carrito"
+                )
+            rules.append(rule)
+            discount += amount
+
+        return Evaluation(discount=min(discount, subtotal), rules=rules)
+
+    async def ensure_loaded(self, collection):
+        """Compile active promotions from ``collection`` on first use or when too old"""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < PROMOTION_INDEX_MAX_AGE:
+            return
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < PROMOTION_INDEX_MAX_AGE:
+                return
+            promotions = await collection.find(
+                {"is_active": True, "$or": [{"ends_at": None}, {"ends_at": {"$gt": datetime.utcnow()}}]},
+                {"_id": 0}
+            ).to_list(length=None)
+            self.clear()
+            for promotion in promotions:
+                self.upsert(promotion)
+            self._loaded_at = time.monotonic()
+            logger.info(f"Promotion index built with {len(promotions)} promotions")
+
+
+promotions_index = PromotionIndex()
+
+
+async def ensure_indexes(db):
+    await db.promotions.create_index("id", unique=True)
+    await db.promotions.create_index(
+        "code", unique=True, partialFilterExpression={"code": {"$type": "string"}}
+    )
+
+
+async def _redeem(db, promotion_id: str) -> bool:
+    """Take one use of a promotion if its cap allows it"""
+    result = await db.promotions.update_one(
+        {
+            "id": promotion_id,
+            "$expr": {"$or": [
+                {"$eq": [{"$ifNull": ["$max_redemptions", None]}, None]},
+                {"$lt": ["$redemptions", "$max_redemptions"]}
+            ]}
+        },
+        {"$inc": {"redemptions": 1}}
+    )
+    return result.modified_count == 1
+
+
+async def release_redemptions(db, promotion_ids: List[str]):
+    """Give back the uses taken by an order that will not be paid"""
+    for promotion_id in promotion_ids:
+        await db.promotions.update_one(
+            {"id": promotion_id, "redemptions": {"$gt": 0}},
+            {"$inc": {"redemptions": -1}}
+        )
+
+
+async def apply_promotions(db, items: List[OrderItem], code: Optional[str] = None) -> Evaluation:
+    """
+    Evaluate a cart and redeem the promotions it gets.
+
+    An automatic promotion whose cap is reached meanwhile is dropped and the
+    cart re-evaluated without it; a coupon that ran out fails with 400.
+    """
+    await promotions_index.ensure_loaded(db.promotions)
+    exclude: FrozenSet[str] = frozenset()
+    while True:
+        evaluation = promotions_index.evaluate(items, code, exclude)
+        redeemed = []
+        for rule in evaluation.rules:
+            if await _redeem(db, rule.id):
+                redeemed.append(rule.id)
+                continue
+            await release_redemptions(db, redeemed)
+            if rule.code:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"El cupón {rule.code} alcanzó su límite de usos"
+                )
+            exclude = exclude | {rule.id}
+            break
+        else:
+            return evaluation
@@ -0,0 +1,174 @@
+"""
+Stock reservations for limited-seat products.
+
+Creating a payment intent takes a hold on each limited product by
+atomically decrementing ``stock`` only if enough seats remain, so two
+checkouts can never both get the last seat. Holds expire after
+``STOCK_HOLD_MINUTES`` and are released by a scheduled sweep; paying an
+order converts its holds into sales with a single conditional update.
+Every stock change drops the cached snapshots of the carts containing the
+product, so they are checked against the new stock.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+import os
+import uuid
+import logging
+
+from fastapi import HTTPException, status
+from pymongo import ASCENDING, ReturnDocument
+
+from services.cart import invalidate_carts_for_products
+
+logger = logging.getLogger(__name__)
+
+STOCK_HOLD_MINUTES = int(os.environ.get('STOCK_HOLD_MINUTES', '15'))
+HOLD_SWEEP_INTERVAL_SECONDS = int(os.environ.get('HOLD_SWEEP_INTERVAL_SECONDS', '60'))
+HOLD_SWEEP_BATCH = 500
+HOLD_RETENTION_DAYS = int(os.environ.get('HOLD_RETENTION_DAYS', '7'))
+
+
+async def ensure_indexes(db):
+    await db.stock_holds.create_index([("order_id", ASCENDING), ("status", ASCENDING)])
+    await db.stock_holds.create_index([("status", ASCENDING), ("expires_at", ASCENDING)])
+
+
+async def _stock_changed(db, product_ids: Iterable[str]):
+    """Drop cached cart snapshots for ``product_ids``; the stock change itself already happened"""
+    try:
+        await invalidate_carts_for_products(db.carts, set(product_ids))
+    except Exception as e:
+        logger.error(f"Error invalidating carts after a stock change: {str(e)}")
+
+
+async def hold_stock(db, order_id: str, items) -> List[dict]:
+    """
+    Reserve stock for every limited product in ``items``.
+
+    All-or-nothing: if any product lacks seats, or the holds cannot be
+    stored, the seats already taken are given back and the error is raised
+    (a 400 for missing seats). Products without stock limit get no hold.
+    """
+    holds = []
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=STOCK_HOLD_MINUTES)
+
+    try:
+        for item in items:
+            result = await db.products.update_one(
+                {"id": item.product_id, "stock": {"$ne": None, "$gte": item.quantity}},
+                {"$inc": {"stock": -item.quantity}}
+            )
+            if result.modified_count == 0:
+                product = await db.products.find_one({"id": item.product_id}, {"_id": 0, "stock": 1})
+                if product is not None and product.get("stock") is None:
+                    continue  # unlimited
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Stock insuficiente para {item.product_name}"
+                )
+            holds.append({
+                "id": str(uuid.uuid4()),
+                "order_id": order_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "status": "held",
+                "expires_at": expires_at,
+                "created_at": now,
+                "updated_at": now
+            })
+        if holds:
+            await db.stock_holds.insert_many(holds)
+    except Exception:
+        if holds:
+            # The insert may have written some holds; drop them so the sweeper cannot release them twice
+            await db.stock_holds.delete_many({"id": {"$in": [hold["id"] for hold in holds]}})
+        for hold in holds:
+            await db.products.update_one({"id": hold["product_id"]}, {"$inc": {"stock": hold["quantity"]}})
+        raise
+
+    await _stock_changed(db, (hold["product_id"] for hold in holds))
+    return holds
+
+
+async def _release(db, hold: dict) -> bool:
+    """Release one hold if it is still held; returns whether it was released"""
+    released = await db.stock_holds.find_one_and_update(
+        {"id": hold["id"], "status": "held"},
+        {"$set": {"status": "released", "updated_at": datetime.utcnow()}}
+    )
+    if released is None:
+        return False
+    await db.products.update_one({"id": hold["product_id"]}, {"$inc": {"stock": hold["quantity"]}})
+    return True
+
+
+async def release_holds(db, order_id: str) -> int:
+    """Give back every active hold of an order"""
+    holds = await db.stock_holds.find({"order_id": order_id, "status": "held"}).to_list(length=None)
+    released = [hold for hold in holds if await _release(db, hold)]
+    await _stock_changed(db, (hold["product_id"] for hold in released))
+    return len(released)
+
+
+async def convert_holds(db, order: dict):
+    """
+    Turn an order's holds into sales.
+
+    Normally a single ``update_many``. If the sweeper released some holds
+    before payment arrived, the payment has already been taken, so the
+    seats are taken again unconditionally and an oversell is logged.
+    """
+    expected = order.get("stock_holds", 0)
+    if not expected:
+        return
+    now = datetime.utcnow()
+    result = await db.stock_holds.update_many(
+        {"order_id": order["id"], "status": "held"},
+        {"$set": {"status": "converted", "updated_at": now}}
+    )
+    if result.modified_count >= expected:
+        return
+
+    expired = await db.stock_holds.find({"order_id": order["id"], "status": "released"}).to_list(length=None)
+    retaken = []
+    for hold in expired:
+        claimed = await db.stock_holds.find_one_and_update(
+            {"id": hold["id"], "status": "released"},
+            {"$set": {"status": "converted", "updated_at": now}}
+        )
+        if claimed is None:
+            continue
+        retaken.append(hold["product_id"])
+        product = await db.products.find_one_and_update(
+            {"id": hold["product_id"]},
+            {"$inc": {"stock": -hold["quantity"]}},
+            projection={"_id": 0, "stock": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if product and product.get("stock", 0) < 0:
+            logger.warning(
+                f"Product {hold['product_id']} oversold by {-product['stock']} "
+                f"after hold on order {order['id']} expired"
+            )
+    await _stock_changed(db, retaken)
+
+
+async def sweep_expired_holds(db) -> Dict[str, int]:
+    """Release a batch of expired holds"""
+    expired = await db.stock_holds.find(
+        {"status": "held", "expires_at": {"$lt": datetime.utcnow()}}
+    ).limit(HOLD_SWEEP_BATCH).to_list(length=HOLD_SWEEP_BATCH)
+    released = [hold for hold in expired if await _release(db, hold)]
+    await _stock_changed(db, (hold["product_id"] for hold in released))
+    return {"expired": len(expired), "released": len(released)}
+
+
+async def purge_finished_holds(db) -> Dict[str, int]:
+    """Delete converted and released holds past their retention period"""
+    result = await db.stock_holds.delete_many({
+        "status": {"$in": ["converted", "released"]},
+        "updated_at": {"$lt": datetime.utcnow() - timedelta(days=HOLD_RETENTION_DAYS)}
+    })
+    return {"deleted": result.deleted_count}
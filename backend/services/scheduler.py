@@ -0,0 +1,140 @@
+"""
+In-process asyncio job scheduler with a leader lock.
+
+Every worker runs a ``Scheduler``, but only the one holding the lease in
+``scheduler_locks`` runs jobs; the others keep trying to take the lease
+over and do so once it expires. Each run's duration, row counts and error
+are logged and stored in ``job_runs``.
+"""
+
+import asyncio
+import socket
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+import os
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_TICK_SECONDS = int(os.environ.get('SCHEDULER_TICK_SECONDS', '5'))
+SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', '30'))
+JOB_RUN_RETENTION_DAYS = int(os.environ.get('JOB_RUN_RETENTION_DAYS', '14'))
+
+LOCK_ID = "scheduler"
+
+
+@dataclass
+class Job:
+    name: str
+    interval: int
+    func: Callable[..., Awaitable[Optional[Dict[str, int]]]]
+    next_run: float = 0.0
+    last_run: Optional[dict] = field(default=None)
+
+
+class Scheduler:
+    """Runs registered jobs periodically while this node holds the leader lease"""
+
+    def __init__(self, db):
+        self.db = db
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, Job] = {}
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    def add_job(self, name: str, interval: int, func):
+        """Register ``func(db)`` to run every ``interval`` seconds"""
+        self.jobs[name] = Job(name=name, interval=interval, func=func)
+
+    async def ensure_indexes(self):
+        await self.db.job_runs.create_index([("job", 1), ("started_at", -1)])
+        await self.db.job_runs.create_index(
+            "started_at", expireAfterSeconds=JOB_RUN_RETENTION_DAYS * 86400
+        )
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.is_leader:
+            await self.db.scheduler_locks.delete_one({"_id": LOCK_ID, "owner": self.node_id})
+
+    async def _acquire_lease(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await self.db.scheduler_locks.find_one_and_update(
+                {"_id": LOCK_ID, "$or": [{"owner": self.node_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {
+                    "owner": self.node_id,
+                    "expires_at": now + timedelta(seconds=SCHEDULER_LEASE_SECONDS)
+                }},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Someone else holds an unexpired lease
+            return False
+
+    async def _loop(self):
+        while True:
+            try:
+                leader = await self._acquire_lease()
+                if leader != self.is_leader:
+                    logger.info(f"Scheduler on {self.node_id} {'acquired' if leader else 'lost'} leadership")
+                    self.is_leader = leader
+                if leader:
+                    for job in self.jobs.values():
+                        if time.monotonic() < job.next_run:
+                            continue
+                        # Renew the lease so a long job cannot outlive it
+                        if not await self._acquire_lease():
+                            self.is_leader = False
+                            break
+                        await self.run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduler error: {str(e)}")
+            await asyncio.sleep(SCHEDULER_TICK_SECONDS)
+
+    async def run_job(self, job: Job) -> dict:
+        """Run a job once, recording duration, counts and any error"""
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        counts, error = {}, None
+        try:
+            counts = await job.func(self.db) or {}
+        except Exception as e:
+            error = str(e)
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        job.next_run = time.monotonic() + job.interval
+
+        run = {
+            "job": job.name,
+            "node": self.node_id,
+            "started_at": started_at,
+            "duration_ms": duration_ms,
+            "counts": counts,
+            "error": error
+        }
+        job.last_run = run
+        if error:
+            logger.error(f"Job {job.name} failed after {duration_ms}ms: {error}")
+        else:
+            logger.info(f"Job {job.name} finished in {duration_ms}ms: {counts}")
+        try:
+            await self.db.job_runs.insert_one(dict(run))
+        except Exception as e:
+            logger.error(f"Error recording run of job {job.name}: {str(e)}")
+        return run
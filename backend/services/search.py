@@ -0,0 +1,246 @@
+"""
+In-process full-text search for contacts and products.
+
+Text is accent-folded, lowercased, stripped of Spanish stopwords and reduced
+with a light Spanish stemmer. Results are ranked with BM25 and field weights.
+"""
+
+import asyncio
+import math
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import logging
+
+from services.swr_cache import SWR_FRESH_SECONDS, SWR_MAX_STALE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_MAX_AGE = int(os.environ.get('SEARCH_INDEX_MAX_AGE_SECONDS', '300'))
+
+_TOKEN_RE = re.compile(r"[a-z0-9ñ]+")
+
+STOPWORDS = {
+    "a", "al", "algo", "ante", "con", "como", "de", "del", "desde", "donde",
+    "el", "ella", "en", "entre", "es", "esta", "este", "esto", "hay", "la",
+    "las", "le", "les", "lo", "los", "mas", "me", "mi", "muy", "ni", "no",
+    "o", "os", "para", "pero", "por", "que", "se", "si", "sin", "sobre",
+    "son", "su", "sus", "tu", "un", "una", "unas", "uno", "unos", "y", "ya",
+}
+
+# Derivational suffixes, longest first
+_SUFFIXES = (
+    "amientos", "imientos", "amiento", "imiento", "aciones", "uciones",
+    "adoras", "adores", "ancias", "idades", "logias", "mente", "acion",
+    "ucion", "adora", "ador", "ancia", "idad", "logia", "ismos", "istas",
+    "ismo", "ista", "ables", "ibles", "able", "ible", "osos", "osas",
+    "oso", "osa", "ivos", "ivas", "ivo", "iva", "ias", "ia",
+)
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents, keeping ñ"""
+    text = text.lower().replace("ñ", "\0")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.replace("\0", "ñ")
+
+
+def stem(word: str) -> str:
+    """Light Spanish stemmer: derivational suffix, plural and final vowel"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 4 and word.endswith("es"):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s"):
+        word = word[:-1]
+    if len(word) > 3 and word[-1] in "aeo":
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into stemmed search terms"""
+    return [
+        stem(token)
+        for token in _TOKEN_RE.findall(fold(text))
+        if token not in STOPWORDS
+    ]
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking over weighted document fields"""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, fields: Dict[str, float], attrs: Iterable[str] = ()):
+        self.fields = fields
+        self.attrs = tuple(attrs)
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._doc_attrs: Dict[str, dict] = {}
+        self._total_length = 0.0
+        self._loaded_at: Optional[float] = None
+        self._built_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def _analyze(self, doc: dict) -> Dict[str, float]:
+        weights: Dict[str, float] = defaultdict(float)
+        for field, weight in self.fields.items():
+            value = doc.get(field)
+            if not value:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = " ".join(str(v) for v in value)
+            for term in tokenize(str(value)):
+                weights[term] += weight
+        return weights
+
+    def upsert(self, doc: dict):
+        """Add or replace a document, keyed by its ``id``"""
+        doc_id = doc["id"]
+        self.remove(doc_id)
+        terms = self._analyze(doc)
+        for term, weight in terms.items():
+            self._postings[term][doc_id] = weight
+        length = sum(terms.values())
+        self._doc_terms[doc_id] = terms
+        self._doc_lengths[doc_id] = length
+        self._doc_attrs[doc_id] = {attr: doc.get(attr) for attr in self.attrs}
+        self._total_length += length
+
+    def remove(self, doc_id: str):
+        """Drop a document from the index if present"""
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0.0)
+        self._doc_attrs.pop(doc_id, None)
+
+    def set_attr(self, doc_id: str, attr: str, value):
+        """Update a filterable attribute without re-analyzing the document"""
+        attrs = self._doc_attrs.get(doc_id)
+        if attrs is not None and attr in attrs:
+            attrs[attr] = value
+
+    def clear(self):
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._doc_lengths.clear()
+        self._doc_attrs.clear()
+        self._total_length = 0.0
+        self._loaded_at = None
+        self._built_at = None
+
+    def expire(self):
+        """Rebuild on next use, serving the current contents if that fails"""
+        self._loaded_at = None
+
+    def search(
+        self,
+        query: str,
+        filters: Optional[dict] = None,
+        limit: int = 20,
+        skip: int = 0
+    ) -> Tuple[int, List[Tuple[str, float]]]:
+        """
+        Rank documents matching any query term.
+
+        Returns the total number of matches and the requested page of
+        ``(doc_id, score)`` pairs.
+        """
+        terms = set(tokenize(query))
+        if not terms or not self._doc_terms:
+            return 0, []
+
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        doc_count = len(self._doc_terms)
+        avg_length = (self._total_length / doc_count) or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if filters:
+                    attrs = self._doc_attrs[doc_id]
+                    if any(attrs.get(k) != v for k, v in filters.items()):
+                        continue
+                norm = self.K1 * (1 - self.B + self.B * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return len(ranked), [(doc_id, round(score, 4)) for doc_id, score in ranked[skip:skip + limit]]
+
+    async def ensure_loaded(self, collection):
+        """
+        Build the index from ``collection`` on first use or when it is too old.
+
+        If the database fails, a previous build younger than
+        ``SWR_MAX_STALE_SECONDS`` keeps being served.
+        """
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < SEARCH_INDEX_MAX_AGE:
+            return
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < SEARCH_INDEX_MAX_AGE:
+                return
+            projection = {"_id": 0, "id": 1}
+            for field in (*self.fields, *self.attrs):
+                projection[field] = 1
+            started = time.perf_counter()
+            try:
+                docs = await collection.find({"id": {"$exists": True}}, projection).to_list(length=None)
+            except Exception as e:
+                if self._built_at is None or time.monotonic() - self._built_at > SWR_MAX_STALE_SECONDS:
+                    raise
+                # Keep serving the last build; retry shortly instead of on every request
+                logger.warning(f"Search index on {collection.name} not rebuilt, serving the previous one: {str(e)}")
+                self._loaded_at = time.monotonic() - SEARCH_INDEX_MAX_AGE + SWR_FRESH_SECONDS
+                return
+            self.clear()
+            for doc in docs:
+                self.upsert(doc)
+            self._loaded_at = self._built_at = time.monotonic()
+            logger.info(
+                f"Search index on {collection.name} built with {len(docs)} documents "
+                f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+
+
+async def fetch_ranked(collection, hits: List[Tuple[str, float]]) -> List[dict]:
+    """Load the documents for a page of hits, preserving rank order"""
+    if not hits:
+        return []
+    ids = [doc_id for doc_id, _ in hits]
+    docs = await collection.find({"id": {"$in": ids}}).to_list(length=len(ids))
+    by_id = {doc["id"]: doc for doc in docs}
+    return [
+        {**by_id[doc_id], "score": score}
+        for doc_id, score in hits
+        if doc_id in by_id
+    ]
+
+
+contacts_index = SearchIndex({"name": 3.0, "subject": 2.0, "message": 1.0}, attrs=("status",))
+products_index = SearchIndex(
+    {"name": 3.0, "description": 1.0, "features": 1.5},
+    attrs=("is_active", "category")
+)
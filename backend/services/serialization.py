@@ -0,0 +1,82 @@
+"""
+Fast response encoding.
+
+JSON is rendered with orjson when it is installed, and clients that send
+``Accept: application/msgpack`` get MessagePack instead. Routes returning
+trusted database documents use ``encoded_response`` directly, which skips
+``response_model`` validation and ``jsonable_encoder``.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _default(obj: Any):
+    """Encode types the fast encoders do not know natively"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    # bson.ObjectId and anything else with a sensible string form
+    return str(obj)
+
+
+def dumps_json(content: Any) -> bytes:
+    """Serialize ``content`` to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when available"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+class MsgPackResponse(Response):
+    """MessagePack response"""
+
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_default, use_bin_type=True, datetime=False)
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the client asked for MessagePack and we can produce it"""
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def encoded_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Render already-trusted ``content`` in the format negotiated with the client"""
+    response_class = MsgPackResponse if wants_msgpack(request) else FastJSONResponse
+    response = response_class(content, status_code=status_code)
+    response.headers["Vary"] = "Accept"
+    return response
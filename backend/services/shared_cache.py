@@ -0,0 +1,242 @@
+"""
+Cache tier shared by every worker, and cross-worker invalidation.
+
+Each worker keeps its own in-memory indexes and rendered payloads for
+speed. When one worker changes the data behind them it publishes an
+invalidation on ``CACHE_CHANNEL``; every other worker receives it and
+refreshes its copy, so no worker keeps serving stale catalog or content
+data. Rendered payloads are also stored in the shared tier, so after a
+change only one worker renders them again. Application events (see
+``services.events``) are relayed between workers over the same channel.
+
+With ``CACHE_URL`` set (``redis://...``, any Redis-compatible server) the
+tier and pub/sub go through that server. Without it an in-process stand-in
+is used, which is only correct for a single worker.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import os
+import logging
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_URL = os.environ.get('CACHE_URL', '')
+CACHE_CHANNEL = os.environ.get('CACHE_CHANNEL', 'idef:invalidate')
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', '3600'))
+CACHE_RECONNECT_SECONDS = int(os.environ.get('CACHE_RECONNECT_SECONDS', '5'))
+
+# Handlers get the changed ids, or None when everything must be reloaded
+Handler = Callable[[Optional[List[str]]], Awaitable[None]]
+
+
+class LocalBackend:
+    """In-process stand-in for a shared backend: one worker, development and tests"""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, bytes]] = {}
+        self._counters: Dict[str, int] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            entry = self._values.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._values[key]
+                entry = None
+            values.append(None if entry is None else entry[1])
+        return values
+
+    async def set_many(self, mapping: Dict[str, bytes], ttl: int):
+        expires_at = time.monotonic() + ttl
+        for key, value in mapping.items():
+            self._values[key] = (expires_at, value)
+
+    async def get_int(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def publish(self, channel: str, message: bytes):
+        for queue in self._subscribers.get(channel, []):
+            queue.put_nowait(message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(channel, []).append(queue)
+        return self._messages(channel, queue)
+
+    async def _messages(self, channel: str, queue: asyncio.Queue) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].remove(queue)
+
+    async def close(self):
+        pass
+
+
+class RedisBackend:
+    """Redis-compatible server shared by every worker and node"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.from_url(self.url)
+        return self._client
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await self.client.mget(keys)
+
+    async def set_many(self, mapping: Dict[str, bytes], ttl: int):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ttl)
+            await pipe.execute()
+
+    async def get_int(self, key: str) -> int:
+        return int(await self.client.get(key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def publish(self, channel: str, message: bytes):
+        await self.client.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel)
+        return self._messages(pubsub)
+
+    async def _messages(self, pubsub) -> AsyncIterator[bytes]:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.aclose()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_backend(url: str = CACHE_URL):
+    if not url:
+        return LocalBackend()
+    if redis is None:
+        raise RuntimeError("CACHE_URL is set but the redis package is not installed")
+    return RedisBackend(url)
+
+
+class SharedCache:
+    """Shared key/value tier plus invalidation fan-out between workers"""
+
+    def __init__(self, backend, channel: str = CACHE_CHANNEL):
+        self.backend = backend
+        self.channel = channel
+        # Messages carry the sender so a worker ignores its own invalidations
+        self.node_id = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._event_handler: Optional[Callable[[str, dict], None]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, topic: str):
+        """Decorator registering a handler for other workers' invalidations of ``topic``"""
+        def register(handler: Handler) -> Handler:
+            self._handlers.setdefault(topic, []).append(handler)
+            return handler
+        return register
+
+    async def invalidate(self, topic: str, ids: Optional[List[str]] = None):
+        """
+        Tell the other workers that ``ids`` of ``topic`` changed (None: all of them).
+
+        The caller updates its own worker's copy directly. Publishing failures
+        are logged, not raised: the write that triggered them already happened.
+        """
+        message = json.dumps({"node": self.node_id, "topic": topic, "ids": ids}).encode()
+        try:
+            await self.backend.publish(self.channel, message)
+        except Exception as e:
+            logger.error(f"Error publishing {topic} invalidation: {str(e)}")
+
+    def on_event(self, handler: Callable[[str, dict], None]):
+        """Receive events sent by other workers with ``send_event``"""
+        self._event_handler = handler
+
+    async def send_event(self, topic: str, event: dict):
+        """Relay an event to the other workers; failures are logged, not raised"""
+        message = json.dumps({"node": self.node_id, "topic": topic, "event": event}, default=str).encode()
+        try:
+            await self.backend.publish(self.channel, message)
+        except Exception as e:
+            logger.error(f"Error relaying {topic} event: {str(e)}")
+
+    async def _dispatch(self, topic: str, ids: Optional[List[str]]):
+        for handler in self._handlers.get(topic, []):
+            try:
+                await handler(ids)
+            except Exception as e:
+                logger.error(f"Error applying {topic} invalidation: {str(e)}")
+
+    async def _listen(self):
+        resubscribed = False
+        while True:
+            try:
+                messages = await self.backend.subscribe(self.channel)
+                if resubscribed:
+                    # Invalidations may have been missed while disconnected
+                    for topic in list(self._handlers):
+                        await self._dispatch(topic, None)
+                resubscribed = True
+                async for raw in messages:
+                    message = json.loads(raw)
+                    if message["node"] == self.node_id:
+                        continue
+                    if "event" in message:
+                        if self._event_handler is not None:
+                            self._event_handler(message["topic"], message["event"])
+                    else:
+                        await self._dispatch(message["topic"], message["ids"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+            await asyncio.sleep(CACHE_RECONNECT_SECONDS)
+
+    def start(self):
+        if isinstance(self.backend, LocalBackend):
+            logger.info("CACHE_URL is not set; caches are local to this worker")
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.backend.close()
+
+
+shared_cache = SharedCache(create_backend())
@@ -0,0 +1,134 @@
+"""
+Request coalescing (single-flight).
+
+Concurrent calls with the same key share one execution and its result:
+the first caller starts it, the ones arriving while it runs wait for the
+same outcome instead of issuing their own database query. Nothing is kept
+once it finishes; this only collapses reads that overlap in time.
+
+The shared result is the same object for every caller, so it must be
+treated as read-only. The execution runs in its own task, so a caller that
+disconnects does not cancel it for the others.
+"""
+
+import asyncio
+import functools
+import inspect
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+import os
+
+# Per-key metrics kept per group; the least recently used keys are dropped
+SINGLE_FLIGHT_MAX_KEYS = int(os.environ.get('SINGLE_FLIGHT_MAX_KEYS', '1000'))
+
+
+def _freeze(value) -> Hashable:
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _label(key: Hashable) -> str:
+    """Readable metrics key: ``slug=x,currency=None`` for bound arguments"""
+    if isinstance(key, tuple) and all(isinstance(item, tuple) and len(item) == 2 for item in key):
+        return ",".join(f"{k}={v}" for k, v in key)
+    return str(key)
+
+
+class SingleFlight:
+    """One group of coalesced calls, with per-key counters"""
+
+    def __init__(self, name: str, max_keys: int = SINGLE_FLIGHT_MAX_KEYS):
+        self.name = name
+        self.max_keys = max_keys
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+
+    def _count(self, key: Hashable, field: str):
+        label = _label(key)
+        stats = self._stats.pop(label, None) or {"executions": 0, "collapsed": 0, "errors": 0}
+        stats[field] += 1
+        self._stats[label] = stats
+        while len(self._stats) > self.max_keys:
+            self._stats.popitem(last=False)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Result of ``await fn()``, shared with concurrent calls for ``key``"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+            self._count(key, "executions")
+        else:
+            self._count(key, "collapsed")
+        return await asyncio.shield(task)
+
+    def forget(self, key: Optional[Hashable] = None):
+        """Let later calls for ``key`` (default: all keys) start a new execution"""
+        if key is None:
+            self._inflight.clear()
+        else:
+            self._inflight.pop(key, None)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Also marks the exception as retrieved when every caller went away
+        if not task.cancelled() and task.exception() is not None:
+            self._count(key, "errors")
+
+    def stats(self) -> dict:
+        keys = dict(self._stats)
+        return {
+            "name": self.name,
+            "in_flight": len(self._inflight),
+            "executions": sum(s["executions"] for s in keys.values()),
+            "collapsed": sum(s["collapsed"] for s in keys.values()),
+            "keys": keys
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def flight_group(name: str) -> SingleFlight:
+    """The group called ``name``, created on first use"""
+    if name not in _groups:
+        _groups[name] = SingleFlight(name)
+    return _groups[name]
+
+
+def flight_stats() -> List[dict]:
+    return [group.stats() for group in _groups.values()]
+
+
+def single_flight(name: str, key: Optional[Callable[..., Hashable]] = None):
+    """
+    Decorator coalescing concurrent calls of an async function or read route.
+
+    Calls are keyed by ``key(*args, **kwargs)``, or by all bound arguments
+    when no key function is given. Only use it on routes whose response does
+    not depend on request headers; otherwise decorate the loader they call.
+    """
+    group = flight_group(name)
+
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if key is not None:
+                flight_key = key(*args, **kwargs)
+            else:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                flight_key = tuple((k, _freeze(v)) for k, v in bound.arguments.items())
+            return await group.do(flight_key, lambda: func(*args, **kwargs))
+
+        wrapper.flight = group
+        return wrapper
+
+    return decorate
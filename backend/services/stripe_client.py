@@ -0,0 +1,21 @@
+"""
+Lazily imported Stripe SDK.
+
+``stripe`` is large and only needed by checkout and background
+reconciliation, so it is imported on first use (or by the startup
+warm-up) instead of when the app module loads.
+"""
+
+import os
+
+_stripe = None
+
+
+def get_stripe():
+    """The configured ``stripe`` module"""
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
+        _stripe = stripe
+    return _stripe
@@ -0,0 +1,210 @@
+"""
+Logging pipeline: queue-backed output, request context and sampling.
+
+``configure_logging`` puts a ``QueueHandler`` on the root logger. Records
+are only enqueued on the event loop thread; a ``QueueListener`` thread
+formats and writes them, so slow output (a pipe, a full disk, a log
+shipper) never blocks requests. ``LOG_FORMAT=json`` writes one JSON
+object per line instead of the text format.
+
+``RequestContextMiddleware`` gives every request an id (the incoming
+``X-Request-ID`` or a new one, echoed in the response) and keeps it, with
+the method and route, in a context variable that is attached to every
+record logged while the request runs. It also logs one ``access`` record
+per request with its status and duration.
+
+Info and debug records from the loggers in ``LOG_SAMPLE_LOGGERS`` (the
+hot paths) are limited to ``LOG_SAMPLE_PER_SECOND`` per logger; the next
+record kept reports how many were dropped. Warnings and errors are always
+kept.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+import os
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()  # text or json
+LOG_TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_SAMPLE_LOGGERS = [
+    name.strip() for name in os.environ.get('LOG_SAMPLE_LOGGERS', 'access,routes.cart,routes.products').split(',')
+    if name.strip()
+]
+LOG_SAMPLE_PER_SECOND = int(os.environ.get('LOG_SAMPLE_PER_SECOND', '20'))
+
+request_context: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar('request_context', default=None)
+
+access_logger = logging.getLogger("access")
+
+# Attributes every LogRecord has; anything else was passed with ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "context", "dropped"}
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records with the current request context, leaving formatting to the listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in another thread, outside the request's context
+        record.context = request_context.get()
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps at most ``per_second`` info/debug records per second for each sampled logger"""
+
+    def __init__(self, loggers: Iterable[str], per_second: int):
+        super().__init__()
+        self.loggers = tuple(loggers)
+        self.per_second = per_second
+        self._windows: Dict[str, list] = {}  # logger -> [second, kept, dropped]
+
+    def _sampled(self, name: str) -> bool:
+        return any(name == prefix or name.startswith(prefix + ".") for prefix in self.loggers)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self._sampled(record.name):
+            return True
+        second = int(record.created)
+        window = self._windows.get(record.name)
+        if window is None or window[0] != second:
+            dropped = window[2] if window is not None else 0
+            window = self._windows[record.name] = [second, 0, dropped]
+        if window[1] >= self.per_second:
+            window[2] += 1
+            return False
+        window[1] += 1
+        if window[2]:
+            record.dropped = window[2]
+            window[2] = 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the request context and ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, "context", None) or {})
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if getattr(record, "dropped", 0):
+            entry["sampled_out"] = record.dropped
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The plain format, with the request id and sampling count appended when present"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        context = getattr(record, "context", None)
+        if context:
+            line += f" [{context['request_id']}]"
+        if getattr(record, "dropped", 0):
+            line += f" (+{record.dropped} sampled out)"
+        return line
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None):
+    """Route the root logger through a queue and a background writer thread"""
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(LOG_TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_LOGGERS, LOG_SAMPLE_PER_SECOND))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # Server loggers go through the queue too; ``access`` replaces uvicorn's access log
+    for name in ("uvicorn", "uvicorn.error", "gunicorn.error"):
+        server_logger = logging.getLogger(name)
+        server_logger.handlers = []
+        server_logger.propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Write out what is still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class RequestContextMiddleware:
+    """ASGI middleware setting the request context and logging one access record per request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = (_header(scope, b"x-request-id") or uuid.uuid4().hex)[:64]
+        context = {"request_id": request_id, "method": scope["method"], "route": None}
+        token = request_context.set(context)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # The router has matched by now; log the route template, not the raw path
+                route = scope.get("route")
+                context["route"] = getattr(route, "path", None) or scope["path"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            context["route"] = context["route"] or getattr(scope.get("route"), "path", None) or scope["path"]
+            access_logger.log(
+                logging.WARNING if status_code >= 500 else logging.INFO,
+                f"{scope['method']} {context['route']} {status_code} {duration_ms}ms",
+                extra={"status": status_code, "duration_ms": duration_ms}
+            )
+            request_context.reset(token)
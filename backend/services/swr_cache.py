@@ -0,0 +1,147 @@
+"""
+Stale-while-revalidate caching with a last-known-good fallback.
+
+Public catalog and content reads go through a ``SwrCache``. For each
+entry there are three bounds:
+
+- fresh for ``SWR_FRESH_SECONDS``: served as is;
+- until ``SWR_STALE_SECONDS``: served at once while one background refresh
+  runs;
+- after that, or after an invalidation: reloaded before answering. If the
+  reload fails (MongoDB down or failing over), the previous value is served
+  as long as it is younger than ``SWR_MAX_STALE_SECONDS``, and the error is
+  raised only when there is nothing recent enough to fall back to.
+
+After a failed load, requests get the previous value at once instead of
+each waiting for the driver to give up; one background reload is tried
+every ``SWR_RETRY_SECONDS`` until the database answers again.
+
+Loads go through a single-flight group, so a key is never loaded twice at
+the same time.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Optional, Set
+import os
+import logging
+
+from services.single_flight import flight_group
+
+logger = logging.getLogger(__name__)
+
+SWR_FRESH_SECONDS = float(os.environ.get('SWR_FRESH_SECONDS', '5'))
+SWR_STALE_SECONDS = float(os.environ.get('SWR_STALE_SECONDS', '60'))
+SWR_MAX_STALE_SECONDS = float(os.environ.get('SWR_MAX_STALE_SECONDS', '3600'))
+SWR_MAX_ENTRIES = int(os.environ.get('SWR_MAX_ENTRIES', '2000'))
+SWR_RETRY_SECONDS = float(os.environ.get('SWR_RETRY_SECONDS', '5'))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    loaded_at: float
+    valid: bool = True
+    retry_at: Optional[float] = None  # set while loads fail: serve the value, reload after this
+
+
+class SwrCache:
+    """Values by key, refreshed in the background and kept as a fallback"""
+
+    def __init__(
+        self,
+        name: str,
+        fresh: float = SWR_FRESH_SECONDS,
+        stale: float = SWR_STALE_SECONDS,
+        max_stale: float = SWR_MAX_STALE_SECONDS,
+        max_entries: int = SWR_MAX_ENTRIES,
+        retry: float = SWR_RETRY_SECONDS
+    ):
+        self.name = name
+        self.fresh = fresh
+        self.stale = max(stale, fresh)
+        self.max_stale = max(max_stale, self.stale)
+        self.max_entries = max_entries
+        self.retry = retry
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._refreshing: Set[Hashable] = set()
+        self._generation = 0
+        self._flight = flight_group(f"swr:{name}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable]):
+        """Value for ``key``, loading it with ``await load()`` when needed"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            age = now - entry.loaded_at
+            if entry.valid and age < self.stale:
+                self._entries.move_to_end(key)
+                if age >= self.fresh:
+                    self._refresh_in_background(key, load)
+                return entry.value
+            if entry.retry_at is not None and age < self.max_stale:
+                # The last load failed: don't make this request wait on the database too
+                if now >= entry.retry_at:
+                    self._refresh_in_background(key, load)
+                return entry.value
+
+        try:
+            return await self._load(key, load)
+        except Exception as e:
+            if entry is not None and time.monotonic() - entry.loaded_at < self.max_stale:
+                logger.warning(f"Serving last-known-good {self.name} data for {key}: {str(e)}")
+                self._failed(key)
+                return entry.value
+            raise
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Reload ``key`` (default: every entry) on next use; current values stay as a fallback"""
+        self._generation += 1
+        # Loads already running may predate the change; later reads start their own
+        self._flight.forget(key)
+        if key is None:
+            entries = list(self._entries.values())
+        else:
+            entries = [self._entries[key]] if key in self._entries else []
+        for entry in entries:
+            entry.valid = False
+            entry.retry_at = None  # a write just went through, so try the database again
+
+    def clear(self):
+        self._generation += 1
+        self._flight.forget()
+        self._entries.clear()
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable]):
+        generation = self._generation
+        value = await self._flight.do(key, load)
+        # A load that raced an invalidation may predate the change
+        if self._generation == generation:
+            self._entries[key] = _Entry(value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _refresh_in_background(self, key: Hashable, load: Callable[[], Awaitable]):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.ensure_future(self._load(key, load))
+        task.add_done_callback(lambda done: self._refresh_done(key, done))
+
+    def _refresh_done(self, key: Hashable, task: asyncio.Task):
+        self._refreshing.discard(key)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background refresh of {self.name} data for {key} failed: {task.exception()}")
+            self._failed(key)
+
+    def _failed(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.retry_at = time.monotonic() + self.retry
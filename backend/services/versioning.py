@@ -0,0 +1,36 @@
+"""
+Optimistic concurrency for admin edits.
+
+Editable documents carry a ``version`` that every write increments. An
+edit sends the version it was based on and is applied with a single
+``find_one_and_update`` conditional on it, so a concurrent edit makes it
+fail instead of being silently overwritten.
+"""
+
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+
+def version_match(expected: Optional[int]) -> dict:
+    """Filter matching ``expected``; documents written before versioning count as version 0"""
+    if expected is None:
+        return {}
+    if expected == 0:
+        return {"version": {"$in": [None, 0]}}
+    return {"version": expected}
+
+
+async def update_versioned(collection, query: dict, update_data: dict, expected: Optional[int] = None):
+    """
+    ``$set`` ``update_data`` and bump the version in one round trip.
+
+    Returns the updated document, or None when nothing matched ``query``
+    at ``expected`` version (missing document or edit conflict).
+    """
+    return await collection.find_one_and_update(
+        {**query, **version_match(expected)},
+        {"$set": update_data, "$inc": {"version": 1}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
@@ -0,0 +1,42 @@
+"""
+Background warm-up of heavy optional imports.
+
+Stripe, Pillow, python-jose and passlib are imported where they are used
+so that importing the app stays cheap. Once the worker is up they are
+imported off the event loop here, so the first checkout, upload or admin
+login does not pay for the import either.
+"""
+
+import asyncio
+import importlib
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+WARMUP_DELAY_SECONDS = float(os.environ.get('WARMUP_DELAY_SECONDS', '2'))
+WARMUP_MODULES = ("stripe", "PIL.Image", "jose.jwt", "passlib.context")
+
+
+def _import_all():
+    for name in WARMUP_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Warm-up could not import {name}: {str(e)}")
+
+
+async def _warm_up():
+    await asyncio.sleep(WARMUP_DELAY_SECONDS)
+    await asyncio.to_thread(_import_all)
+    logger.info("Warm-up imports done")
+
+
+_task = None
+
+
+def warm_up():
+    """Schedule the warm-up imports once per process"""
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_warm_up())
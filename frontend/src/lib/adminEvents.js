@@ -0,0 +1,50 @@
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const RECONNECT_DELAY_MS = 5000;
+
+// Opens the admin event stream. EventSource cannot send the Authorization
+// header, so each connection uses a short-lived ticket in the URL instead
+// of the login token, and a closed stream is reopened with a new ticket.
+// `setup(source)` adds the listeners; returns a function that closes it.
+export const openAdminEvents = (getAuthHeader, setup, onError) => {
+  let source = null;
+  let timer = null;
+  let closed = false;
+
+  const reconnect = () => {
+    if (source) source.close();
+    if (!closed) timer = setTimeout(connect, RECONNECT_DELAY_MS);
+  };
+
+  async function connect() {
+    try {
+      const response = await axios.post(
+        `${BACKEND_URL}/api/admin/events/ticket`,
+        null,
+        { headers: getAuthHeader() }
+      );
+      if (closed) return;
+      source = new EventSource(
+        `${BACKEND_URL}/api/admin/events?ticket=${encodeURIComponent(response.data.ticket)}`
+      );
+      setup(source);
+      source.onerror = () => {
+        if (onError) onError();
+        // The browser retries with the same URL by itself unless the server
+        // refused it (e.g. the ticket expired); then get a new ticket
+        if (source.readyState === EventSource.CLOSED) reconnect();
+      };
+    } catch (error) {
+      if (onError) onError();
+      reconnect();
+    }
+  }
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    if (source) source.close();
+  };
+};
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import { CheckCircle, Download, Mail } from 'lucide-react';
 import { Button } from '../components/ui/button';
@@ -6,10 +6,37 @@ import { Card, CardContent } from '../components/ui/card';
 import Header from '../components/Header';
 import Footer from '../components/Footer';
 
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+
+const STATUS_LABELS = {
+  pending: 'Confirmando pago...',
+  paid: 'Pagado',
+  completed: 'Completado',
+  cancelled: 'Cancelado',
+};
+
 const CheckoutSuccess = () => {
   const navigate = useNavigate();
   const location = useLocation();
   const orderId = location.state?.orderId;
+  const [order, setOrder] = useState(null);
+
+  useEffect(() => {
+    if (!orderId) return undefined;
+
+    // The server pushes the status as soon as the payment is confirmed
+    const source = new EventSource(`${BACKEND_URL}/api/checkout/order/${orderId}/events`);
+    source.addEventListener('status', (event) => {
+      const data = JSON.parse(event.data);
+      setOrder(data);
+      if (data.status !== 'pending') {
+        source.close();
+      }
+    });
+    source.onerror = () => source.close();
+
+    return () => source.close();
+  }, [orderId]);
 
   return (
     <div className="min-h-screen bg-slate-950">
@@ -36,6 +63,16 @@ const CheckoutSuccess = () => {
                   <div className="bg-slate-800 border border-slate-700 rounded-lg p-4 mb-8">
                     <p className="text-gray-400 text-sm mb-1">Número de Orden</p>
                     <p className="text-cyan-400 font-mono text-lg">{orderId}</p>
+                    {order && (
+                      <div className="mt-3 text-sm text-gray-300">
+                        <p>
+                          {STATUS_LABELS[order.status] || order.status} · Total: {order.total.toFixed(2)} {order.currency}
+                        </p>
+                        <p className="text-gray-400">
+                          {order.items.map((item) => `${item.product_name} x${item.quantity}`).join(', ')}
+                        </p>
+                      </div>
+                    )}
                   </div>
                 )}
 
@@ -6,12 +6,13 @@ import { Button } from '../../components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '../../components/ui/card';
 import { useAdmin } from '../../context/AdminContext';
 import { useToast } from '../../hooks/use-toast';
+import { openAdminEvents } from '../../lib/adminEvents';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
 const AdminDashboard = () => {
   const navigate = useNavigate();
-  const { admin, logout, isAuthenticated, getAuthHeader } = useAdmin();
+  const { admin, logout, isAuthenticated, token, getAuthHeader } = useAdmin();
   const { toast } = useToast();
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -19,11 +20,39 @@ const AdminDashboard = () => {
   useEffect(() => {
     if (!isAuthenticated) {
       navigate('/admin');
-    } else {
-      fetchStats();
     }
   }, [isAuthenticated, navigate]);
 
+  // Live stats: a snapshot on connect, then deltas as orders come in
+  useEffect(() => {
+    if (!isAuthenticated) return undefined;
+
+    let received = false;
+    return openAdminEvents(getAuthHeader, (source) => {
+      source.addEventListener('stats', (event) => {
+        received = true;
+        setStats(JSON.parse(event.data));
+        setLoading(false);
+      });
+      source.addEventListener('stats-delta', (event) => {
+        const delta = JSON.parse(event.data);
+        setStats((current) => {
+          const next = { ...current };
+          Object.entries(delta).forEach(([field, change]) => {
+            next[field] = Math.round(((next[field] || 0) + change) * 100) / 100;
+          });
+          return next;
+        });
+      });
+    }, () => {
+      // The stream reconnects by itself; load the stats once if none arrived
+      if (!received) {
+        received = true;
+        fetchStats();
+      }
+    });
+  }, [isAuthenticated, token]);
+
   const fetchStats = async () => {
     try {
       const response = await axios.get(
@@ -7,12 +7,13 @@ import { Card, CardContent, CardHeader, CardTitle } from '../../components/ui/ca
 import { Badge } from '../../components/ui/badge';
 import { useAdmin } from '../../context/AdminContext';
 import { useToast } from '../../hooks/use-toast';
+import { openAdminEvents } from '../../lib/adminEvents';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 
 const AdminOrders = () => {
   const navigate = useNavigate();
-  const { isAuthenticated, getAuthHeader } = useAdmin();
+  const { isAuthenticated, token, getAuthHeader } = useAdmin();
   const { toast } = useToast();
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -25,6 +26,26 @@ const AdminOrders = () => {
     }
   }, [isAuthenticated, navigate]);
 
+  // New orders and status changes pushed by the server
+  useEffect(() => {
+    if (!isAuthenticated) return undefined;
+
+    return openAdminEvents(getAuthHeader, (source) => {
+      source.addEventListener('order', (event) => {
+        const data = JSON.parse(event.data);
+        if (data.type === 'created') {
+          setOrders((current) => (
+            current.some((order) => order.id === data.order_id) ? current : [data.order, ...current]
+          ));
+        } else {
+          setOrders((current) => current.map((order) => (
+            order.id === data.order_id ? { ...order, status: data.status } : order
+          )));
+        }
+      });
+    });
+  }, [isAuthenticated, token]);
+
   const fetchOrders = async () => {
     try {
       const response = await axios.get(
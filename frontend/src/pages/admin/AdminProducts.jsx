@@ -32,7 +32,9 @@ const AdminProducts = () => {
 
   const fetchProducts = async () => {
     try {
-      const response = await axios.get(`${BACKEND_URL}/api/products`);
+      const response = await axios.get(`${BACKEND_URL}/api/products`, {
+        params: { fields: '*' },
+      });
       setProducts(response.data);
     } catch (error) {
       console.error('Error fetching products:', error);
@@ -62,6 +64,7 @@ const AdminProducts = () => {
           image_url: editingProduct.image_url,
           duration: editingProduct.duration,
           modules: editingProduct.modules ? parseInt(editingProduct.modules) : null,
+          version: editingProduct.version,
         },
         { headers: getAuthHeader() }
       );
@@ -75,11 +78,18 @@ const AdminProducts = () => {
       fetchProducts();
     } catch (error) {
       console.error('Error updating product:', error);
+      const conflict = error.response?.status === 409;
       toast({
         title: 'Error',
-        description: 'No se pudo actualizar el producto',
+        description: conflict
+          ? 'Otra persona modificó este producto. Se recargó la lista, vuelve a editarlo.'
+          : 'No se pudo actualizar el producto',
         variant: 'destructive',
       });
+      if (conflict) {
+        setIsDialogOpen(false);
+        fetchProducts();
+      }
     }
   };
 
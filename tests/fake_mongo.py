@@ -0,0 +1,283 @@
+"""
+A small in-memory stand-in for the Motor collections the services use.
+
+Only the query and update operators the services need are supported:
+equality (including on array elements), ``$ne``, ``$gt``, ``$gte``,
+``$lt``, ``$lte``, ``$in``, ``$exists`` and a top-level ``$or``; ``$set``,
+``$inc``, ``$setOnInsert`` and ``$push``. Dotted paths are only supported
+in queries, where they also reach into arrays of subdocuments.
+"""
+
+import copy
+from types import SimpleNamespace
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+
+def _matches_value(value, condition) -> bool:
+    if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+        for op, arg in condition.items():
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$in" and not (value in arg or (isinstance(value, list) and any(v in arg for v in value))):
+                return False
+            if op == "$exists" and (value is not None) != arg:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > arg:
+                    return False
+                if op == "$gte" and not value >= arg:
+                    return False
+                if op == "$lt" and not value < arg:
+                    return False
+                if op == "$lte" and not value <= arg:
+                    return False
+        return True
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    return value == condition
+
+
+def _value(doc: dict, field: str):
+    value = doc
+    for part in field.split("."):
+        if isinstance(value, list):
+            value = [item.get(part) for item in value if isinstance(item, dict)]
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+        elif not _matches_value(_value(doc, field), condition):
+            return False
+    return True
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    for field, value in update.get("$set", {}).items():
+        doc[field] = copy.deepcopy(value)
+    for field, value in update.get("$inc", {}).items():
+        doc[field] = (doc.get(field) or 0) + value
+    for field, value in update.get("$push", {}).items():
+        doc.setdefault(field, []).append(copy.deepcopy(value))
+    if inserting:
+        for field, value in update.get("$setOnInsert", {}).items():
+            doc[field] = copy.deepcopy(value)
+
+
+def _project(doc: dict, projection):
+    doc = copy.deepcopy(doc)
+    doc.pop("_id", None)
+    if projection:
+        included = [field for field, keep in projection.items() if keep and field != "_id"]
+        if included:
+            doc = {field: doc[field] for field in included if field in doc}
+    return doc
+
+
+class FakeCursor:
+    """Sorts on the stored documents and projects them when they are read, like the server"""
+
+    def __init__(self, docs, projection=None):
+        self.docs = docs
+        self.projection = projection
+
+    def sort(self, key, direction=1):
+        self.docs.sort(key=lambda doc: doc.get(key), reverse=direction == -1)
+        return self
+
+    def skip(self, count):
+        self.docs = self.docs[count:]
+        return self
+
+    def limit(self, count):
+        if count:
+            self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length=None):
+        docs = self.docs if length is None else self.docs[:length]
+        return [_project(doc, self.projection) for doc in docs]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield _project(doc, self.projection)
+
+
+class FakeCollection:
+    def __init__(self, docs=(), unique=("id",)):
+        self.name = None
+        self.docs = [copy.deepcopy(doc) for doc in docs]
+        self.unique = tuple(unique)
+        self.fail_next = {}  # operation name -> exception raised by its next call
+
+    def _check_failure(self, operation):
+        error = self.fail_next.pop(operation, None)
+        if error is not None:
+            raise error
+
+    def _check_unique(self, doc):
+        for field in self.unique:
+            if field in doc and any(other.get(field) == doc[field] for other in self.docs):
+                raise DuplicateKeyError(f"E11000 duplicate key error: {field} {doc[field]!r}")
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([doc for doc in self.docs if matches(doc, query or {})], projection)
+
+    async def count_documents(self, query, limit=0):
+        count = sum(1 for doc in self.docs if matches(doc, query))
+        return min(count, limit) if limit else count
+
+    async def insert_one(self, doc):
+        self._check_failure("insert_one")
+        self._check_unique(doc)
+        self.docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_id=doc.get("id"))
+
+    async def insert_many(self, docs, ordered=True):
+        self._check_failure("insert_many")
+        errors, inserted = [], 0
+        for index, doc in enumerate(docs):
+            try:
+                self._check_unique(doc)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+                continue
+            self.docs.append(copy.deepcopy(doc))
+            inserted += 1
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": inserted})
+        return SimpleNamespace(inserted_ids=[doc.get("id") for doc in docs])
+
+    def _update(self, query, update, many=False, upsert=False):
+        matched = modified = 0
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                apply_update(doc, update)
+                matched += 1
+                modified += doc != before
+                if not many:
+                    break
+        upserted_id = None
+        if not matched and upsert:
+            doc = {
+                field: value for field, value in query.items()
+                if not field.startswith("$") and not isinstance(value, dict)
+            }
+            apply_update(doc, update, inserting=True)
+            self._check_unique(doc)
+            self.docs.append(doc)
+            upserted_id = doc.get("id")
+        return SimpleNamespace(matched_count=matched, modified_count=modified, upserted_id=upserted_id)
+
+    async def update_one(self, query, update, upsert=False):
+        self._check_failure("update_one")
+        return self._update(query, update, upsert=upsert)
+
+    async def update_many(self, query, update, upsert=False):
+        self._check_failure("update_many")
+        return self._update(query, update, many=True, upsert=upsert)
+
+    async def find_one_and_update(
+        self, query, update, projection=None, return_document=ReturnDocument.BEFORE, upsert=False
+    ):
+        self._check_failure("find_one_and_update")
+        for doc in self.docs:
+            if matches(doc, query):
+                before = _project(doc, projection)
+                apply_update(doc, update)
+                return _project(doc, projection) if return_document == ReturnDocument.AFTER else before
+        if upsert:
+            self._update(query, update, upsert=True)
+            return _project(self.docs[-1], projection) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    async def delete_one(self, query):
+        for index, doc in enumerate(self.docs):
+            if matches(doc, query):
+                del self.docs[index]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    async def delete_many(self, query):
+        self._check_failure("delete_many")
+        kept = [doc for doc in self.docs if not matches(doc, query)]
+        deleted = len(self.docs) - len(kept)
+        self.docs = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def bulk_write(self, requests, ordered=True):
+        self._check_failure("bulk_write")
+        matched = modified = upserted = deleted = 0
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                if type(request).__name__ in ("DeleteOne", "DeleteMany"):
+                    kept = [doc for doc in self.docs if not matches(doc, request._filter)]
+                    if type(request).__name__ == "DeleteOne" and len(self.docs) - len(kept) > 1:
+                        first = next(doc for doc in self.docs if matches(doc, request._filter))
+                        kept = [doc for doc in self.docs if doc is not first]
+                    deleted += len(self.docs) - len(kept)
+                    self.docs = kept
+                    continue
+                document = request._doc
+                if hasattr(request, "_upsert"):
+                    many = type(request).__name__ == "UpdateMany"
+                    result = self._update(request._filter, document, many=many, upsert=bool(request._upsert))
+                    matched += result.matched_count
+                    modified += result.modified_count
+                    upserted += result.upserted_id is not None
+                else:
+                    self._check_unique(document)
+                    self.docs.append(copy.deepcopy(document))
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nMatched": matched, "nModified": modified})
+        return SimpleNamespace(
+            matched_count=matched, modified_count=modified, upserted_count=upserted, deleted_count=deleted
+        )
+
+
+class FakeDb:
+    """Collections are created on first access, like Motor's"""
+
+    def __init__(self, **collections):
+        for name, collection in collections.items():
+            collection.name = name
+            setattr(self, name, collection)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        collection = FakeCollection()
+        collection.name = name
+        setattr(self, name, collection)
+        return collection
@@ -0,0 +1,155 @@
+"""
+Tests for the daily sales buckets and their rollup queries.
+"""
+
+import asyncio
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("pymongo")
+
+from services.analytics import period_starts, record_sale, reverse_sale, sale_increments, sales_pipeline  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+
+class CountingBuckets(FakeCollection):
+    def __init__(self):
+        super().__init__(unique=())
+        self.writes = 0
+
+    async def bulk_write(self, requests, ordered=True):
+        self.writes += 1
+        return await super().bulk_write(requests, ordered=ordered)
+
+
+def paid_order(order_id="o1"):
+    return {
+        "id": order_id, "status": "paid", "updated_at": datetime(2025, 3, 6, 10), "currency": "USD",
+        "subtotal": 300.0, "total": 300.0, "items": [
+            {"product_id": "p1", "product_name": "Diplomado A", "price": 100.0, "quantity": 2},
+            {"product_id": "p2", "product_name": "Curso B", "price": 100.0, "quantity": 1},
+        ]
+    }
+
+
+def test_period_starts_on_monday_and_first_of_month():
+    starts = period_starts(date(2025, 3, 6))  # a Thursday
+    assert starts == {
+        "day": datetime(2025, 3, 6),
+        "week": datetime(2025, 3, 3),
+        "month": datetime(2025, 3, 1)
+    }
+
+
+def test_paid_order_lines_become_bucket_increments():
+    order = {
+        "updated_at": datetime(2025, 3, 6, 22, 15),
+        "currency": "CLP",
+        "fx_rate": 900.0,
+        "subtotal": 900000.0,
+        "discount": 90000.0,
+        "items": [
+            {"product_id": "p1", "product_name": "Diplomado A", "category": "diplomados", "price": 300000.0, "quantity": 2},
+            {"product_id": "p2", "product_name": "Curso B", "category": "cursos", "price": 300000.0, "quantity": 1},
+        ]
+    }
+    increments = {i["key"]["product_id"]: i for i in sale_increments(order)}
+
+    assert increments["p1"]["key"] == {"day": datetime(2025, 3, 6), "product_id": "p1", "currency": "CLP"}
+    assert increments["p1"]["set"]["week"] == datetime(2025, 3, 3)
+    assert increments["p1"]["set"]["category"] == "diplomados"
+    # 10% order discount spread over the lines by value
+    assert increments["p1"]["inc"] == {"orders": 1, "quantity": 2, "revenue": 540000.0, "revenue_base": 600.0}
+    assert increments["p2"]["inc"]["revenue"] == 270000.0
+
+
+def test_weekly_rollup_by_category_adds_revenue_in_base_currency_only():
+    pipeline = sales_pipeline(date(2025, 3, 1), date(2025, 3, 31), period="week", group_by=["category"])
+    match, group, project = pipeline[0]["$match"], pipeline[2]["$group"], pipeline[-1]["$project"]
+
+    assert match == {"day": {"$gte": datetime(2025, 3, 1), "$lt": datetime(2025, 4, 1)}}
+    assert group["_id"] == {"period": "$week", "category": "$category"}
+    assert "revenue" not in group and "revenue" not in project
+
+
+def test_currency_filter_includes_revenue_in_that_currency():
+    pipeline = sales_pipeline(date(2025, 3, 1), date(2025, 3, 1), currency="clp")
+    assert pipeline[0]["$match"]["currency"] == "CLP"
+    assert "revenue" in pipeline[2]["$group"]
+
+
+def test_sale_is_recorded_once_per_order_in_one_write():
+    order = paid_order()
+    db = FakeDb(orders=FakeCollection([order]), sales_daily=CountingBuckets())
+
+    assert asyncio.run(record_sale(db, order)) is True
+    assert asyncio.run(record_sale(db, order)) is False
+
+    assert db.sales_daily.writes == 1
+    assert sorted((b["product_id"], b["orders"], b["quantity"]) for b in db.sales_daily.docs) == [
+        ("p1", 1, 2), ("p2", 1, 1)
+    ]
+    assert db.orders.docs[0]["analytics_recorded"] is True
+
+
+def test_failed_bucket_write_leaves_the_order_uncounted():
+    order = paid_order()
+    db = FakeDb(orders=FakeCollection([order]), sales_daily=CountingBuckets())
+    db.sales_daily.fail_next["bulk_write"] = ConnectionError("database unavailable")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(record_sale(db, order))
+    assert asyncio.run(record_sale(db, order)) is True
+    assert len(db.sales_daily.docs) == 2
+
+
+def test_confirming_a_completed_order_again_changes_nothing():
+    pytest.importorskip("fastapi")
+    from services.orders import mark_order_paid
+
+    order = {**paid_order(), "status": "completed", "analytics_recorded": True}
+    db = FakeDb(orders=FakeCollection([order]), sales_daily=CountingBuckets())
+
+    assert asyncio.run(mark_order_paid(db, order)) is False
+    assert db.orders.docs[0]["status"] == "completed"
+    assert db.sales_daily.writes == 0
+
+
+def test_cancelled_sale_is_taken_out_of_its_buckets_once():
+    order = paid_order()
+    db = FakeDb(orders=FakeCollection([order]), sales_daily=CountingBuckets())
+    asyncio.run(record_sale(db, order))
+    # Cancelled days later; the lines leave the buckets of the payment day
+    db.orders.docs[0].update(status="cancelled", updated_at=datetime(2025, 3, 20))
+
+    assert asyncio.run(reverse_sale(db, "o1")) is True
+    assert asyncio.run(reverse_sale(db, "o1")) is False
+
+    assert {b["day"] for b in db.sales_daily.docs} == {datetime(2025, 3, 6)}
+    assert [(b["orders"], b["quantity"], b["revenue"]) for b in db.sales_daily.docs] == [(0, 0, 0.0), (0, 0, 0.0)]
+
+
+def test_order_never_counted_is_not_taken_out():
+    db = FakeDb(orders=FakeCollection([{**paid_order(), "status": "cancelled"}]), sales_daily=CountingBuckets())
+
+    assert asyncio.run(reverse_sale(db, "o1")) is False
+    assert db.sales_daily.writes == 0
+
+
+def test_bulk_cancelling_a_paid_order_takes_it_out_of_the_analytics():
+    pytest.importorskip("fastapi")
+    from services.orders import bulk_set_order_status
+
+    order = paid_order()
+    db = FakeDb(orders=FakeCollection([order]), sales_daily=CountingBuckets())
+    asyncio.run(record_sale(db, order))
+
+    summary = asyncio.run(bulk_set_order_status(db, "cancelled", ids=["o1"]))
+
+    assert summary["updated"] == 1
+    assert sum(b["orders"] for b in db.sales_daily.docs) == 0
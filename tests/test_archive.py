@@ -0,0 +1,93 @@
+"""
+Tests for archiving finished contacts into day segments.
+"""
+
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("pymongo")
+
+from services import archive  # noqa: E402
+from services.search import contacts_index  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+
+def contact(contact_id, day):
+    created = datetime(2024, 1, day, 10)
+    return {
+        "id": contact_id, "name": "Ana", "email": "ana@example.com", "subject": "Consulta",
+        "message": "Hola", "status": "responded", "created_at": created, "updated_at": created
+    }
+
+
+class EditingArchive(FakeCollection):
+    """Archive collection that edits a hot contact while its segment is written"""
+
+    def __init__(self, hot, edited_id):
+        super().__init__()
+        self.hot, self.edited_id = hot, edited_id
+
+    async def insert_one(self, doc):
+        result = await super().insert_one(doc)
+        await self.hot.update_one({"id": self.edited_id}, {"$set": {"updated_at": datetime.utcnow()}})
+        return result
+
+
+@pytest.fixture
+def broadcasts(monkeypatch):
+    sent = []
+
+    async def invalidate(topic, ids=None):
+        sent.append((topic, list(ids)))
+
+    monkeypatch.setattr(archive.shared_cache, "invalidate", invalidate)
+    contacts_index.clear()
+    yield sent
+    contacts_index.clear()
+
+
+def test_archived_contacts_leave_the_hot_collection_and_the_index(broadcasts):
+    contacts = FakeCollection([contact("c1", 1), contact("c2", 1), contact("c3", 2)])
+    db = FakeDb(contacts=contacts)
+    for doc in contacts.docs:
+        contacts_index.upsert(doc)
+
+    counts = asyncio.run(archive.archive_collection(db, "contacts", older_than=datetime(2024, 2, 1)))
+
+    assert counts == {"segments": 2, "archived": 3}
+    assert contacts.docs == []
+    assert contacts_index.search("ana")[0] == 0
+    assert sorted(i for _, ids in broadcasts for i in ids) == ["c1", "c2", "c3"]
+    assert asyncio.run(archive.find_archived(db, "contacts", "c2"))["subject"] == "Consulta"
+
+
+def test_contact_edited_while_archiving_stays_hot_and_out_of_the_segment(broadcasts):
+    contacts = FakeCollection([contact("c1", 1), contact("c2", 1)])
+    db = FakeDb(contacts=contacts, contacts_archive=EditingArchive(contacts, "c2"))
+    for doc in contacts.docs:
+        contacts_index.upsert(doc)
+
+    counts = asyncio.run(archive.archive_collection(db, "contacts", older_than=datetime(2024, 2, 1)))
+
+    assert counts == {"segments": 1, "archived": 1}
+    assert [doc["id"] for doc in contacts.docs] == ["c2"]
+    assert db.contacts_archive.docs[0]["ids"] == ["c1"]
+    assert asyncio.run(archive.find_archived(db, "contacts", "c2")) is None
+    assert broadcasts == [("contacts", ["c1"])]
+
+
+def test_segment_is_dropped_when_every_contact_changed(broadcasts):
+    contacts = FakeCollection([contact("c1", 1)])
+    db = FakeDb(contacts=contacts, contacts_archive=EditingArchive(contacts, "c1"))
+
+    counts = asyncio.run(archive.archive_collection(db, "contacts", older_than=datetime(2024, 2, 1)))
+
+    assert counts == {"segments": 0, "archived": 0}
+    assert db.contacts_archive.docs == []
+    assert len(contacts.docs) == 1
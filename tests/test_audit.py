@@ -0,0 +1,123 @@
+"""
+Tests for the buffered audit log writer, against an in-memory collection.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import BulkWriteError  # noqa: E402
+
+from services import audit  # noqa: E402
+from tests import fake_mongo  # noqa: E402
+
+
+class FakeCollection(fake_mongo.FakeCollection):
+    """Unique ``id``, like the real collection; keeps each batch it was sent"""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+        self.failing = False
+
+    async def insert_many(self, docs, ordered=True):
+        if self.failing:
+            raise ConnectionError("database unavailable")
+        self.batches.append(list(docs))
+        return await super().insert_many(docs, ordered=ordered)
+
+
+class FakeDb:
+    def __init__(self):
+        self.audit_log = FakeCollection()
+
+
+def test_records_are_written_in_batches(monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_BATCH", 2)
+    log, db = audit.AuditLog(), FakeDb()
+    log.db = db
+    for n in range(3):
+        log.record("admin", "update_status", "order", f"o{n}", {"to": "completed"})
+
+    assert asyncio.run(log.flush()) == 3
+    assert [len(batch) for batch in db.audit_log.batches] == [2, 1]
+    assert [r["entity_id"] for batch in db.audit_log.batches for r in batch] == ["o0", "o1", "o2"]
+    assert len(log) == 0
+
+
+def test_failed_flush_keeps_records_in_order():
+    log, db = audit.AuditLog(), FakeDb()
+    log.db = db
+    log.record("admin", "delete", "product", "p1")
+    log.record("admin", "delete", "product", "p2")
+
+    db.audit_log.failing = True
+    with pytest.raises(ConnectionError):
+        asyncio.run(log.flush())
+    db.audit_log.failing = False
+    asyncio.run(log.flush())
+
+    assert [r["entity_id"] for r in db.audit_log.batches[0]] == ["p1", "p2"]
+
+
+def test_batch_written_before_a_lost_reply_is_not_duplicated():
+    log, db = audit.AuditLog(), FakeDb()
+    log.db = db
+    log.record("admin", "delete", "product", "p1")
+    log.record("admin", "delete", "product", "p2")
+    # The server wrote p1 but the reply never arrived, so the whole batch is retried
+    asyncio.run(db.audit_log.insert_one(log._buffer[0]))
+
+    assert asyncio.run(log.flush()) == 2
+    assert [r["entity_id"] for r in db.audit_log.docs] == ["p1", "p2"]
+    assert len(log) == 0
+
+
+def test_partial_failure_requeues_only_the_failed_records():
+    log, db = audit.AuditLog(), FakeDb()
+    log.db = db
+    for n in range(3):
+        log.record("admin", "delete", "product", f"p{n}")
+    db.audit_log.fail_next["insert_many"] = BulkWriteError({
+        "writeErrors": [{"index": 1, "code": 11600, "errmsg": "interrupted at shutdown"}], "nInserted": 2
+    })
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(log.flush())
+
+    assert [r["entity_id"] for r in log._buffer] == ["p1"]
+
+
+def test_requeue_into_a_full_buffer_drops_and_counts_the_oldest(monkeypatch, caplog):
+    log, db = audit.AuditLog(), FakeDb()
+    log.db = db
+    log._buffer = audit.deque(maxlen=3)
+    log.record("admin", "delete", "product", "p1")
+    log.record("admin", "delete", "product", "p2")
+
+    async def record_while_writing(docs, ordered=True):
+        # Newer records fill the buffer while the write is failing
+        log.record("admin", "delete", "product", "p3")
+        log.record("admin", "delete", "product", "p4")
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(db.audit_log, "insert_many", record_while_writing)
+    with pytest.raises(ConnectionError):
+        asyncio.run(log.flush())
+
+    assert [r["entity_id"] for r in log._buffer] == ["p2", "p3", "p4"]
+    assert "1 records dropped" in caplog.text
+
+
+def test_query_by_actor_entity_and_range():
+    from datetime import datetime
+    start, end = datetime(2025, 1, 1), datetime(2025, 2, 1)
+    assert audit.audit_query(actor="admin", entity="order", start=start, end=end) == {
+        "actor": "admin", "entity": "order", "at": {"$gte": start, "$lt": end}
+    }
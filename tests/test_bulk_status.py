@@ -0,0 +1,136 @@
+"""
+Tests for bulk status transitions and bulk order cancellation.
+"""
+
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pymongo")
+
+from services import orders  # noqa: E402
+from services.bulk_status import bulk_transition  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+TRANSITIONS = {"pending": {"cancelled"}, "paid": {"completed", "cancelled"}}
+
+
+def order(order_id, status, **fields):
+    return {"id": order_id, "status": status, "created_at": datetime(2024, 1, 1), **fields}
+
+
+class RacingCollection(FakeCollection):
+    """Orders collection where another writer pays an order just before the bulk write"""
+
+    def __init__(self, docs, raced_id):
+        super().__init__(docs)
+        self.raced_id = raced_id
+
+    async def bulk_write(self, requests, ordered=True):
+        await self.update_one(
+            {"id": self.raced_id}, {"$set": {"status": "paid", "updated_at": datetime.utcnow()}}
+        )
+        return await super().bulk_write(requests, ordered=ordered)
+
+
+def outcomes(summary):
+    return {item["id"]: item["outcome"] for item in summary["results"]}
+
+
+def test_outcomes_per_document():
+    collection = FakeCollection([
+        order("o1", "paid"), order("o2", "completed"), order("o3", "cancelled"), order("o4", "pending")
+    ])
+
+    summary, changed = asyncio.run(bulk_transition(
+        collection, "completed", TRANSITIONS, ids=["o1", "o2", "o3", "o4", "missing"]
+    ))
+
+    assert outcomes(summary) == {
+        "o1": "updated", "o2": "unchanged", "o3": "invalid_transition",
+        "o4": "invalid_transition", "missing": "not_found"
+    }
+    assert summary["matched"] == 4 and summary["updated"] == 1
+    assert [doc["id"] for doc in changed] == ["o1"]
+    assert changed[0]["status"] == "paid"
+    assert [doc["status"] for doc in collection.docs] == ["completed", "completed", "cancelled", "pending"]
+
+
+def test_document_changed_before_the_write_is_a_conflict():
+    collection = RacingCollection([order("o1", "pending"), order("o2", "pending")], raced_id="o2")
+
+    summary, changed = asyncio.run(bulk_transition(collection, "cancelled", TRANSITIONS, ids=["o1", "o2"]))
+
+    assert outcomes(summary) == {"o1": "updated", "o2": "conflict"}
+    assert [doc["id"] for doc in changed] == ["o1"]
+    assert [doc["status"] for doc in collection.docs] == ["cancelled", "paid"]
+
+
+def test_before_write_can_leave_documents_alone():
+    collection = FakeCollection([order("o1", "pending"), order("o2", "paid")])
+
+    async def refuse_pending(docs):
+        return {doc["id"] for doc in docs if doc["status"] == "pending"}
+
+    summary, _ = asyncio.run(bulk_transition(
+        collection, "cancelled", TRANSITIONS, query={}, before_write=refuse_pending
+    ))
+
+    assert outcomes(summary) == {"o1": "conflict", "o2": "updated"}
+    assert [doc["status"] for doc in collection.docs] == ["pending", "cancelled"]
+
+
+def test_filter_selecting_too_many_documents_is_refused():
+    collection = FakeCollection([order(f"o{n}", "paid") for n in range(3)])
+
+    with pytest.raises(ValueError):
+        asyncio.run(bulk_transition(collection, "completed", TRANSITIONS, query={"status": "paid"}, limit=2))
+
+
+class FakeStripe:
+    def __init__(self, intents):
+        self.intents = intents
+        self.cancelled = []
+        self.PaymentIntent = SimpleNamespace(retrieve=self.retrieve, cancel=self.cancel)
+
+    def retrieve(self, intent_id):
+        return SimpleNamespace(id=intent_id, status=self.intents[intent_id])
+
+    def cancel(self, intent_id):
+        self.cancelled.append(intent_id)
+        self.intents[intent_id] = "canceled"
+
+
+def test_bulk_cancel_cancels_payments_before_releasing_holds(monkeypatch):
+    stripe = FakeStripe({
+        "pi_open": "requires_payment_method", "pi_paid": "succeeded", "pi_moving": "processing"
+    })
+    monkeypatch.setattr(orders, "get_stripe", lambda: stripe)
+    db = FakeDb(
+        orders=FakeCollection([
+            order("o1", "pending", payment_intent_id="pi_open"),
+            order("o2", "pending", payment_intent_id="pi_paid"),
+            order("o3", "pending", payment_intent_id="pi_moving"),
+            order("o4", "pending")
+        ]),
+        products=FakeCollection([{"id": "p1", "stock": 0}]),
+        stock_holds=FakeCollection([
+            {"id": f"h{n}", "order_id": f"o{n}", "product_id": "p1", "quantity": 1, "status": "held"}
+            for n in range(1, 5)
+        ])
+    )
+
+    summary = asyncio.run(orders.bulk_set_order_status(db, "cancelled", ids=["o1", "o2", "o3", "o4"]))
+
+    assert outcomes(summary) == {"o1": "updated", "o2": "conflict", "o3": "conflict", "o4": "updated"}
+    assert stripe.cancelled == ["pi_open"]
+    assert [doc["status"] for doc in db.orders.docs] == ["cancelled", "pending", "pending", "cancelled"]
+    assert [hold["status"] for hold in db.stock_holds.docs] == ["released", "held", "held", "released"]
+    assert db.products.docs[0]["stock"] == 2
@@ -0,0 +1,84 @@
+"""
+Tests for server-side carts: updates and snapshot invalidation.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pymongo")
+
+from fastapi import HTTPException  # noqa: E402
+
+from models.cart import Cart, CartItem, CartUpdate  # noqa: E402
+from routes import cart as cart_routes  # noqa: E402
+from services import pricing, reservations  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(pricing, "PRICING_BASE_CURRENCY", "USD")
+    db = FakeDb(
+        products=FakeCollection([
+            {"id": "p1", "name": "Taller", "price": 100.0, "stock": 3, "is_active": True},
+            {"id": "p2", "name": "Curso", "price": 50.0, "stock": None, "is_active": True},
+        ]),
+        carts=FakeCollection()
+    )
+    monkeypatch.setattr(cart_routes, "get_db", lambda: db)
+    return db
+
+
+def create_cart(items):
+    response = asyncio.run(cart_routes.create_cart(CartUpdate(items=items)))
+    return response.id
+
+
+def test_rejected_update_leaves_the_cart_as_it_was(db):
+    cart_id = create_cart([CartItem(product_id="p1", quantity=1)])
+    before = dict(db.carts.docs[0])
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(cart_routes.update_cart_items(cart_id, CartUpdate(items=[CartItem(product_id="missing")])))
+    assert exc.value.status_code == 404
+    assert db.carts.docs[0] == before
+
+    # Still readable afterwards
+    assert asyncio.run(cart_routes.get_cart(cart_id)).subtotal == 100.0
+
+
+def test_update_reprices_the_cart(db):
+    cart_id = create_cart([CartItem(product_id="p1", quantity=1)])
+
+    response = asyncio.run(cart_routes.update_cart_items(
+        cart_id, CartUpdate(items=[CartItem(product_id="p1", quantity=2), CartItem(product_id="p2")])
+    ))
+
+    assert response.subtotal == 250.0
+    assert db.carts.docs[0]["revision"] == 1
+    assert db.carts.docs[0]["snapshot"]["subtotal"] == 250.0
+
+
+def test_stock_changes_drop_cached_snapshots(db):
+    db.carts.docs.append(Cart(
+        id="c1", items=[CartItem(product_id="p1")], snapshot={"items": [], "subtotal": 0.0}
+    ).model_dump())
+    db.carts.docs.append(Cart(
+        id="c2", items=[CartItem(product_id="p2")], snapshot={"items": [], "subtotal": 0.0}
+    ).model_dump())
+    items = [SimpleNamespace(product_id="p1", product_name="Taller", quantity=1)]
+
+    asyncio.run(reservations.hold_stock(db, "o1", items))
+    assert [cart["snapshot"] is None for cart in db.carts.docs] == [True, False]
+
+    db.carts.docs[0]["snapshot"] = {"items": [], "subtotal": 0.0}
+    asyncio.run(reservations.release_holds(db, "o1"))
+    assert db.carts.docs[0]["snapshot"] is None
+    assert db.carts.docs[0]["revision"] == 2
@@ -0,0 +1,112 @@
+"""
+Tests for checkout: failed payment intents and payment confirmation.
+"""
+
+import asyncio
+import sys
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pymongo")
+pytest.importorskip("email_validator")
+
+from fastapi import HTTPException  # noqa: E402
+
+from models.order import OrderItem  # noqa: E402
+from routes import checkout  # noqa: E402
+from services import orders, pricing  # noqa: E402
+from services.promotions import Evaluation  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+
+class StripeError(Exception):
+    pass
+
+
+class FakeStripe:
+    def __init__(self, status="succeeded", failing=False):
+        self.status = status
+        self.failing = failing
+        self.error = SimpleNamespace(StripeError=StripeError)
+        self.PaymentIntent = SimpleNamespace(create=self.create, retrieve=self.retrieve)
+
+    def create(self, **kwargs):
+        if self.failing:
+            raise StripeError("card network unavailable")
+        return SimpleNamespace(id="pi_1", client_secret="pi_1_secret")
+
+    def retrieve(self, intent_id):
+        return SimpleNamespace(id=intent_id, status=self.status)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(pricing, "PRICING_BASE_CURRENCY", "USD")
+    db = FakeDb(
+        products=FakeCollection([{"id": "p1", "name": "Taller", "price": 100.0, "stock": 5, "is_active": True}]),
+        # One use is held by another order, one was just taken by this checkout
+        promotions=FakeCollection([{"id": "promo1", "redemptions": 2, "max_redemptions": 2}])
+    )
+    monkeypatch.setattr(checkout, "get_db", lambda: db)
+
+    async def apply_promotions(db, items, code=None):
+        return Evaluation(discount=Decimal(0), rules=[SimpleNamespace(id="promo1")])
+
+    monkeypatch.setattr(checkout, "apply_promotions", apply_promotions)
+    return db
+
+
+def checkout_request():
+    return checkout.CheckoutRequest(
+        customer_name="Ana", customer_email="ana@example.com",
+        items=[OrderItem(product_id="p1", product_name="Taller", price=100.0, quantity=1)]
+    )
+
+
+def test_failed_payment_intent_gives_promotion_uses_back_once(db, monkeypatch):
+    monkeypatch.setattr(checkout, "get_stripe", lambda: FakeStripe(failing=True))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(checkout._create_payment_intent(checkout_request()))
+    assert exc.value.status_code == 400
+
+    order = db.orders.docs[0]
+    assert order["status"] == "cancelled"
+    assert db.promotions.docs[0]["redemptions"] == 1
+    assert db.products.docs[0]["stock"] == 5
+    # An admin cancel afterwards does not give the use back again
+    assert asyncio.run(orders.cancel_order(db, order)) is False
+    assert db.promotions.docs[0]["redemptions"] == 1
+
+
+def test_unpaid_confirmation_is_checked_again_on_retry(db, monkeypatch):
+    db.idempotency_keys = FakeCollection(unique=("key",))
+    db.orders.docs.append({
+        "id": "o1", "customer_name": "Ana", "customer_email": "ana@example.com", "status": "pending",
+        "items": [], "total": 100.0, "currency": "USD", "payment_intent_id": "pi_1"
+    })
+    stripe = FakeStripe(status="processing")
+    monkeypatch.setattr(checkout, "get_stripe", lambda: stripe)
+
+    def confirm():
+        response = checkout.Response()
+        result = asyncio.run(checkout.confirm_payment("o1", "pi_1", response, idempotency_key="k1"))
+        return result, response.headers.get("Idempotent-Replayed")
+
+    assert confirm()[0]["success"] is False
+    assert db.idempotency_keys.docs == []
+
+    stripe.status = "succeeded"
+    result, replayed = confirm()
+    assert result["success"] is True and replayed is None
+    assert db.orders.docs[0]["status"] == "paid"
+
+    # The confirmed payment is now what the key replays
+    result, replayed = confirm()
+    assert result["success"] is True and replayed == "true"
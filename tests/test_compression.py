@@ -0,0 +1,130 @@
+"""
+Tests for CompressionMiddleware: negotiation, thresholds and pass-through.
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from services import compression  # noqa: E402
+from services.compression import CompressionMiddleware, choose_encoding  # noqa: E402
+
+BODY = b'{"items": [' + b",".join(b'{"id": %d, "name": "Diplomado"}' % n for n in range(100)) + b"]}"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/large")
+    def large():
+        return Response(BODY, media_type="application/json", headers={"Vary": "Accept"})
+
+    @app.get("/small")
+    def small():
+        return Response(b'{"ok": true}', media_type="application/json")
+
+    @app.get("/image")
+    def image():
+        return Response(b"\x89PNG" + b"\x00" * 2000, media_type="image/png")
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(BODY), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([BODY[:600], BODY[600:]]), media_type="application/json")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: 1\n\n" * 200]), media_type="text/event-stream")
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("hola " * 300)
+
+    return TestClient(app)
+
+
+def get(client, path, accept_encoding):
+    return client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("br, gzip", "br"),
+    ("gzip;q=1.0, br;q=0", "gzip"),
+    ("br;q=0.0, gzip;q=0", None),
+    ("*", "br"),
+    ("identity", None),
+    ("", None),
+    ("GZIP", "gzip"),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header, available=("br", "gzip")) == expected
+
+
+def test_brotli_missing_falls_back_to_gzip(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br, gzip") == "gzip"
+    assert choose_encoding("br") is None
+
+
+def test_large_json_is_gzipped_with_vary_merged(client):
+    response = get(client, "/large", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY
+
+
+def test_brotli_preferred_when_accepted(client):
+    pytest.importorskip("brotli")
+    response = get(client, "/text", "gzip, br")
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.text == "hola " * 300
+
+
+def test_refused_encodings_are_not_used(client):
+    response = get(client, "/large", "gzip;q=0, identity")
+
+    assert "content-encoding" not in response.headers
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("path", ["/small", "/image", "/events"])
+def test_small_incompressible_and_event_streams_pass_through(client, path):
+    response = get(client, path, "gzip")
+
+    assert "content-encoding" not in response.headers
+    assert "accept-encoding" not in response.headers.get("vary", "").lower()
+
+
+def test_already_encoded_response_is_not_compressed_twice(client):
+    response = get(client, "/encoded", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BODY
+
+
+def test_streaming_response_is_compressed_chunk_by_chunk(client):
+    response = get(client, "/stream", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == BODY
@@ -0,0 +1,62 @@
+"""
+Tests that the contact admin endpoints require a login.
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pymongo")
+pytest.importorskip("jose")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import auth  # noqa: E402
+from routes import contact  # noqa: E402
+from services.search import contacts_index  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    created = datetime(2024, 1, 5, 10)
+    db = FakeDb(contacts=FakeCollection([{
+        "id": "c1", "name": "Ana Pérez", "email": "ana@example.com", "phone": "+56 9 1234 5678",
+        "subject": "Consulta diplomado", "message": "Quisiera información", "status": "pending",
+        "created_at": created, "updated_at": created
+    }]))
+    monkeypatch.setattr(contact, "get_db", lambda: db)
+    monkeypatch.setattr(contacts_index, "_loaded_at", None)
+    app = FastAPI()
+    app.include_router(contact.router, prefix="/api")
+    yield TestClient(app)
+    contacts_index.clear()
+
+
+def admin_headers():
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': 'admin'})}"}
+
+
+def test_search_requires_login(client):
+    assert client.get("/api/contact/search", params={"q": "diplomado"}).status_code == 403
+
+    response = client.get("/api/contact/search", params={"q": "diplomado"}, headers=admin_headers())
+    assert response.status_code == 200
+    assert [result["id"] for result in response.json()["results"]] == ["c1"]
+
+
+def test_archive_requires_login_and_caps_the_limit(client):
+    params = {"start": "2024-01-01", "end": "2024-01-31"}
+    assert client.get("/api/contact/archive", params=params).status_code == 403
+    assert client.get("/api/contact/archive", params={**params, "limit": 100000}, headers=admin_headers()).status_code == 422
+
+    response = client.get("/api/contact/archive", params=params, headers=admin_headers())
+    assert response.status_code == 200
+    assert response.json() == []
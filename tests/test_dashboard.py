@@ -0,0 +1,82 @@
+"""
+Tests for the admin dashboard stat deltas and stream tickets.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services.dashboard import stats_delta  # noqa: E402
+from services.events import EventBus  # noqa: E402
+
+
+def test_new_order_counts_as_pending():
+    event = {"type": "created", "order_id": "o1", "status": "pending", "amount": 100.0}
+    assert stats_delta(event) == {"total_orders": 1, "pending_orders": 1}
+
+
+def test_payment_moves_order_and_revenue():
+    event = {"type": "status", "order_id": "o1", "status": "paid", "previous": "pending", "amount": 540.0}
+    assert stats_delta(event) == {"paid_orders": 1, "pending_orders": -1, "total_revenue": 540.0}
+
+
+def test_leaving_paid_takes_revenue_back():
+    event = {"type": "status", "order_id": "o1", "status": "cancelled", "previous": "paid", "amount": 12.5}
+    assert stats_delta(event) == {"paid_orders": -1, "total_revenue": -12.5}
+
+
+def test_uncounted_transitions_and_contacts_change_nothing():
+    assert stats_delta({"type": "status", "order_id": "o1", "status": "completed", "previous": "cancelled"}) is None
+    assert stats_delta({"type": "created", "contact_id": "c1", "status": "pending"}) is None
+
+
+def test_one_queue_for_several_topics():
+    async def scenario():
+        bus = EventBus()
+        async with bus.subscribe("orders", "contacts") as queue:
+            await bus.publish("orders", {"order_id": "o1"})
+            await bus.publish("contacts", {"contact_id": "c1"})
+            received = [queue.get_nowait(), queue.get_nowait()]
+        return received, bus.subscriber_count("orders") + bus.subscriber_count("contacts")
+
+    received, remaining = asyncio.run(scenario())
+    assert received == [{"order_id": "o1"}, {"contact_id": "c1"}]
+    assert remaining == 0
+
+
+def test_stream_ticket_only_opens_streams():
+    pytest.importorskip("jose")
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+    from fastapi.security import HTTPAuthorizationCredentials
+
+    import auth
+
+    ticket = auth.create_stream_ticket("admin")
+    assert asyncio.run(auth.get_stream_user(ticket)) == "admin"
+
+    # A ticket is not an admin session, and a session token cannot open a stream
+    bearer = HTTPAuthorizationCredentials(scheme="Bearer", credentials=ticket)
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.get_current_user(bearer))
+    assert asyncio.run(auth.get_optional_user(bearer)) is None
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.get_stream_user(auth.create_access_token({"sub": "admin"})))
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.get_stream_user(None))
+
+
+def test_stream_ticket_expires(monkeypatch):
+    pytest.importorskip("jose")
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+
+    import auth
+
+    monkeypatch.setattr(auth, "STREAM_TICKET_SECONDS", -1)
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.get_stream_user(auth.create_stream_ticket("admin")))
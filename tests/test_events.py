@@ -0,0 +1,57 @@
+"""
+Tests for the event bus, with two workers sharing the in-process
+stand-in backend.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services.events import EventBus, sse_message  # noqa: E402
+from services.shared_cache import LocalBackend, SharedCache  # noqa: E402
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_events_reach_subscribers_on_every_worker():
+    async def scenario():
+        backend = LocalBackend()
+        here_cache, there_cache = SharedCache(backend, channel="test"), SharedCache(backend, channel="test")
+        here, there = EventBus(here_cache), EventBus(there_cache)
+        there_cache.start()
+        await settle()
+
+        async with here.subscribe("orders") as local, there.subscribe("orders") as remote:
+            await here.publish("orders", {"order_id": "o1", "status": "paid"})
+            await settle()
+            received = (local.get_nowait(), remote.get_nowait())
+
+        await there_cache.stop()
+        return received, there.subscriber_count("orders")
+
+    received, remaining = asyncio.run(scenario())
+    assert received == ({"order_id": "o1", "status": "paid"},) * 2
+    assert remaining == 0
+
+
+def test_slow_subscriber_keeps_latest_events(monkeypatch):
+    from services import events
+    monkeypatch.setattr(events, "EVENT_QUEUE_SIZE", 2)
+
+    async def scenario():
+        bus = EventBus()
+        async with bus.subscribe("orders") as queue:
+            for n in range(3):
+                await bus.publish("orders", {"n": n})
+            return [queue.get_nowait(), queue.get_nowait()]
+
+    assert asyncio.run(scenario()) == [{"n": 1}, {"n": 2}]
+
+
+def test_sse_message_format():
+    assert sse_message("status", '{"status": "paid"}') == 'event: status\ndata: {"status": "paid"}\n\n'
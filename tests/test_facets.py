@@ -0,0 +1,92 @@
+"""
+Tests for the catalog facet index: counts, price ranges and incremental updates.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services.facets import FacetIndex, facet_values, price_range  # noqa: E402
+
+
+def product(product_id, category="diplomados", price=300.0, **fields):
+    return {"id": product_id, "name": product_id, "category": category, "price": price, "is_active": True, **fields}
+
+
+def catalog():
+    index = FacetIndex()
+    index.upsert(product("d1", price=300.0, certificate=True, modules=6))
+    index.upsert(product("d2", price=1200.0, certificate=True, modules=10))
+    index.upsert(product("c1", category="cursos", price=120.0, certificate=False))
+    return index
+
+
+def test_price_range_edges():
+    assert price_range(0) == "0-250"
+    assert price_range(249.99) == "0-250"
+    assert price_range(250) == "250-500"
+    assert price_range(999.99) == "500-1000"
+    assert price_range(1000) == "1000-"
+    assert price_range(50000) == "1000-"
+    assert price_range(None) is None
+    assert price_range(-1) is None
+
+
+def test_facet_values_are_strings():
+    values = facet_values(product("d1", price=250.0, certificate=1, modules=0, duration="6 meses"))
+    assert values == {
+        "category": "diplomados", "price_range": "250-500", "duration": "6 meses",
+        "modules": "0", "certificate": "true"
+    }
+    assert facet_values({"id": "x"})["certificate"] is None
+
+
+def test_unfiltered_counts():
+    counts = catalog().counts({})
+    assert counts["category"] == [("diplomados", 2), ("cursos", 1)]
+    assert counts["price_range"] == [("0-250", 1), ("1000-", 1), ("250-500", 1)]
+    assert counts["certificate"] == [("true", 2), ("false", 1)]
+
+
+def test_each_facet_is_counted_against_the_other_filters():
+    counts = catalog().counts({"category": ["diplomados"], "price_range": ["1000-"]})
+    # The selected category still shows its alternatives within the price range
+    assert counts["category"] == [("diplomados", 1)]
+    assert counts["price_range"] == [("1000-", 1), ("250-500", 1)]
+    assert counts["modules"] == [("10", 1)]
+
+
+def test_range_filter_matches_its_bucket_only():
+    index = catalog()
+    index.upsert(product("d3", price=250.0))
+
+    total, products = index.browse({"price_range": ["250-500"]}, sort="price_asc")
+    assert total == 2
+    assert [p["id"] for p in products] == ["d3", "d1"]
+    total, _ = index.browse({"price_range": ["0-250", "1000-"]})
+    assert total == 2
+
+
+def test_upsert_moves_a_product_between_values():
+    index = catalog()
+    index.upsert(product("d1", category="cursos", price=90.0))
+
+    counts = index.counts({})
+    assert counts["category"] == [("cursos", 2), ("diplomados", 1)]
+    assert ("250-500", 1) not in counts["price_range"]
+    assert counts["modules"] == [("10", 1)]
+    assert len(index) == 3
+
+
+def test_remove_and_deactivate_drop_counts():
+    index = catalog()
+    index.remove("d2")
+    index.upsert(product("c1", category="cursos", is_active=False))
+    index.remove("missing")
+
+    counts = index.counts({})
+    assert counts["category"] == [("diplomados", 1)]
+    assert counts["price_range"] == [("250-500", 1)]
+    assert len(index) == 1
+
@@ -0,0 +1,159 @@
+"""
+Tests for Idempotency-Key handling: replays, payload mismatches and claims.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pymongo")
+
+from fastapi import HTTPException  # noqa: E402
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+from services.idempotency import run_idempotent  # noqa: E402
+from tests.fake_mongo import FakeCollection  # noqa: E402
+
+
+def keys():
+    return FakeCollection(unique=("key",))
+
+
+def counting(response):
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return response
+
+    return func, calls
+
+
+def test_without_key_always_runs():
+    func, calls = counting({"ok": True})
+    collection = keys()
+
+    async def scenario():
+        await run_idempotent(collection, None, "checkout", {}, func)
+        await run_idempotent(collection, None, "checkout", {}, func)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert collection.docs == []
+
+
+def test_repeated_request_is_replayed():
+    func, calls = counting({"client_secret": "pi_1_secret"})
+    collection = keys()
+    payload = {"items": [{"product_id": "p1", "quantity": 1}]}
+
+    async def scenario():
+        first = await run_idempotent(collection, "k1", "checkout", payload, func)
+        second = await run_idempotent(collection, "k1", "checkout", payload, func)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == ({"client_secret": "pi_1_secret"}, False)
+    assert second == ({"client_secret": "pi_1_secret"}, True)
+    assert len(calls) == 1
+
+
+def test_same_key_with_another_payload_is_rejected():
+    func, _ = counting({"client_secret": "pi_1_secret"})
+    collection = keys()
+
+    async def scenario():
+        await run_idempotent(collection, "k1", "checkout", {"items": ["p1"]}, func)
+        await run_idempotent(collection, "k1", "checkout", {"items": ["p2"]}, func)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(scenario())
+    assert exc.value.status_code == 422
+
+
+def test_concurrent_duplicate_waits_for_the_first_call():
+    func, calls = counting({"client_secret": "pi_1_secret"})
+    collection = keys()
+
+    async def scenario():
+        return await asyncio.gather(
+            run_idempotent(collection, "k1", "checkout", {"items": ["p1"]}, func),
+            run_idempotent(collection, "k1", "checkout", {"items": ["p1"]}, func)
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first == ({"client_secret": "pi_1_secret"}, False)
+    assert second == ({"client_secret": "pi_1_secret"}, True)
+    assert len(calls) == 1
+
+
+def test_concurrent_duplicate_with_another_payload_is_rejected():
+    func, calls = counting({"client_secret": "pi_1_secret"})
+    collection = keys()
+
+    async def scenario():
+        return await asyncio.gather(
+            run_idempotent(collection, "k1", "checkout", {"items": ["p1"]}, func),
+            run_idempotent(collection, "k1", "checkout", {"items": ["p2"]}, func),
+            return_exceptions=True
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first == ({"client_secret": "pi_1_secret"}, False)
+    assert isinstance(second, HTTPException) and second.status_code == 422
+    assert len(calls) == 1
+
+
+def test_failed_request_releases_the_key_for_a_retry():
+    collection = keys()
+
+    async def failing():
+        raise RuntimeError("stripe unavailable")
+
+    func, calls = counting({"client_secret": "pi_2_secret"})
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await run_idempotent(collection, "k1", "checkout", {"items": ["p1"]}, failing)
+        return await run_idempotent(collection, "k1", "checkout", {"items": ["p1"]}, func)
+
+    assert asyncio.run(scenario()) == ({"client_secret": "pi_2_secret"}, False)
+    assert len(calls) == 1
+
+
+def test_claim_is_retried_when_the_holder_gave_it_up():
+    # Another process held the key at insert time, then failed and deleted its claim
+    collection = keys()
+    collection.fail_next["insert_one"] = DuplicateKeyError("E11000 duplicate key error")
+    func, calls = counting({"client_secret": "pi_3_secret"})
+
+    result = asyncio.run(run_idempotent(collection, "k1", "checkout", {"items": ["p1"]}, func))
+
+    assert result == ({"client_secret": "pi_3_secret"}, False)
+    assert len(calls) == 1
+    assert collection.docs[0]["status"] == "completed"
+
+
+def test_response_that_is_not_final_is_not_stored():
+    collection = keys()
+    responses = iter([{"success": False}, {"success": True}])
+    calls = []
+
+    async def func():
+        calls.append(1)
+        return next(responses)
+
+    async def scenario():
+        first = await run_idempotent(collection, "k1", "confirm", {}, func, is_final=lambda r: r["success"])
+        second = await run_idempotent(collection, "k1", "confirm", {}, func, is_final=lambda r: r["success"])
+        third = await run_idempotent(collection, "k1", "confirm", {}, func, is_final=lambda r: r["success"])
+        return first, second, third
+
+    assert asyncio.run(scenario()) == (({"success": False}, False), ({"success": True}, False), ({"success": True}, True))
+    assert len(calls) == 2
@@ -0,0 +1,61 @@
+"""
+Import-time regression test for the app module.
+
+Runs ``python -X importtime -c "import server"`` in a fresh interpreter,
+prints the slowest imports and checks that the heavy dependencies are
+left for first use or the startup warm-up.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Loaded lazily: on first use or by services.warmup after startup
+LAZY_MODULES = ("stripe", "PIL", "jose", "passlib", "bcrypt", "motor", "requests")
+REPORT_TOP = 15
+
+
+def parse_importtime(stderr: str):
+    """(module, self_us, cumulative_us) for every line of an importtime report"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def test_parse_importtime():
+    report = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:      2500 |       4100 | fastapi\n"
+    )
+    assert parse_importtime(report) == [("_io", 120, 120), ("fastapi", 2500, 4100)]
+
+
+def test_server_import_leaves_heavy_dependencies_lazy():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("pymongo")
+
+    env = dict(os.environ, MONGO_URL="mongodb://localhost:27017", DB_NAME="importtime_test")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    entries = parse_importtime(result.stderr)
+    print("\nSlowest imports of `import server` (cumulative us):")
+    for name, _, cumulative_us in sorted(entries, key=lambda e: e[2], reverse=True)[:REPORT_TOP]:
+        print(f"{cumulative_us:>10}  {name}")
+
+    top_level = {name.split(".")[0] for name, _, _ in entries}
+    eager = sorted(top_level.intersection(LAZY_MODULES))
+    assert not eager, f"imported at app import time: {eager}"
@@ -0,0 +1,199 @@
+"""
+Tests for the outbox SMTP sender, against a local SMTP sink.
+"""
+
+import asyncio
+import socketserver
+import sys
+import threading
+from email import message_from_bytes
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services.mailer import Mailer, SmtpPool, backoff_delay, MAIL_BACKOFF_SECONDS  # noqa: E402
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server that accepts everything and keeps the messages"""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server
+        sink.connections += 1
+        self.reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 sink")
+            elif command.startswith("RCPT") and "REJECT" in command:
+                self.reply("550 no such user")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 ok")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                data = b""
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk == b".\r\n":
+                        break
+                    data += chunk
+                sink.messages.append(message_from_bytes(data))
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpSinkHandler)
+        self.messages = []
+        self.connections = 0
+
+
+@pytest.fixture
+def sink():
+    server = SmtpSink()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_mail(n: int, to: str = "cliente@example.com") -> dict:
+    return {"id": f"mail-{n}", "to": to, "subject": f"Orden {n}", "body": f"Detalle {n}"}
+
+
+def test_batch_is_sent_over_one_connection(sink):
+    pool = SmtpPool(host="127.0.0.1", port=sink.server_address[1], user="", password="", starttls=False)
+    errors = pool.send_batch([make_mail(n) for n in range(3)])
+    pool.close()
+
+    assert errors == [None, None, None]
+    assert sink.connections == 1
+    assert [m["Subject"] for m in sink.messages] == ["Orden 0", "Orden 1", "Orden 2"]
+    assert sink.messages[0]["To"] == "cliente@example.com"
+    assert sink.messages[0].get_payload().strip() == "Detalle 0"
+
+
+def test_connection_is_reused_between_batches(sink):
+    pool = SmtpPool(host="127.0.0.1", port=sink.server_address[1], user="", password="", starttls=False)
+    pool.send_batch([make_mail(1)])
+    pool.send_batch([make_mail(2)])
+    pool.close()
+
+    assert sink.connections == 1
+    assert len(sink.messages) == 2
+
+
+def test_rejected_recipient_fails_only_that_mail(sink):
+    pool = SmtpPool(host="127.0.0.1", port=sink.server_address[1], user="", password="", starttls=False)
+    errors = pool.send_batch([make_mail(1), make_mail(2, to="reject@example.com"), make_mail(3)])
+    pool.close()
+
+    assert errors[0] is None and errors[2] is None
+    assert errors[1]
+    assert [m["Subject"] for m in sink.messages] == ["Orden 1", "Orden 3"]
+
+
+def test_malformed_mail_fails_alone(sink):
+    pool = SmtpPool(host="127.0.0.1", port=sink.server_address[1], user="", password="", starttls=False)
+    poisoned = {**make_mail(2), "subject": "Nueva consulta: hola\nBcc: someone@example.com"}
+    errors = pool.send_batch([make_mail(1), poisoned, make_mail(3)])
+    pool.close()
+
+    assert errors[0] is None and errors[2] is None
+    assert errors[1].startswith("Invalid message")
+    assert [m["Subject"] for m in sink.messages] == ["Orden 1", "Orden 3"]
+    assert sink.connections == 1
+
+
+class FakeOutbox:
+    """Hands out the queued mails once and records the outcome updates"""
+
+    def __init__(self, mails):
+        self.queued = list(mails)
+        self.updates = {}
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None):
+        return self.queued.pop(0) if self.queued else None
+
+    async def update_one(self, query, update):
+        self.updates[query["id"]] = update["$set"]
+
+
+def test_poisoned_batch_records_every_outcome(sink):
+    outbox = FakeOutbox([
+        {**make_mail(1), "kind": "order_paid", "attempts": 0},
+        {**make_mail(2), "subject": "Asunto\r\ncon salto", "kind": "contact_received", "attempts": 0},
+        {**make_mail(3), "kind": "order_paid", "attempts": 2},
+    ])
+    mailer = Mailer(type("Db", (), {"email_outbox": outbox})(), workers=1)
+    pool = SmtpPool(host="127.0.0.1", port=sink.server_address[1], user="", password="", starttls=False)
+
+    assert asyncio.run(mailer.drain_once(pool)) == 3
+    pool.close()
+
+    assert outbox.updates["mail-1"]["status"] == "sent"
+    assert outbox.updates["mail-3"]["status"] == "sent"
+    assert outbox.updates["mail-3"]["attempts"] == 3
+    # A message that cannot be built fails on its first attempt instead of being retried
+    assert outbox.updates["mail-2"]["status"] == "failed"
+    assert outbox.updates["mail-2"]["attempts"] == 1
+    assert "Invalid message" in outbox.updates["mail-2"]["last_error"]
+
+
+def test_idle_connection_is_closed_without_further_sends(sink):
+    pool = SmtpPool(host="127.0.0.1", port=sink.server_address[1], user="", password="", starttls=False,
+                    idle_seconds=60)
+    pool.send_batch([make_mail(1)])
+
+    pool.close_if_idle()
+    assert pool._smtp is not None
+
+    pool._last_used -= 61
+    pool.close_if_idle()
+    assert pool._smtp is None
+
+
+def test_contact_subject_is_kept_on_one_line():
+    pytest.importorskip("pydantic")
+    pytest.importorskip("email_validator")
+    from models.contact import ContactSubmissionCreate
+
+    submission = ContactSubmissionCreate(
+        name="Ana", email="ana@example.com", subject=" Consulta\r\nBcc: x@example.com ",
+        message="Necesito información sobre los cursos."
+    )
+    assert submission.subject == "Consulta Bcc: x@example.com"
+
+
+def test_unreachable_server_reports_every_mail():
+    probe = SmtpSink()
+    port = probe.server_address[1]
+    probe.server_close()  # nothing listens on this port any more
+
+    pool = SmtpPool(host="127.0.0.1", port=port, user="", password="", starttls=False)
+    errors = pool.send_batch([make_mail(1), make_mail(2)])
+
+    assert all(errors)
+
+
+def test_backoff_doubles_per_attempt():
+    assert [backoff_delay(n) for n in (1, 2, 3)] == [
+        MAIL_BACKOFF_SECONDS, MAIL_BACKOFF_SECONDS * 2, MAIL_BACKOFF_SECONDS * 4
+    ]
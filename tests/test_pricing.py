@@ -0,0 +1,85 @@
+"""
+Tests for currency conversion, tax and discounts in quotes.
+"""
+
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException  # noqa: E402
+
+from models.order import OrderItem  # noqa: E402
+from services import pricing  # noqa: E402
+from services.pricing import fx_rates, localize_price, quote, resolve_currency, to_minor  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def rates(monkeypatch):
+    monkeypatch.setattr(pricing, "PRICING_BASE_CURRENCY", "USD")
+    monkeypatch.setitem(pricing.TAX_RATES, "CL", Decimal("0.19"))
+    previous = fx_rates.rates
+    fx_rates.load({"rates": {"CLP": 950.5, "EUR": 0.9}})
+    yield
+    fx_rates.rates = previous
+
+
+def line(price, quantity=1, product_id="p1"):
+    return OrderItem(product_id=product_id, product_name="Diplomado", price=price, quantity=quantity)
+
+
+def test_minor_units_round_half_up_per_currency():
+    assert to_minor(Decimal("10.005"), "USD") == 1001
+    assert to_minor(Decimal("10.004"), "USD") == 1000
+    assert to_minor(Decimal("1234.5"), "CLP") == 1235
+
+
+def test_base_currency_quote_without_tax():
+    priced = quote([line(19.99, 3), line(5.005)], "USD")
+
+    assert priced.subtotal_minor == 5997 + 501
+    assert priced.tax_minor == 0
+    assert priced.total == 64.98
+    assert priced.fx_rate == Decimal(1)
+
+
+def test_lines_are_rounded_before_multiplying():
+    # 540 USD at 950.5 is 513270 CLP; each unit is rounded before the quantity applies
+    priced = quote([line(540, 2), line(0.33, 3)], "CLP")
+
+    assert [item.price for item in priced.items] == [513270.0, 314.0]
+    assert priced.subtotal_minor == 513270 * 2 + 314 * 3
+    assert priced.total_minor == priced.subtotal_minor
+
+
+def test_discount_is_taken_off_before_tax():
+    priced = quote([line(100, 2)], "USD", region="cl", discount=Decimal("50"))
+
+    assert (priced.subtotal, priced.discount) == (200.0, 50.0)
+    assert priced.tax == 28.5  # 19% of 150
+    assert priced.total == 178.5
+
+
+def test_discount_never_exceeds_the_subtotal():
+    priced = quote([line(10)], "EUR", discount=Decimal("25"))
+
+    assert priced.discount_minor == priced.subtotal_minor == 900
+    assert priced.total_minor == 0
+
+
+def test_localized_catalog_price():
+    assert localize_price(540, "USD", "EUR") == 486.0
+    assert localize_price(486, "EUR", "CLP") == 513270.0
+
+
+def test_unknown_currency_is_rejected():
+    assert resolve_currency(None) == "USD"
+    assert resolve_currency("clp") == "CLP"
+    with pytest.raises(HTTPException) as exc:
+        resolve_currency("JPY")
+    assert exc.value.status_code == 400
@@ -0,0 +1,64 @@
+"""
+Tests for bulk product upserts keyed by slug.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("pydantic")
+pytest.importorskip("pymongo")
+
+from pymongo.errors import BulkWriteError  # noqa: E402
+
+from services.product_import import bulk_upsert_products  # noqa: E402
+from tests.fake_mongo import FakeCollection  # noqa: E402
+
+
+def row(slug, **fields):
+    return {"name": f"Diplomado {slug}", "slug": slug, "description": "Descripción del programa", "price": 540, **fields}
+
+
+def products():
+    return FakeCollection(
+        [{"id": "p1", "slug": "existing", "name": "Diplomado existente", "price": 100, "version": 2}],
+        unique=("id", "slug")
+    )
+
+
+def test_rows_are_created_or_updated_by_slug():
+    collection = products()
+    summary, ids = asyncio.run(bulk_upsert_products(collection, [row("existing", price=120), row("new")]))
+
+    assert (summary["created"], summary["updated"], summary["errors"]) == (1, 1, 0)
+    assert ids[0] == "p1"
+    by_slug = {doc["slug"]: doc for doc in collection.docs}
+    assert by_slug["existing"]["price"] == 120 and by_slug["existing"]["version"] == 3
+    assert by_slug["new"]["id"] == ids[1] and by_slug["new"]["is_active"] is True
+
+
+def test_invalid_and_repeated_rows_are_reported_per_row():
+    collection = products()
+    summary, ids = asyncio.run(bulk_upsert_products(collection, [row("a"), row("a"), {"slug": "b"}]))
+
+    assert [r["action"] for r in summary["results"]] == ["created", "error", "error"]
+    assert len(ids) == 1
+
+
+def test_slug_created_concurrently_fails_only_that_row():
+    collection = products()
+    # The unique slug index rejects the first upsert: another import created it in between
+    collection.fail_next["bulk_write"] = BulkWriteError({
+        "writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000 duplicate key error"}]
+    })
+    summary, ids = asyncio.run(bulk_upsert_products(collection, [row("racing"), row("existing")]))
+
+    assert summary["errors"] == 1
+    assert summary["results"][0]["action"] == "error"
+    assert "slug" in summary["results"][0]["error"]
+    assert summary["results"][1]["action"] == "updated"
+    assert ids == ["p1"]
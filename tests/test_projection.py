@@ -0,0 +1,53 @@
+"""
+Tests for translating ``fields=`` into Mongo projections.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("pydantic")
+
+from models.contact import ContactSubmission, ContactSubmissionSummary  # noqa: E402
+from services.projection import build_projection  # noqa: E402
+
+
+def project(fields):
+    return build_projection(fields, ContactSubmission, ContactSubmissionSummary)
+
+
+def test_no_fields_selects_the_summary():
+    assert project(None) == {"_id": 0, "id": 1, **{name: 1 for name in ContactSubmissionSummary.model_fields}}
+
+
+@pytest.mark.parametrize("fields", ["*", "all", " * "])
+def test_all_selects_the_full_document(fields):
+    assert project(fields) == {"_id": 0}
+
+
+def test_requested_fields_always_include_the_id():
+    assert project("email, status") == {"_id": 0, "id": 1, "email": 1, "status": 1}
+    assert project("id") == {"_id": 0, "id": 1}
+
+
+@pytest.mark.parametrize("fields", ["", " ", ",", " , "])
+def test_empty_value_selects_only_the_id(fields):
+    assert project(fields) == {"_id": 0, "id": 1}
+
+
+def test_dotted_path_under_a_model_field_is_allowed():
+    assert project("created_at.year") == {"_id": 0, "id": 1, "created_at.year": 1}
+
+
+def test_unknown_fields_are_named():
+    with pytest.raises(ValueError) as exc:
+        project("email,password,secret.value")
+    assert str(exc.value) == "password, secret.value"
+
+
+def test_star_mixed_with_fields_is_not_all():
+    with pytest.raises(ValueError):
+        project("*,email")
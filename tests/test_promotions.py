@@ -0,0 +1,129 @@
+"""
+Tests for promotion rules, cart evaluation and promotion validation.
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException  # noqa: E402
+from pydantic import ValidationError  # noqa: E402
+
+from models.order import OrderItem  # noqa: E402
+from models.promotion import Promotion, PromotionCreate  # noqa: E402
+from services.promotions import PromotionIndex, Rule  # noqa: E402
+from tests.fake_mongo import FakeCollection  # noqa: E402
+
+
+def line(product_id, price, quantity=1, category="Diplomado"):
+    return OrderItem(product_id=product_id, product_name=product_id, price=price, quantity=quantity, category=category)
+
+
+def promotion(promotion_id, kind, value, **fields):
+    return {"id": promotion_id, "name": f"Promo {promotion_id}", "kind": kind, "value": value, **fields}
+
+
+CART = [line("p1", 100, 2), line("p2", 50, 1, category="Curso")]
+
+
+def test_percentage_applies_to_eligible_lines_only():
+    rule = Rule.compile(promotion("r1", "percentage", 10, category="Diplomado"))
+    assert rule.discount(CART, Decimal(250)) == Decimal(20)
+
+
+def test_fixed_is_capped_at_the_eligible_amount():
+    rule = Rule.compile(promotion("r1", "fixed", 80, product_ids=["p2"]))
+    assert rule.discount(CART, Decimal(250)) == Decimal(50)
+
+
+def test_bundle_discounts_complete_groups_cheapest_first():
+    rule = Rule.compile(promotion("r1", "bundle", 50, min_quantity=2))
+    # 3 units, one group of 2: the 50 and one 100 are discounted by half
+    assert rule.discount(CART, Decimal(250)) == Decimal(75)
+
+
+def test_minimums_must_be_met():
+    assert Rule.compile(promotion("r1", "percentage", 10, min_subtotal=300)).discount(CART, Decimal(250)) == 0
+    assert Rule.compile(promotion("r2", "percentage", 10, min_quantity=4)).discount(CART, Decimal(250)) == 0
+
+
+def test_best_automatic_promotion_plus_coupon():
+    index = PromotionIndex()
+    index.upsert(promotion("auto-small", "percentage", 5))
+    index.upsert(promotion("auto-big", "fixed", 30, category="Diplomado"))
+    index.upsert(promotion("coupon", "percentage", 10, code="perito10"))
+
+    evaluation = index.evaluate(CART, code=" Perito10 ")
+
+    assert evaluation.promotion_ids == ["auto-big", "coupon"]
+    assert evaluation.discount == Decimal(30) + Decimal(25)
+
+
+def test_discount_never_exceeds_the_subtotal():
+    index = PromotionIndex()
+    index.upsert(promotion("auto", "fixed", 200))
+    index.upsert(promotion("coupon", "fixed", 200, code="ALL"))
+
+    assert index.evaluate(CART, code="ALL").discount == Decimal(250)
+
+
+def test_inactive_and_expired_coupons_are_rejected():
+    index = PromotionIndex()
+    index.upsert(promotion("off", "percentage", 10, code="OFF", is_active=False))
+    index.upsert(promotion("old", "percentage", 10, code="OLD", ends_at=datetime.utcnow() - timedelta(days=1)))
+    index.upsert(promotion("other", "percentage", 10, code="OTHER", product_ids=["p9"]))
+
+    for code, message in (("OFF", "inválido"), ("OLD", "inválido"), ("OTHER", "no aplica")):
+        with pytest.raises(HTTPException) as exc:
+            index.evaluate(CART, code=code)
+        assert exc.value.status_code == 400 and message in exc.value.detail
+
+
+def test_excluded_automatic_promotion_falls_back_to_the_next_best():
+    index = PromotionIndex()
+    index.upsert(promotion("big", "percentage", 20))
+    index.upsert(promotion("small", "percentage", 10))
+
+    assert index.evaluate(CART, exclude=frozenset({"big"})).promotion_ids == ["small"]
+
+
+@pytest.mark.parametrize("kind", ["percentage", "bundle"])
+def test_percent_kinds_cannot_exceed_100(kind):
+    with pytest.raises(ValidationError):
+        PromotionCreate(name="Todo gratis", kind=kind, value=150)
+    with pytest.raises(ValidationError):
+        Promotion(name="Todo gratis", kind=kind, value=100.5)
+    assert PromotionCreate(name="Todo gratis", kind=kind, value=100).value == 100
+
+
+def test_fixed_amounts_may_exceed_100():
+    assert PromotionCreate(name="Beca", kind="fixed", value=250).value == 250
+
+
+def test_deleted_promotion_from_another_worker_is_only_evicted_locally(monkeypatch):
+    pytest.importorskip("jose")
+    from routes import admin_promotions
+
+    broadcasts = []
+
+    async def invalidate(topic, ids=None):
+        broadcasts.append((topic, ids))
+
+    index = PromotionIndex()
+    index.upsert(promotion("gone", "percentage", 10))
+    monkeypatch.setattr(admin_promotions, "promotions_index", index)
+    monkeypatch.setattr(admin_promotions, "get_promotions_collection", lambda: FakeCollection())
+    monkeypatch.setattr(admin_promotions.shared_cache, "invalidate", invalidate)
+
+    asyncio.run(admin_promotions.refresh_promotions(["gone"]))
+
+    assert len(index) == 0
+    assert broadcasts == []  # re-publishing would bounce between the workers forever
@@ -0,0 +1,101 @@
+"""
+Tests for stock holds: taking, releasing and rolling back reservations.
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pymongo")
+
+from fastapi import HTTPException  # noqa: E402
+
+from services import reservations  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+
+def make_db():
+    return FakeDb(products=FakeCollection([
+        {"id": "limited", "name": "Taller", "stock": 3},
+        {"id": "scarce", "name": "Diplomado", "stock": 1},
+        {"id": "open", "name": "Curso online", "stock": None},
+    ]))
+
+
+def item(product_id, quantity=1):
+    return SimpleNamespace(product_id=product_id, product_name=product_id, quantity=quantity)
+
+
+def stock(db, product_id):
+    return next(p["stock"] for p in db.products.docs if p["id"] == product_id)
+
+
+def test_hold_takes_limited_stock_only():
+    db = make_db()
+    holds = asyncio.run(reservations.hold_stock(db, "o1", [item("limited", 2), item("open", 5)]))
+
+    assert [(h["product_id"], h["quantity"], h["status"]) for h in holds] == [("limited", 2, "held")]
+    assert stock(db, "limited") == 1
+    assert stock(db, "open") is None
+    assert len(db.stock_holds.docs) == 1
+
+
+def test_insufficient_stock_rolls_back_earlier_holds():
+    db = make_db()
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(reservations.hold_stock(db, "o1", [item("limited", 2), item("scarce", 2)]))
+
+    assert exc.value.status_code == 400
+    assert stock(db, "limited") == 3
+    assert stock(db, "scarce") == 1
+    assert db.stock_holds.docs == []
+
+
+def test_failed_hold_insert_gives_the_stock_back():
+    db = make_db()
+    db.stock_holds.fail_next["insert_many"] = ConnectionError("database unavailable")
+    with pytest.raises(ConnectionError):
+        asyncio.run(reservations.hold_stock(db, "o1", [item("limited", 2), item("scarce")]))
+
+    assert stock(db, "limited") == 3
+    assert stock(db, "scarce") == 1
+    assert db.stock_holds.docs == []
+
+
+def test_release_is_idempotent():
+    db = make_db()
+    asyncio.run(reservations.hold_stock(db, "o1", [item("limited", 2)]))
+
+    assert asyncio.run(reservations.release_holds(db, "o1")) == 1
+    assert asyncio.run(reservations.release_holds(db, "o1")) == 0
+    assert stock(db, "limited") == 3
+    assert db.stock_holds.docs[0]["status"] == "released"
+
+
+def test_sweep_releases_only_expired_holds():
+    db = make_db()
+    asyncio.run(reservations.hold_stock(db, "o1", [item("limited", 1)]))
+    asyncio.run(reservations.hold_stock(db, "o2", [item("limited", 1)]))
+    db.stock_holds.docs[0]["expires_at"] = datetime.utcnow() - timedelta(minutes=1)
+
+    assert asyncio.run(reservations.sweep_expired_holds(db)) == {"expired": 1, "released": 1}
+    assert stock(db, "limited") == 2
+    assert [h["status"] for h in db.stock_holds.docs] == ["released", "held"]
+
+
+def test_convert_retakes_seats_released_before_payment():
+    db = make_db()
+    asyncio.run(reservations.hold_stock(db, "o1", [item("scarce")]))
+    asyncio.run(reservations.release_holds(db, "o1"))
+
+    asyncio.run(reservations.convert_holds(db, {"id": "o1", "stock_holds": 1}))
+
+    assert db.stock_holds.docs[0]["status"] == "converted"
+    assert stock(db, "scarce") == 0
@@ -0,0 +1,136 @@
+"""
+Tests for the scheduler's leader lease and the pending-order reconciler.
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("pymongo")
+
+from services import scheduler  # noqa: E402
+from services.scheduler import LOCK_ID, Scheduler  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+
+def make_db():
+    return FakeDb(scheduler_locks=FakeCollection(unique=("_id",)))
+
+
+def test_lease_is_held_by_one_node_until_it_expires():
+    db = make_db()
+    first, second = Scheduler(db), Scheduler(db)
+
+    assert asyncio.run(first._acquire_lease()) is True
+    assert asyncio.run(second._acquire_lease()) is False
+    assert db.scheduler_locks.docs[0]["owner"] == first.node_id
+
+    db.scheduler_locks.docs[0]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+    assert asyncio.run(second._acquire_lease()) is True
+    assert asyncio.run(first._acquire_lease()) is False
+    assert db.scheduler_locks.docs[0]["owner"] == second.node_id
+
+
+def test_owner_renews_its_lease():
+    db = make_db()
+    node = Scheduler(db)
+    asyncio.run(node._acquire_lease())
+    db.scheduler_locks.docs[0]["expires_at"] = datetime.utcnow() + timedelta(seconds=1)
+
+    assert asyncio.run(node._acquire_lease()) is True
+    assert db.scheduler_locks.docs[0]["expires_at"] > datetime.utcnow() + timedelta(seconds=5)
+    assert len(db.scheduler_locks.docs) == 1
+
+
+def test_only_the_leader_runs_jobs(monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_TICK_SECONDS", 0.01)
+    db = make_db()
+    runs = []
+    nodes = [Scheduler(db), Scheduler(db)]
+    for node in nodes:
+        node.add_job("sweep", 3600, lambda db, node=node: asyncio.sleep(0, runs.append(node.node_id)))
+
+    async def scenario():
+        for node in nodes:
+            node.start()
+        await asyncio.sleep(0.05)
+        for node in nodes:
+            await node.stop()
+
+    asyncio.run(scenario())
+
+    assert len(runs) == 1
+    assert [node.is_leader for node in nodes].count(True) == 1
+    assert db.job_runs.docs[0]["job"] == "sweep" and db.job_runs.docs[0]["error"] is None
+    # The leader gave the lease up on shutdown
+    assert db.scheduler_locks.docs == []
+
+
+def test_failed_job_is_recorded():
+    db = make_db()
+    node = Scheduler(db)
+
+    async def failing(db):
+        raise RuntimeError("stripe unavailable")
+
+    node.add_job("reconcile", 60, failing)
+    run = asyncio.run(node.run_job(node.jobs["reconcile"]))
+
+    assert run["error"] == "stripe unavailable"
+    assert db.job_runs.docs[0]["error"] == "stripe unavailable"
+
+
+class FakeStripe:
+    def __init__(self, intents):
+        self.intents = intents
+        self.cancelled = []
+        self.PaymentIntent = SimpleNamespace(retrieve=self.retrieve, cancel=self.cancel)
+
+    def retrieve(self, intent_id):
+        return SimpleNamespace(id=intent_id, status=self.intents[intent_id])
+
+    def cancel(self, intent_id):
+        self.cancelled.append(intent_id)
+        self.intents[intent_id] = "canceled"
+
+
+def test_reconcile_outcomes(monkeypatch):
+    pytest.importorskip("fastapi")
+    from services import orders
+
+    stripe = FakeStripe({
+        "pi_paid": "succeeded", "pi_dead": "canceled", "pi_moving": "processing",
+        "pi_abandoned": "requires_payment_method", "pi_young": "requires_payment_method"
+    })
+    monkeypatch.setattr(orders, "get_stripe", lambda: stripe)
+    now = datetime.utcnow()
+    hour_ago, days_ago = now - timedelta(hours=1), now - timedelta(days=2)
+
+    def order(order_id, intent_id, created_at):
+        return {
+            "id": order_id, "status": "pending", "payment_intent_id": intent_id, "created_at": created_at,
+            "customer_name": "Ana", "customer_email": "ana@example.com", "items": [], "total": 10.0
+        }
+
+    db = FakeDb(orders=FakeCollection([
+        order("paid", "pi_paid", hour_ago),
+        order("dead", "pi_dead", hour_ago),
+        order("moving", "pi_moving", days_ago),
+        order("abandoned", "pi_abandoned", days_ago),
+        order("young", "pi_young", now),
+    ]))
+
+    counts = asyncio.run(orders.reconcile_pending_orders(db))
+
+    assert counts == {"checked": 4, "paid": 1, "cancelled": 2, "errors": 0}
+    assert {o["id"]: o["status"] for o in db.orders.docs} == {
+        "paid": "paid", "dead": "cancelled", "moving": "pending", "abandoned": "cancelled", "young": "pending"
+    }
+    # Only the abandoned intent is cancelled; the processing one is left to finish
+    assert stripe.cancelled == ["pi_abandoned"]
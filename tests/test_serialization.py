@@ -0,0 +1,72 @@
+"""
+Tests for response encoding: Accept negotiation, fallbacks and datetimes.
+"""
+
+import json
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+
+from starlette.requests import Request  # noqa: E402
+
+from services import serialization  # noqa: E402
+from services.serialization import dumps_json, encoded_response  # noqa: E402
+
+DOC = {"id": "c1", "created_at": datetime(2025, 3, 6, 10, 30), "day": date(2025, 3, 6), "total": Decimal("12.50")}
+ENCODED = {"id": "c1", "created_at": "2025-03-06T10:30:00", "day": "2025-03-06", "total": 12.5}
+
+
+def request(accept=None):
+    headers = [(b"accept", accept.encode())] if accept is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def decode(response):
+    if response.media_type in serialization.MSGPACK_MEDIA_TYPES:
+        return serialization.msgpack.unpackb(response.body)
+    return json.loads(response.body)
+
+
+@pytest.mark.parametrize("accept", [None, "", "*/*", "application/json", "text/html,application/xhtml+xml"])
+def test_json_unless_msgpack_is_asked_for(accept):
+    response = encoded_response(request(accept), DOC)
+
+    assert response.media_type == "application/json"
+    assert response.headers["Vary"] == "Accept"
+    assert decode(response) == ENCODED
+
+
+@pytest.mark.parametrize("accept", [
+    "application/msgpack", "application/x-msgpack", "application/json;q=0.5, application/msgpack"
+])
+def test_msgpack_when_asked_for(accept):
+    pytest.importorskip("msgpack")
+    response = encoded_response(request(accept), DOC, status_code=201)
+
+    assert response.media_type == "application/msgpack"
+    assert response.status_code == 201
+    assert response.headers["Vary"] == "Accept"
+    assert decode(response) == ENCODED
+
+
+def test_json_when_msgpack_is_not_installed(monkeypatch):
+    monkeypatch.setattr(serialization, "msgpack", None)
+    response = encoded_response(request("application/msgpack"), DOC)
+
+    assert response.media_type == "application/json"
+    assert decode(response) == ENCODED
+
+
+def test_json_without_orjson_encodes_the_same(monkeypatch):
+    fast = dumps_json([DOC, {"tags": {"a"}}])
+    monkeypatch.setattr(serialization, "orjson", None)
+    plain = dumps_json([DOC, {"tags": {"a"}}])
+
+    assert json.loads(fast) == json.loads(plain) == [ENCODED, {"tags": ["a"]}]
@@ -0,0 +1,82 @@
+"""
+Tests for cross-worker invalidation, with two workers sharing the
+in-process stand-in backend.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services.shared_cache import LocalBackend, SharedCache  # noqa: E402
+
+
+def make_worker(backend, received):
+    worker = SharedCache(backend, channel="test")
+
+    @worker.subscribe("products")
+    async def on_products(ids):
+        received.append(ids)
+
+    return worker
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_invalidation_reaches_other_workers_only():
+    async def scenario():
+        backend = LocalBackend()
+        sender_received, other_received = [], []
+        sender = make_worker(backend, sender_received)
+        other = make_worker(backend, other_received)
+        sender.start()
+        other.start()
+        await settle()
+
+        await sender.invalidate("products", ["p1", "p2"])
+        await sender.invalidate("landing")
+        await settle()
+
+        await sender.stop()
+        await other.stop()
+        return sender_received, other_received
+
+    sender_received, other_received = asyncio.run(scenario())
+    assert sender_received == []
+    assert other_received == [["p1", "p2"]]
+
+
+def test_failing_handler_does_not_stop_listener():
+    async def scenario():
+        backend = LocalBackend()
+        received = []
+        sender = SharedCache(backend, channel="test")
+        other = make_worker(backend, received)
+
+        @other.subscribe("products")
+        async def broken(ids):
+            raise RuntimeError("boom")
+
+        other.start()
+        await settle()
+        await sender.invalidate("products", ["p1"])
+        await sender.invalidate("products", ["p2"])
+        await settle()
+        await other.stop()
+        return received
+
+    assert asyncio.run(scenario()) == [["p1"], ["p2"]]
+
+
+def test_local_backend_values_expire():
+    async def scenario():
+        backend = LocalBackend()
+        await backend.set_many({"a": b"1"}, ttl=60)
+        await backend.set_many({"b": b"2"}, ttl=0)
+        return await backend.get_many(["a", "b", "c"])
+
+    assert asyncio.run(scenario()) == [b"1", None, None]
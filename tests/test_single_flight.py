@@ -0,0 +1,83 @@
+"""
+Tests for request coalescing.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services.single_flight import SingleFlight, single_flight  # noqa: E402
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    @single_flight("test:load")
+    async def load(slug: str, currency=None):
+        calls.append(slug)
+        await asyncio.sleep(0.01)
+        return {"slug": slug}
+
+    async def scenario():
+        return await asyncio.gather(*[load("pericia") for _ in range(50)], load("otro"))
+
+    results = asyncio.run(scenario())
+    assert calls == ["pericia", "otro"]
+    assert all(result is results[0] for result in results[:50])
+
+    stats = load.flight.stats()
+    assert stats["executions"] == 2
+    assert stats["collapsed"] == 49
+    assert stats["keys"]["slug=pericia,currency=None"] == {"executions": 1, "collapsed": 49, "errors": 0}
+
+
+def test_later_calls_run_again():
+    flight = SingleFlight("test:sequential")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        return [await flight.do("k", fetch), await flight.do("k", fetch)]
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight("test:errors")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("db down")
+
+    async def scenario():
+        return await asyncio.gather(*[flight.do("k", fail) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["keys"]["k"]["errors"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight("test:cancel")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "ok"
@@ -0,0 +1,114 @@
+"""
+Tests for the queue-backed logging pipeline, request context and sampling.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services import structured_logging  # noqa: E402
+from services.structured_logging import (  # noqa: E402
+    JsonFormatter, RequestContextMiddleware, SamplingFilter, configure_logging, request_context, stop_logging
+)
+
+
+@pytest.fixture
+def json_output():
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", stream=stream)
+
+    def lines():
+        stop_logging()  # drains the queue
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield lines
+    stop_logging()
+    root.handlers[:] = saved_handlers
+    root.setLevel(saved_level)
+
+
+def make_record(name: str, level: int = logging.INFO, created: float = 1000.0) -> logging.LogRecord:
+    record = logging.LogRecord(name, level, __file__, 1, "message", (), None)
+    record.created = created
+    return record
+
+
+def test_sampling_caps_info_records_per_second():
+    sampler = SamplingFilter(["access"], per_second=2)
+    kept = [sampler.filter(make_record("access")) for _ in range(5)]
+    assert kept == [True, True, False, False, False]
+
+    # Warnings, other loggers and the next second are not affected
+    assert sampler.filter(make_record("access", logging.WARNING))
+    assert sampler.filter(make_record("routes.checkout"))
+    next_record = make_record("access", created=1001.0)
+    assert sampler.filter(next_record)
+    assert next_record.dropped == 3
+
+
+def test_json_records_carry_request_context_and_extra_fields():
+    record = make_record("access")
+    record.context = {"request_id": "abc", "method": "GET", "route": "/api/products/{product_id}"}
+    record.status = 200
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "message"
+    assert entry["request_id"] == "abc"
+    assert entry["route"] == "/api/products/{product_id}"
+    assert entry["status"] == 200
+
+
+def test_middleware_logs_one_access_record_with_request_id(json_output):
+    class Route:
+        path = "/api/products/{product_id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        logging.getLogger("routes.products").warning("inside the request")
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/api/products/p1",
+        "headers": [(b"x-request-id", b"req-1")]
+    }
+    asyncio.run(RequestContextMiddleware(app)(scope, None, send))
+
+    assert (b"x-request-id", b"req-1") in sent[0]["headers"]
+    assert request_context.get() is None
+    inside, access = json_output()
+    assert inside["request_id"] == "req-1" and inside["message"] == "inside the request"
+    assert access["logger"] == "access"
+    assert access["route"] == "/api/products/{product_id}"
+    assert access["status"] == 404
+    assert access["duration_ms"] >= 0
+
+
+def test_records_are_written_by_the_listener_thread(json_output, monkeypatch):
+    threads = []
+    original = structured_logging.JsonFormatter.format
+
+    def recording_format(self, record):
+        import threading
+        threads.append(threading.current_thread().name)
+        return original(self, record)
+
+    monkeypatch.setattr(structured_logging.JsonFormatter, "format", recording_format)
+    logging.getLogger("routes.checkout").info("queued")
+    lines = json_output()
+
+    assert lines[-1]["message"] == "queued"
+    assert threads and "MainThread" not in threads
@@ -0,0 +1,184 @@
+"""
+Tests for stale-while-revalidate caching and the last-known-good fallback.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from services import swr_cache  # noqa: E402
+from services.swr_cache import SwrCache  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(swr_cache.time, "monotonic", clock.monotonic)
+    return clock
+
+
+class Source:
+    """Stand-in for MongoDB that can be taken down"""
+
+    def __init__(self):
+        self.version = 0
+        self.reads = 0
+        self.down = False
+
+    async def load(self):
+        self.reads += 1
+        if self.down:
+            raise ConnectionError("no primary available")
+        return f"v{self.version}"
+
+
+def make_cache(name):
+    return SwrCache(name, fresh=5, stale=60, max_stale=600)
+
+
+def test_fresh_values_are_served_from_memory(clock):
+    cache, source = make_cache("test:fresh"), Source()
+
+    async def scenario():
+        first = await cache.get("k", source.load)
+        clock.now += 4
+        return first, await cache.get("k", source.load)
+
+    assert asyncio.run(scenario()) == ("v0", "v0")
+    assert source.reads == 1
+
+
+def test_stale_value_is_served_while_refreshing(clock):
+    cache, source = make_cache("test:stale"), Source()
+
+    async def scenario():
+        await cache.get("k", source.load)
+        source.version = 1
+        clock.now += 10
+        stale = await cache.get("k", source.load)
+        for _ in range(10):  # let the background refresh finish
+            await asyncio.sleep(0)
+        return stale, await cache.get("k", source.load)
+
+    assert asyncio.run(scenario()) == ("v0", "v1")
+    assert source.reads == 2
+
+
+def test_last_known_good_is_served_while_database_is_down(clock):
+    cache, source = make_cache("test:outage"), Source()
+
+    async def scenario():
+        await cache.get("k", source.load)
+        source.down = True
+        clock.now += 300
+        return await cache.get("k", source.load)
+
+    assert asyncio.run(scenario()) == "v0"
+
+
+def test_staleness_is_bounded(clock):
+    cache, source = make_cache("test:bounded"), Source()
+
+    async def scenario():
+        await cache.get("k", source.load)
+        source.down = True
+        clock.now += 601
+        return await cache.get("k", source.load)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(scenario())
+
+
+def test_invalidation_reloads_but_keeps_fallback(clock):
+    cache, source = make_cache("test:invalidate"), Source()
+
+    async def scenario():
+        await cache.get("k", source.load)
+        source.version = 1
+        cache.invalidate()
+        reloaded = await cache.get("k", source.load)
+        cache.invalidate()
+        source.down = True
+        return reloaded, await cache.get("k", source.load)
+
+    assert asyncio.run(scenario()) == ("v1", "v1")
+
+
+async def drain():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_outage_is_served_without_waiting_and_retried_in_background(clock):
+    cache, source = SwrCache("test:retry", fresh=5, stale=60, max_stale=600, retry=5), Source()
+
+    async def scenario():
+        await cache.get("k", source.load)
+        source.down = True
+        clock.now += 120
+        served = [await cache.get("k", source.load)]  # this one waits for the failed load
+        reads_after_failure = source.reads
+        for _ in range(20):
+            served.append(await cache.get("k", source.load))
+        await drain()
+        assert source.reads == reads_after_failure  # no reload inside the retry window
+
+        clock.now += 5
+        served.append(await cache.get("k", source.load))
+        await drain()
+        assert source.reads == reads_after_failure + 1  # one background retry, still failing
+
+        source.down, source.version = False, 1
+        clock.now += 5
+        served.append(await cache.get("k", source.load))
+        await drain()
+        served.append(await cache.get("k", source.load))
+        return served
+
+    served = asyncio.run(scenario())
+    assert served[:-1] == ["v0"] * (len(served) - 1)
+    assert served[-1] == "v1"
+
+
+def test_published_payload_outage_does_not_rerender_every_request(monkeypatch):
+    pytest.importorskip("fastapi")
+    from services import compression
+
+    clock = Clock()
+    monkeypatch.setattr(compression.time, "monotonic", clock.monotonic)
+    cache, source = compression.PrecompressedCache(), Source()
+
+    async def render():
+        return {"value": await source.load()}
+
+    async def scenario():
+        first = await cache.get_or_publish("landing", render)
+        await cache.invalidate("landing")
+        source.down = True
+        served = [await cache.get_or_publish("landing", render) for _ in range(10)]
+        await drain()
+        reads_during_window = source.reads
+
+        clock.now += compression.SWR_RETRY_SECONDS
+        source.down, source.version = False, 1
+        served.append(await cache.get_or_publish("landing", render))  # old copy, render retried behind it
+        await drain()
+        fresh = await cache.get_or_publish("landing", render)
+        return first, served, reads_during_window, fresh
+
+    first, served, reads_during_window, fresh = asyncio.run(scenario())
+    assert all(payload is first for payload in served)
+    assert reads_during_window == 2  # the first render and the one failed attempt
+    assert fresh.body == b'{"value":"v1"}'
@@ -0,0 +1,111 @@
+"""
+Tests for optimistic concurrency on admin edits.
+"""
+
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pymongo")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import auth  # noqa: E402
+from routes import admin_content, products  # noqa: E402
+from services.versioning import update_versioned, version_match  # noqa: E402
+from tests.fake_mongo import FakeCollection, FakeDb  # noqa: E402
+
+
+def product(**fields):
+    created = datetime(2025, 1, 1)
+    return {
+        "id": "p1", "name": "Diplomado A", "slug": "diplomado-a", "description": "Perfiles criminales",
+        "price": 540.0, "created_at": created, "updated_at": created, **fields
+    }
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDb(products=FakeCollection([product(version=3)]))
+    monkeypatch.setattr(products, "get_db", lambda: db)
+    yield db
+    products.products_index.remove("p1")
+    products.catalog_facets.remove("p1")
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(products.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_version_match():
+    assert version_match(None) == {}
+    assert version_match(0) == {"version": {"$in": [None, 0]}}
+    assert version_match(4) == {"version": 4}
+
+
+def test_missing_version_counts_as_zero():
+    collection = FakeCollection([product()])
+
+    assert asyncio.run(update_versioned(collection, {"id": "p1"}, {"price": 600.0}, 1)) is None
+    updated = asyncio.run(update_versioned(collection, {"id": "p1"}, {"price": 600.0}, 0))
+    assert updated["version"] == 1 and updated["price"] == 600.0
+
+
+def test_stale_version_is_rejected_with_409(client, db):
+    response = client.patch("/api/products/p1", json={"price": 600.0, "version": 2})
+
+    assert response.status_code == 409
+    assert db.products.docs[0]["price"] == 540.0
+    assert db.products.docs[0]["version"] == 3
+
+
+def test_current_version_is_applied_and_bumped(client, db):
+    response = client.patch("/api/products/p1", json={"price": 600.0, "version": 3})
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 4
+    assert response.json()["price"] == 600.0
+    assert db.products.docs[0]["version"] == 4
+
+
+def test_edit_without_version_is_applied(client, db):
+    response = client.patch("/api/products/p1", json={"price": 600.0})
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 4
+
+
+def test_missing_product_is_404_even_with_a_version(client):
+    assert client.patch("/api/products/nope", json={"price": 600.0, "version": 3}).status_code == 404
+
+
+def test_landing_content_written_before_versioning_is_version_zero(monkeypatch):
+    # Saved before versions existed: no version field at all
+    db = FakeDb(landing_content=FakeCollection([{
+        "id": "landing", "hero": {"title": "IDEF", "subtitle": "Peritajes", "image": "hero.jpg"}
+    }]))
+    monkeypatch.setattr(admin_content, "get_db", lambda: db)
+    app = FastAPI()
+    app.include_router(admin_content.router, prefix="/api")
+    app.dependency_overrides[auth.get_current_user] = lambda: "admin"
+    client = TestClient(app)
+
+    response = client.put("/api/admin/content/landing", json={"training_title": "Formación", "version": 0})
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+
+    # A second editor still holding version 0 is stopped
+    response = client.put("/api/admin/content/landing", json={"training_title": "Otra", "version": 0})
+    assert response.status_code == 409
+    assert db.landing_content.docs[0]["training_title"] == "Formación"